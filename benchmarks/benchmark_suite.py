@@ -0,0 +1,190 @@
+# benchmarks/benchmark_suite.py
+"""
+Воспроизводимый бенчмарк конвейера сопоставления (без графического интерфейса).
+Синтетические данные строятся детерминированно по --seed: случайные многоугольники сохраняются через
+DrawingModel.save_to_xml, изображения - шумный фон с повернутыми/масштабированными копиями шаблона.
+Для каждой пары (размер изображения, размер шаблона) измеряются загрузка, размытие, четыре фильтра границ,
+загрузка шаблона из XML, поворот/масштаб шаблона и поиск каждым методом: лучшее время из --repeat запусков
+и пиковая память (tracemalloc, отдельный запуск). Каждый запуск начинается с холодного состояния модели.
+
+Результаты сохраняются в JSON (--save) и сравниваются с базовым JSON (--baseline): этап считается
+регрессией, если он медленнее базового больше чем на --threshold (доля) и больше чем на --min-delta секунд.
+Изменение найденной позиции поиска по сравнению с базой тоже отмечается. При регрессиях код выхода 1.
+
+Запуск:
+    python benchmarks/benchmark_suite.py --save baseline.json
+    python benchmarks/benchmark_suite.py --baseline baseline.json --threshold 0.2
+    python benchmarks/benchmark_suite.py --image-megapixels 0.3 --template-sizes 48 --repeat 1   # быстрый прогон
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import cv2
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from model.DrawingModel import DrawingModel
+from model.ComparisonModel import ComparisonModel, MATCH_METHODS
+from model.TemplateBank import rotate_and_scale_template, rasterize_template_xml
+
+FILTERS = ('sobel', 'kirsch', 'roberts', 'prewitt')
+MATCH_FILTER = 'sobel' # Фильтр, на изображении границ которого измеряется поиск
+BENCHMARK_ANGLE = 17.0; BENCHMARK_SCALE = 1.25 # Вариант шаблона для этапа поворота/масштаба
+EMBEDDED_INSTANCE_TRANSFORMS = [(0.0, 1.0), (30.0, 1.0), (-45.0, 0.8), (90.0, 1.2), (12.0, 0.9)] # Копии шаблона на изображении
+
+def random_polygon_template(size, seed, vertex_count=9):
+    """ Звездообразный многоугольник в квадрате size x size (вершины по возрастанию угла вокруг центра) """
+    rng = np.random.default_rng(seed)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertex_count)); radii = rng.uniform(0.35, 0.5, vertex_count) * (size - 1)
+    center = (size - 1) / 2.0
+    model = DrawingModel(size, size)
+    for angle, radius in zip(angles, radii):
+        model.add_vertex(int(round(center + radius * np.cos(angle))), int(round(center + radius * np.sin(angle))))
+    model.template_physical_height_meters = 10.0
+    return model
+
+def synthetic_scene(megapixels, template_pixels, seed):
+    """
+    Детерминированное изображение 4:3: гладкий фон, шум и копии контура шаблона (EMBEDDED_INSTANCE_TRANSFORMS).
+    Возвращает (изображение uint8, позиция (r, c) копии с углом 0 и масштабом 1).
+    """
+    rows = int(np.sqrt(megapixels * 1e6 * 3 / 4)); cols = int(megapixels * 1e6 / rows)
+    rng = np.random.default_rng(seed)
+    small = rng.integers(60, 160, size=(max(2, rows // 64), max(2, cols // 64)), dtype=np.uint8)
+    img = cv2.resize(small, (cols, rows), interpolation=cv2.INTER_CUBIC)
+    img = cv2.add(img, rng.integers(0, 12, size=img.shape, dtype=np.uint8))
+    reference_pos = None
+    for angle, scale in EMBEDDED_INSTANCE_TRANSFORMS:
+        instance = rotate_and_scale_template(template_pixels, angle, scale)
+        instance = cv2.dilate(instance, np.ones((2, 2), np.uint8)) # Контур толщиной 2: переживает размытие и порог
+        h, w = instance.shape
+        if h >= rows or w >= cols: continue
+        r, c = int(rng.integers(0, rows - h)), int(rng.integers(0, cols - w))
+        region = img[r:r + h, c:c + w]; region[instance > 0] = 250
+        if reference_pos is None and angle == 0.0 and scale == 1.0: reference_pos = (r, c)
+    return img, reference_pos
+
+def measure(setup, func, repeat):
+    """
+    (лучшее время из repeat запусков, пиковая память в байтах, результат последнего запуска).
+    setup() готовит холодное состояние перед каждым запуском и в измерение не входит; его результат передается в func.
+    """
+    best_time = float('inf'); result = None
+    for _ in range(repeat):
+        state = setup(); result = None
+        start = time.perf_counter(); result = func(state); best_time = min(best_time, time.perf_counter() - start)
+    state = setup(); result = None
+    tracemalloc.start(); tracemalloc.reset_peak()
+    result = func(state)
+    peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return best_time, peak, result
+
+def build_cases(workdir, image_megapixels, template_sizes, seed):
+    """ Файлы синтетических данных: [(имя случая, путь изображения, путь XML, позиция эталонной копии), ...] """
+    cases = []
+    for template_index, size in enumerate(template_sizes):
+        template_model = random_polygon_template(size, seed + template_index)
+        xml_path = os.path.join(workdir, f"template_{size}.xml"); template_model.save_to_xml(xml_path)
+        template_pixels = rasterize_template_xml(xml_path)[0] # Тот же контур, что получит модель из XML
+        for image_index, megapixels in enumerate(image_megapixels):
+            img, reference_pos = synthetic_scene(megapixels, template_pixels, seed + 1000 * (image_index + 1) + template_index)
+            image_path = os.path.join(workdir, f"image_{megapixels:g}mp_t{size}.png"); cv2.imwrite(image_path, img)
+            cases.append((f"{megapixels:g}mp/t{size}", image_path, xml_path, reference_pos))
+    return cases
+
+def run_case(image_path, xml_path, repeat, methods):
+    """ Замеры одного случая: {этап: {'seconds', 'peak_bytes'[, 'score', 'pos']}} """
+    stages = {}
+    def record(stage, setup, func, match=False):
+        seconds, peak, result = measure(setup, func, repeat)
+        stages[stage] = {'seconds': round(seconds, 6), 'peak_bytes': int(peak)}
+        if match: stages[stage].update(score=round(float(result[0]), 4), pos=[int(v) for v in result[1]])
+
+    def loaded():
+        model = ComparisonModel(); model.load_image(image_path); return model
+    def filtered():
+        model = loaded(); getattr(model, f"apply_{MATCH_FILTER}")(); model.load_template_from_xml(xml_path); return model
+
+    record('load', ComparisonModel, lambda model: model.load_image(image_path))
+    record('blur', loaded, lambda model: model.toggle_gaussian_blur())
+    gray = loaded().grayscale_image
+    for filter_name in FILTERS: # Логика фильтра напрямую: без кэша pipeline, всегда полный расчет
+        record(f"edges/{filter_name}", loaded, lambda model, name=filter_name: getattr(model, f"_{name}_logic")(gray))
+    record('template/load_xml', loaded, lambda model: model.load_template_from_xml(xml_path))
+    template_model = loaded(); template_model.load_template_from_xml(xml_path); original = template_model.original_template_pixels
+    record('template/rotate_scale', lambda: None, lambda _: rotate_and_scale_template(original, BENCHMARK_ANGLE, BENCHMARK_SCALE))
+    for method in methods: # Подготовка данных изображения (пирамида, спектры, карта расстояний) входит в поиск
+        def prepared(method=method):
+            model = filtered(); model.set_match_method(method); return model
+        record(f"match/{method}", prepared, lambda model: model.find_best_match(), match=True)
+    return stages
+
+def compare(results, baseline, threshold, min_delta):
+    """ Строки сравнения с базой и число регрессий """
+    lines = []; regressions = 0
+    for case, stages in results['cases'].items():
+        for stage, current in stages.items():
+            base = baseline.get('cases', {}).get(case, {}).get(stage)
+            if base is None: lines.append(f"{case:<14} {stage:<22} {current['seconds']:>9.4f} {'-':>9} {'нов.':>8}"); continue
+            ratio = current['seconds'] / base['seconds'] if base['seconds'] > 0 else float('inf')
+            slower = current['seconds'] - base['seconds'] > min_delta and ratio > 1.0 + threshold
+            moved = 'pos' in base and 'pos' in current and base['pos'] != current['pos']
+            regressions += slower or moved
+            mark = ("РЕГРЕССИЯ" if slower else "") + (" ПОЗИЦИЯ" if moved else "")
+            lines.append(f"{case:<14} {stage:<22} {current['seconds']:>9.4f} {base['seconds']:>9.4f} {ratio:>7.2f}x "
+                         f"{current['peak_bytes'] / 2**20:>7.1f} МБ {mark}")
+    return lines, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Воспроизводимый бенчмарк конвейера сопоставления")
+    parser.add_argument('--image-megapixels', type=float, nargs='+', default=[1.0, 4.0], help="Размеры изображений, Мпкс")
+    parser.add_argument('--template-sizes', type=int, nargs='+', default=[64, 160], help="Стороны квадратов шаблонов, пкс")
+    parser.add_argument('--methods', nargs='+', default=list(MATCH_METHODS), choices=list(MATCH_METHODS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help="Каталог синтетических данных (по умолчанию - временный)")
+    parser.add_argument('--save', help="Записать результаты в JSON (например, как новую базу)")
+    parser.add_argument('--baseline', help="Базовый JSON для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Допустимое замедление относительно базы (доля)")
+    parser.add_argument('--min-delta', type=float, default=0.002, help="Замедления меньше стольких секунд не считаются регрессией (шум таймера)")
+    args = parser.parse_args(argv)
+
+    results = {'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'opencv': cv2.__version__,
+                        'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'seed': args.seed, 'repeat': args.repeat,
+                        'image_megapixels': args.image_megapixels, 'template_sizes': args.template_sizes},
+               'cases': {}}
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        workdir = args.workdir or temporary_dir
+        os.makedirs(workdir, exist_ok=True)
+        cases = build_cases(workdir, args.image_megapixels, args.template_sizes, args.seed)
+        for name, image_path, xml_path, reference_pos in cases:
+            start_time = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()): stages = run_case(image_path, xml_path, args.repeat, args.methods) # Модель печатает каждый шаг
+            results['cases'][name] = stages
+            found = {stage: tuple(row['pos']) for stage, row in stages.items() if 'pos' in row}
+            missed = [stage for stage, pos in found.items() if reference_pos and max(abs(pos[0] - reference_pos[0]), abs(pos[1] - reference_pos[1])) > 2]
+            print(f"{name}: {len(stages)} этапов, {time.perf_counter() - start_time:.1f} с" + (f"; эталонная копия не найдена: {', '.join(missed)}" if missed else ""), file=sys.stderr)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f: json.dump(results, f, ensure_ascii=False, indent=1)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)
+    lines, regressions = compare(results, baseline, args.threshold, args.min_delta)
+    print(f"{'случай':<14} {'этап':<22} {'время, с':>9} {'база, с':>9} {'отн.':>8} {'память':>10}")
+    for line in lines: print(line)
+    if args.baseline: print(f"Регрессий: {regressions} (порог +{args.threshold:.0%}, не менее {args.min_delta * 1000:.0f} мс)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
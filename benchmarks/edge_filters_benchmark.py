@@ -0,0 +1,117 @@
+# benchmarks/edge_filters_benchmark.py
+"""
+Микробенчмарк фильтров границ: прежние реализации (float64, промежуточные массивы)
+против EdgeFilters (int16/int32, переиспользуемые буферы). Печатает время, пиковую
+память (tracemalloc учитывает массивы numpy и OpenCV) первого и повторных вызовов,
+память, удерживаемую буферами между вызовами, и число несовпавших пикселей.
+
+Запуск: python benchmarks/edge_filters_benchmark.py [--megapixels 50] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import cv2
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from model.EdgeFilters import edge_filter, EdgeBuffers, PREWITT_KERNEL_X, PREWITT_KERNEL_Y, ROBERTS_KERNEL_X, ROBERTS_KERNEL_Y, KIRSCH_KERNELS
+
+# --- Прежние реализации (как в ComparisonModel до перехода на EdgeFilters) ---
+def legacy_sobel(img, ksize=3, threshold_value=50):
+    sobelx = cv2.Sobel(img, cv2.CV_64F, 1, 0, ksize=ksize)
+    sobely = cv2.Sobel(img, cv2.CV_64F, 0, 1, ksize=ksize)
+    magnitude = np.sqrt(sobelx**2 + sobely**2)
+    if np.max(magnitude) > 0: magnitude = (magnitude / np.max(magnitude) * 255)
+    magnitude = magnitude.astype(np.uint8)
+    _, binary = cv2.threshold(magnitude, threshold_value, 255, cv2.THRESH_BINARY)
+    return (binary // 255).astype(np.uint8)
+
+def legacy_kirsch(img, threshold_value=60):
+    gray_float = img.astype(np.float32)
+    convolved_images = [cv2.filter2D(gray_float, -1, k) for k in KIRSCH_KERNELS]
+    max_magnitude = np.max(np.abs(np.stack(convolved_images, axis=0)), axis=0)
+    if np.max(max_magnitude) > 0: max_magnitude = (max_magnitude / np.max(max_magnitude) * 255)
+    max_magnitude = max_magnitude.astype(np.uint8)
+    _, binary = cv2.threshold(max_magnitude, threshold_value, 255, cv2.THRESH_BINARY)
+    return (binary // 255).astype(np.uint8)
+
+def _legacy_pair(img, kernel_x, kernel_y, threshold_value):
+    img_float = img.astype(np.float64)
+    x_img = cv2.filter2D(img_float, -1, kernel_x)
+    y_img = cv2.filter2D(img_float, -1, kernel_y)
+    magnitude = np.sqrt(x_img**2 + y_img**2)
+    if np.max(magnitude) > 0: magnitude = (magnitude / np.max(magnitude) * 255)
+    magnitude = magnitude.astype(np.uint8)
+    _, binary = cv2.threshold(magnitude, threshold_value, 255, cv2.THRESH_BINARY)
+    return (binary // 255).astype(np.uint8)
+
+def legacy_roberts(img, threshold_value=30): return _legacy_pair(img, ROBERTS_KERNEL_X, ROBERTS_KERNEL_Y, threshold_value)
+def legacy_prewitt(img, threshold_value=50): return _legacy_pair(img, PREWITT_KERNEL_X, PREWITT_KERNEL_Y, threshold_value)
+
+CASES = [
+    ('sobel', legacy_sobel, 50, {'ksize': 3}),
+    ('kirsch', legacy_kirsch, 60, {}),
+    ('roberts', legacy_roberts, 30, {}),
+    ('prewitt', legacy_prewitt, 50, {}),
+]
+
+def synthetic_image(megapixels, seed=0):
+    """ Детерминированное изображение 4:3 с гладким фоном, шумом и контрастными фигурами """
+    rows = int(np.sqrt(megapixels * 1e6 * 3 / 4)); cols = int(megapixels * 1e6 / rows)
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(max(2, rows // 64), max(2, cols // 64)), dtype=np.uint8)
+    img = cv2.resize(small, (cols, rows), interpolation=cv2.INTER_CUBIC)
+    for _ in range(200):
+        x, y = int(rng.integers(0, cols)), int(rng.integers(0, rows))
+        cv2.circle(img, (x, y), int(rng.integers(20, 400)), int(rng.integers(0, 256)), thickness=int(rng.integers(2, 12)))
+    noise = rng.integers(0, 8, size=img.shape, dtype=np.uint8)
+    return cv2.add(img, noise)
+
+def peak_memory(func):
+    """ (пиковая дополнительная память одного вызова в байтах, результат) """
+    tracemalloc.start(); tracemalloc.reset_peak()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return peak, result
+
+def measure(func, repeat):
+    """ (лучшее время, пиковая дополнительная память в байтах, результат) """
+    best_time = float('inf'); result = None
+    for _ in range(repeat):
+        result = None
+        start = time.perf_counter(); result = func(); best_time = min(best_time, time.perf_counter() - start)
+    result = None
+    peak, result = peak_memory(func)
+    return best_time, peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение прежних и новых фильтров границ")
+    parser.add_argument('--megapixels', type=float, default=50.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--filters', nargs='*', default=[name for name, *_ in CASES])
+    args = parser.parse_args()
+    img = synthetic_image(args.megapixels)
+    print(f"Изображение: {img.shape[0]}x{img.shape[1]} ({img.size / 1e6:.1f} Мпкс)")
+    print("Память новых фильтров: 'холодн.' - первый вызов (буферы выделяются), 'повт.' - последующие вызовы,")
+    print("'удерж.' - буферы EdgeBuffers, остающиеся занятыми между вызовами (в приложении - DEFAULT_BUFFERS потока).")
+    buffers = EdgeBuffers()
+    print(f"{'фильтр':<8} {'было, с':>9} {'стало, с':>9} {'ускор.':>7} {'было, МБ':>9} {'холодн., МБ':>12} {'повт., МБ':>10} "
+          f"{'удерж., МБ':>11} {'удерж., Б/пкс':>14} {'разл. пкс':>10}")
+    for name, legacy_func, threshold_value, params in CASES:
+        if name not in args.filters: continue
+        legacy_time, legacy_peak, legacy_result = measure(lambda: legacy_func(img, threshold_value=threshold_value, **params), args.repeat)
+        new_call = lambda: edge_filter(name, img, threshold_value, buffers=buffers, **params)
+        buffers.release(); cold_peak, _ = peak_memory(new_call) # Пик первого вызова включает выделение буферов
+        new_time, warm_peak, new_result = measure(new_call, args.repeat)
+        retained = buffers.nbytes(); buffers.release()
+        differing = int(np.count_nonzero(legacy_result != new_result)); legacy_result = None
+        print(f"{name:<8} {legacy_time:>9.3f} {new_time:>9.3f} {legacy_time / new_time:>6.1f}x {legacy_peak / 2**20:>9.0f} "
+              f"{cold_peak / 2**20:>12.0f} {warm_peak / 2**20:>10.0f} {retained / 2**20:>11.0f} {retained / img.size:>14.0f} {differing:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# controller/BackgroundWorker.py
+import queue
+import threading
+from model.Instrumentation import INSTRUMENTATION
+
+class JobCancelled(Exception):
+    """ Задание отменено пользователем или вытеснено более новым """
+
+
+class Job:
+    """
+    Задание фонового потока. Функция задания получает сам Job и может вызывать job.progress(доля, текст):
+    вызов передает прогресс в интерфейс и прерывает задание исключением JobCancelled, если оно отменено.
+    """
+    def __init__(self, worker, name, func, on_done, on_error, speculative=False):
+        self.name = name; self.func = func; self.on_done = on_done; self.on_error = on_error
+        self.speculative = speculative # Фоновый предрасчет: не занимает интерфейс и уступает любому новому заданию
+        self._worker = worker; self._cancel_event = threading.Event()
+
+    def cancel(self): self._cancel_event.set()
+
+    @property
+    def cancelled(self): return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled: raise JobCancelled()
+
+    def progress(self, fraction=None, text=None):
+        self.check_cancelled()
+        self._worker._post('progress', self, (fraction, text))
+
+
+class BackgroundWorker:
+    """
+    Один фоновый поток для долгих операций модели (OpenCV отпускает GIL, интерфейс остается отзывчивым).
+    Задания выполняются строго по очереди, поэтому модель никогда не изменяется двумя заданиями сразу.
+    Новое задание вытесняет текущее (флаг отмены, проверяется в job.progress) и все ожидающие:
+    их результаты отбрасываются. Результаты, ошибки и прогресс доставляются в главный поток Tk через after().
+    Спекулятивные задания (предрасчет в простое) не считаются занятостью, не показывают прогресс
+    и отменяются любым новым заданием.
+    """
+    def __init__(self, tk_widget, on_progress=None, on_busy_changed=None, poll_ms=50):
+        self._widget = tk_widget; self._poll_ms = poll_ms
+        self.on_progress = on_progress # (job, доля или None, текст или None)
+        self.on_busy_changed = on_busy_changed # (занят ли, имя текущего задания)
+        self._tasks = queue.Queue(); self._messages = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs = [] # Незавершенные задания (ожидающие и выполняемое)
+        self._latest = None
+        self._thread = None; self._polling = False
+
+    @property
+    def busy(self):
+        with self._lock: return any(not job.speculative for job in self._jobs)
+
+    def submit(self, name, func, on_done=None, on_error=None, supersede=True, speculative=False):
+        """ Ставит func(job) в очередь. on_done(результат) / on_error(исключение) вызываются в главном потоке. """
+        job = Job(self, name, func, on_done, on_error, speculative)
+        with self._lock:
+            for old_job in self._jobs:
+                if supersede or old_job.speculative: old_job.cancel()
+            self._jobs.append(job)
+            if not speculative: self._latest = job
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ComparisonWorker", daemon=True); self._thread.start()
+        self._tasks.put(job)
+        if self.on_busy_changed and not speculative: self.on_busy_changed(True, name)
+        self._schedule_poll()
+        return job
+
+    def cancel(self):
+        """ Отмена всех незавершенных заданий (кнопка "Отмена") """
+        with self._lock:
+            for job in self._jobs: job.cancel()
+
+    def _post(self, kind, job, payload=None):
+        self._messages.put((kind, job, payload))
+
+    def _run(self):
+        while True:
+            job = self._tasks.get()
+            if job.cancelled: self._post('cancelled', job); continue
+            try: self._post('done', job, INSTRUMENTATION.profiled(job.func, job)) # Во время записи профиля задание профилируется в своем потоке
+            except JobCancelled: self._post('cancelled', job)
+            except Exception as e: self._post('error', job, e)
+
+    def _schedule_poll(self):
+        if not self._polling: self._polling = True; self._widget.after(self._poll_ms, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try: kind, job, payload = self._messages.get_nowait()
+            except queue.Empty: break
+            if kind == 'progress':
+                if not job.cancelled and not job.speculative and self.on_progress: self.on_progress(job, *payload)
+                continue
+            with self._lock:
+                if job in self._jobs: self._jobs.remove(job)
+                is_current = (job is self._latest or job.speculative) and not job.cancelled
+                regular_jobs = [other for other in self._jobs if not other.speculative]
+                still_busy = bool(regular_jobs); next_name = regular_jobs[-1].name if regular_jobs else None
+            # Результат вытесненного задания не доставляется; ошибки - тоже (их причина уже неактуальна)
+            if is_current and kind == 'done' and job.on_done: job.on_done(payload)
+            elif is_current and kind == 'error' and job.on_error: job.on_error(payload)
+            if self.on_busy_changed and not job.speculative: self.on_busy_changed(still_busy, next_name)
+        with self._lock: pending = bool(self._jobs)
+        if pending or not self._messages.empty(): self._schedule_poll()
@@ -1,10 +1,16 @@
 # controller/ComparisonController.py
+import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import numpy as np
 from model.DrawingModel import DrawingModel # Используется в ComparisonModel
-from model.ComparisonModel import ComparisonModel
+from model.ComparisonModel import ComparisonModel, MATCH_METHODS
+from model.SequenceTracker import SEQUENCE_IMAGE_EXTENSIONS
 from view.ComparisonView import ComparisonView # SCALE_INCREMENT больше не нужен
+from controller.BackgroundWorker import BackgroundWorker
+from controller.Diagnostics import DiagnosticsController
+
+PRECOMPUTE_IDLE_MS = 300 # Пауза без заданий, после которой заранее готовятся соседние углы шаблона
 
 class ComparisonController:
     """
@@ -15,7 +21,17 @@ class ComparisonController:
     def __init__(self, parent_frame):
         self.model = ComparisonModel()
         self.view = ComparisonView(parent_frame, self)
+        # Строка состояния: замеры загрузки, фильтров, поворота, поиска, оценки позиции и отрисовки вкладки
+        self.diagnostics = DiagnosticsController(self.view.frame, prefixes=('comparison.', 'filter.', 'template.', 'match.', 'score_at', 'view.comparison.'))
         self._drag_start_info = None
+        self._deferred_canvas_events = {} # Последние нажатие/перетаскивание/изменение размера холста, пришедшие во время задания
+        self._refresh_when_idle = False # Вид нужно обновить полностью после задания (например, восстановить поле угла)
+        # Долгие операции модели выполняются в фоновом потоке, результаты возвращаются через after()
+        self.worker = BackgroundWorker(self.view.frame, on_progress=self._handle_worker_progress, on_busy_changed=self._handle_worker_busy_changed)
+        self._view_stale = False # Модель могла измениться без обновления вида (отмененное задание)
+        self._pending_angle = None # Угол, заданный поворотом, но еще не примененный фоновым заданием
+        self._precompute_after_id = None # Отложенный запуск предрасчета соседних углов
+        self.view.set_match_methods(MATCH_METHODS, self.model.match_method)
         self._update_view_state() # Инициализируем состояние всех виджетов
         # Инициализируем информационную метку и поля
         self.view.update_info_label(None, (-1, -1), 0) # score, pos, angle
@@ -64,11 +80,19 @@ class ComparisonController:
 
         # Поиск
         self.view.set_widget_state("find_best_button", tk.NORMAL if filter_applied and current_tpl_exists else tk.DISABLED)
+        self.view.set_widget_state("compare_methods_button", tk.NORMAL if filter_applied and current_tpl_exists and self.model.match_method != 'exhaustive' else tk.DISABLED)
+        self.view.set_widget_state("heatmap_button", tk.NORMAL if filter_applied and current_tpl_exists else tk.DISABLED)
+        self.view.set_widget_state("sweep_button", tk.NORMAL if filter_applied and original_tpl_loaded else tk.DISABLED)
+        self.view.set_widget_state("detect_button", tk.NORMAL if filter_applied and current_tpl_exists else tk.DISABLED)
+        self.view.set_widget_state("template_set_button", tk.NORMAL if filter_applied else tk.DISABLED)
+        self.view.set_widget_state("sequence_button", tk.NORMAL if filter_applied and original_tpl_loaded else tk.DISABLED)
+        self.view.set_widget_state("tiled_search_button", tk.NORMAL if filter_applied and current_tpl_exists else tk.DISABLED)
 
     def _update_full_view(self, update_info=True, update_image_params_display=False, update_angle_display=False):
         """ Полное обновление отображения View на основе Model """
         display_image = self.model.get_display_image()
         self.view.update_canvas(display_image, self.model.template_pixels, self.model.current_pos)
+        self.view.update_detections(self.model.detections)
 
         if update_info:
             self.view.update_info_label(
@@ -89,6 +113,53 @@ class ComparisonController:
 
         self._update_view_state() # Обновляем состояние всех виджетов
 
+    # --- Фоновые задания ---
+    def _run_in_background(self, name, work, on_done, error_title):
+        """
+        Выполняет work(job) в фоновом потоке; on_done(результат) вызывается в главном потоке.
+        Новое задание вытесняет незавершенное (например, смена угла или фильтра во время поиска): результат вытесненного
+        не доставляется в вид. Модель вытесненное задание меняет только до первой проверки отмены (job.progress):
+        поиски проверяют ее перед записью результата, а загрузка, фильтр и поворот и есть изменение модели -
+        их действие остается в силе, и следующее задание работает уже с ним.
+        """
+        def done(result): self._view_stale = False; on_done(result)
+        def failed(error):
+            self._view_stale = False
+            self._update_full_view(update_info=True, update_image_params_display=True, update_angle_display=True)
+            self.view.show_error(error_title, str(error))
+        def work_and_heatmap(job):
+            result = work(job)
+            job.check_cancelled() # Вытесненное задание не тратит время на карту счетов - ее построит следующее
+            self.model.prepare_heatmap() # Сброшенная заданием карта счетов строится здесь же, а не в потоке интерфейса при отрисовке
+            return result
+        self._view_stale = True
+        return self.worker.submit(name, work_and_heatmap, on_done=done, on_error=failed)
+
+    def _handle_worker_progress(self, job, fraction, text):
+        self.view.show_progress(f"{job.name}: {text}" if text else job.name, fraction)
+
+    def _handle_worker_busy_changed(self, busy, job_name):
+        if self._precompute_after_id is not None: self.view.frame.after_cancel(self._precompute_after_id); self._precompute_after_id = None
+        if busy: self.view.show_progress(job_name); return
+        self.view.hide_progress(); self._pending_angle = None
+        deferred = self._deferred_canvas_events; self._deferred_canvas_events = {}
+        # Отмененное задание могло успеть изменить модель (например, загрузить изображение), а холст - размер: показываем актуальное состояние
+        if self._view_stale or self._refresh_when_idle or 'configure' in deferred:
+            self._view_stale = False; self._refresh_when_idle = False; self._update_full_view(update_info=True, update_image_params_display=True, update_angle_display=True)
+        # Захват и последнее перетаскивание шаблона во время задания применяются сейчас, а не теряются
+        if 'press' in deferred: self.handle_canvas_press(deferred['press'])
+        if 'drag' in deferred: self.handle_canvas_drag(deferred['drag'])
+        self._precompute_after_id = self.view.frame.after(PRECOMPUTE_IDLE_MS, self._start_precompute)
+
+    def _start_precompute(self):
+        """ В простое готовит шаблоны для соседних углов; любое действие пользователя отменяет предрасчет """
+        self._precompute_after_id = None
+        if self.worker.busy or self.model.original_template_pixels is None: return
+        self.worker.submit("Предрасчет поворотов", lambda job: self.model.precompute_template_neighbours(progress=job.progress), speculative=True)
+
+    def handle_cancel_background_job(self):
+        self.worker.cancel()
+
     # --- Обработчики загрузки ---
     def handle_load_image(self, filename=None):
         if not filename:
@@ -97,13 +168,10 @@ class ComparisonController:
                 filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.tif *.tiff"), ("All files", "*.*")],
                 parent=self.view.frame)
         if filename:
-            try:
-                self.model.load_image(filename)
+            def on_done(_):
                 self._update_full_view(update_info=True, update_image_params_display=True, update_angle_display=True)
                 self.view.show_info("Успех", f"Изображение {self.model.image_rows}x{self.model.image_cols} загружено.")
-            except Exception as e:
-                self._update_full_view(update_info=True, update_image_params_display=True, update_angle_display=True)
-                self.view.show_error("Ошибка загрузки изображения", str(e))
+            self._run_in_background("Загрузка изображения", lambda job: self.model.load_image(filename), on_done, "Ошибка загрузки изображения")
 
     def handle_load_template(self, filename=None):
         if self.model.grayscale_image is None: self.view.show_error("Ошибка", "Сначала загрузите изображение!"); return
@@ -113,52 +181,56 @@ class ComparisonController:
                 filetypes=[("XML Polygon files", "*.xml"), ("All files", "*.*")],
                 parent=self.view.frame)
         if filename:
-            try:
-                self.model.load_template_from_xml(filename)
+            def on_done(_):
                 self._update_full_view(update_info=True, update_image_params_display=False, update_angle_display=True)
                 orig_shape = self.model.original_template_pixels.shape if self.model.original_template_pixels is not None else "N/A"
                 self.view.show_info("Успех", f"Шаблон загружен (размер {orig_shape}). Текущий угол: {self.model.template_angle_degrees:.0f}°")
-            except Exception as e:
-                self._update_full_view(update_info=True, update_image_params_display=False, update_angle_display=True)
-                self.view.show_error("Ошибка загрузки шаблона", str(e))
+            self._run_in_background("Загрузка шаблона", lambda job: self.model.load_template_from_xml(filename), on_done, "Ошибка загрузки шаблона")
+
+    def handle_load_template_bank(self):
+        filename = filedialog.askopenfilename(
+            title="Подключить банк шаблонов",
+            filetypes=[("Template bank", "*.tplbank"), ("All files", "*.*")],
+            parent=self.view.frame)
+        if filename:
+            def on_done(count): self.view.show_info("Успех", f"Банк шаблонов подключен: {count} шабл. Шаблоны из банка загружаются без растеризации.")
+            self._run_in_background("Загрузка банка шаблонов", lambda job: self.model.load_template_bank(filename), on_done, "Ошибка загрузки банка шаблонов")
 
     # --- Обработчики фильтров ---
     def handle_toggle_gauss(self):
         if self.model.grayscale_image is None: self.view.show_error("Ошибка", "Сначала загрузите изображение!"); self.view.update_gauss_button_visuals(False, tk.DISABLED); return
-        try:
-            success = self.model.toggle_gaussian_blur()
+        def on_done(success):
             if success: self._update_full_view(update_info=True)
             else: self._update_view_state()
-        except Exception as e: self.view.show_error("Ошибка размытия Гаусса", str(e)); self._update_view_state()
+        self._run_in_background("Размытие по Гауссу", lambda job: self.model.toggle_gaussian_blur(), on_done, "Ошибка размытия Гаусса")
 
-    def handle_apply_sobel(self):
+    def _apply_filter(self, filter_name, job_name, error_title):
         if self.model.grayscale_image is None: self.view.show_error("Ошибка", "Сначала загрузите изображение!"); return
-        try: self.model.apply_sobel(); self._update_full_view(update_info=True)
-        except Exception as e: self.view.show_error("Ошибка применения фильтра Собеля", str(e))
+        apply_func = getattr(self.model, f"apply_{filter_name}")
+        self._run_in_background(job_name, lambda job: apply_func(), lambda _: self._update_full_view(update_info=True), error_title)
 
-    def handle_apply_kirsch(self):
-        if self.model.grayscale_image is None: self.view.show_error("Ошибка", "Сначала загрузите изображение!"); return
-        try: self.model.apply_kirsch(); self._update_full_view(update_info=True)
-        except Exception as e: self.view.show_error("Ошибка применения оператора Кирша", str(e))
+    def handle_apply_sobel(self): self._apply_filter('sobel', "Фильтр Собеля", "Ошибка применения фильтра Собеля")
+    def handle_apply_kirsch(self): self._apply_filter('kirsch', "Оператор Кирша", "Ошибка применения оператора Кирша")
+    def handle_apply_roberts(self): self._apply_filter('roberts', "Оператор Робертса", "Ошибка применения оператора Робертса")
+    def handle_apply_prewitt(self): self._apply_filter('prewitt', "Оператор Превитта", "Ошибка применения оператора Превитта")
 
-    def handle_apply_roberts(self):
-        if self.model.grayscale_image is None: self.view.show_error("Ошибка", "Сначала загрузите изображение!"); return
-        try: self.model.apply_roberts(); self._update_full_view(update_info=True)
-        except Exception as e: self.view.show_error("Ошибка применения оператора Робертса", str(e))
-
-    def handle_apply_prewitt(self):
-        if self.model.grayscale_image is None: self.view.show_error("Ошибка", "Сначала загрузите изображение!"); return
-        try: self.model.apply_prewitt(); self._update_full_view(update_info=True)
-        except Exception as e: self.view.show_error("Ошибка применения оператора Превитта", str(e))
+    def handle_toggle_heatmap(self):
+        if self.model._get_active_edge_image() is None or self.model.template_pixels is None: self.view.show_error("Ошибка", "Нужны фильтр границ и шаблон."); return
+        self._run_in_background("Тепловая карта", lambda job: self.model.toggle_score_heatmap(), lambda _: self._update_full_view(update_info=True), "Ошибка построения тепловой карты")
 
     # --- Обработчики для физических параметров изображения ---
+    def _set_image_physical_parameters(self, **params):
+        # Через очередь заданий: параметры пересчитывают шаблон, а модель может быть занята фоновым заданием
+        self._run_in_background("Масштаб шаблона", lambda job: self.model.set_image_physical_parameters(**params),
+                                lambda _: self._update_full_view(update_info=True, update_image_params_display=True, update_angle_display=True),
+                                "Ошибка установки параметров изображения")
+
     def handle_image_m_per_px_entry_change(self, event=None):
         if self.model.grayscale_image is None: return
         m_per_px_val = self.view.get_image_m_per_px_entry()
         if m_per_px_val is not None:
             if m_per_px_val > 0:
-                self.model.set_image_physical_parameters(meters_per_pixel=m_per_px_val)
-                self._update_full_view(update_info=True, update_image_params_display=True, update_angle_display=True)
+                if m_per_px_val != self.model.image_meters_per_pixel: self._set_image_physical_parameters(meters_per_pixel=m_per_px_val)
             else:
                 self.view.show_error("Ошибка", "Масштаб изображения (м/пкс) должен быть положительным.")
                 self._update_full_view(update_info=False, update_image_params_display=True)
@@ -168,8 +240,7 @@ class ComparisonController:
         phys_height_val = self.view.get_image_phys_height_entry()
         if phys_height_val is not None:
             if phys_height_val > 0:
-                self.model.set_image_physical_parameters(physical_height_meters=phys_height_val)
-                self._update_full_view(update_info=True, update_image_params_display=True, update_angle_display=True)
+                if phys_height_val != self.model.image_physical_height_meters: self._set_image_physical_parameters(physical_height_meters=phys_height_val)
             else:
                 self.view.show_error("Ошибка", "Физическая высота изображения должна быть положительной.")
                 self._update_full_view(update_info=False, update_image_params_display=True)
@@ -178,29 +249,123 @@ class ComparisonController:
     def handle_find_best_match(self):
         if self.model._get_active_edge_image() is None: self.view.show_error("Ошибка", "Сначала примените фильтр границ!"); return
         if self.model.template_pixels is None: self.view.show_error("Ошибка", "Шаблон не загружен или не масштабирован."); return
-        try:
-            score, pos_rc = self.model.find_best_match()
+        def on_done(result):
+            score, pos_rc = result
             self._update_full_view(update_info=True, update_angle_display=True)
-            if pos_rc != (-1, -1): self.view.show_info("Поиск завершен", f"Найдено лучшее совпадение со счетом {score:.4f} в позиции {pos_rc} (угол {self.model.template_angle_degrees:.0f}°).")
+            if pos_rc != (-1, -1): self.view.show_info("Поиск завершен", f"Найдено лучшее совпадение со счетом {score:.4f} в позиции {pos_rc} (угол {self.model.template_angle_degrees:.0f}°, {self.model.last_search_seconds:.3f} с).")
             else: self.view.show_info("Поиск завершен", "Совпадений не найдено или произошла ошибка.")
-        except Exception as e: self.view.show_error("Ошибка при поиске", str(e))
+        self._run_in_background("Поиск лучшего совпадения", lambda job: self.model.find_best_match(progress=job.progress), on_done, "Ошибка при поиске")
+
+    def handle_match_method_change(self, event=None):
+        method = self.view.get_selected_match_method()
+        if method is None: return
+        def on_done(_): self._update_full_view(update_info=True)
+        self._run_in_background("Смена метода поиска", lambda job: self.model.set_match_method(method), on_done, "Ошибка")
+
+    def handle_compare_search_methods(self):
+        if self.model._get_active_edge_image() is None or self.model.template_pixels is None: self.view.show_error("Ошибка", "Нужны фильтр границ и шаблон."); return
+        method = self.model.match_method
+        def on_done(report):
+            self._update_view_state()
+            self.view.show_info("Сравнение методов поиска",
+                                f"Полный перебор: {report['exhaustive_seconds']:.3f} с, счет {report['exhaustive_score']:.4f} в {report['exhaustive_pos']}\n"
+                                f"{MATCH_METHODS[report['method']]}: {report['method_seconds']:.3f} с, счет {report['method_score']:.4f} в {report['method_pos']}\n"
+                                f"Ускорение: x{report['speedup']:.1f}. Пик {'совпал' if report['same_peak'] else 'НЕ совпал'}.")
+        self._run_in_background("Сравнение методов", lambda job: self.model.compare_search_methods(method, progress=job.progress), on_done, "Ошибка сравнения")
+
+    def handle_find_best_match_sweep(self):
+        if self.model._get_active_edge_image() is None: self.view.show_error("Ошибка", "Сначала примените фильтр границ!"); return
+        if self.model.original_template_pixels is None: self.view.show_error("Ошибка", "Шаблон не загружен."); return
+        params = self.view.get_sweep_parameters()
+        if params is None: return
+        def on_done(result):
+            score, pos_rc, angle, scale = result
+            self._update_full_view(update_info=True, update_angle_display=True)
+            self.view.show_info("Перебор завершен", f"Лучшее совпадение: счет {score:.4f} в позиции {pos_rc}, угол {angle:.1f}°, масштаб. фактор {scale:.3f} "
+                                                     f"(проверено вариантов: {len(self.model.sweep_results)}).")
+        self._run_in_background("Перебор углов/масштабов", lambda job: self.model.find_best_match_sweep(*params, progress=job.progress), on_done, "Ошибка при переборе")
+
+    def handle_find_all_matches(self):
+        if self.model._get_active_edge_image() is None: self.view.show_error("Ошибка", "Сначала примените фильтр границ!"); return
+        if self.model.template_pixels is None: self.view.show_error("Ошибка", "Шаблон не загружен."); return
+        params = self.view.get_detection_parameters()
+        if params is None: return
+        threshold, top_k = params
+        def on_done(count):
+            self._update_full_view(update_info=True)
+            if not count: self.view.show_info("Поиск завершен", "Совпадений выше порога не найдено.")
+        self._run_in_background("Поиск всех совпадений", lambda job: self.model.find_all_matches(threshold=threshold, top_k=top_k, progress=job.progress), on_done, "Ошибка при поиске")
+
+    def handle_find_best_match_tiled(self, filename=None):
+        if self.model._get_active_edge_image() is None: self.view.show_error("Ошибка", "Сначала примените фильтр границ!"); return
+        if self.model.template_pixels is None: self.view.show_error("Ошибка", "Шаблон не загружен."); return
+        if not filename:
+            filename = filedialog.askopenfilename(
+                title="Большое изображение для поиска по тайлам (память ограничена тайлом только для .npy и несжатых TIFF/BMP/PGM/PPM)",
+                filetypes=[("Без полной загрузки: NumPy uint8, несжатые TIFF/BMP/PGM/PPM", "*.npy *.tif *.tiff *.bmp *.pgm *.ppm"),
+                           ("Сжатые (декодируются целиком)", "*.png *.jpg *.jpeg *.tif *.tiff"), ("All files", "*.*")],
+                parent=self.view.frame)
+        if filename:
+            def on_done(result):
+                score, pos_rc = result; info = self.model.tiled_result
+                self._update_view_state()
+                self.view.show_info("Поиск по тайлам завершен",
+                                    f"Изображение {info['image_shape'][0]}x{info['image_shape'][1]} ({info['tiles']} тайлов): "
+                                    f"счет {score:.4f} в позиции {pos_rc}, {info['seconds']:.1f} с.")
+            self._run_in_background("Поиск по тайлам", lambda job: self.model.find_best_match_tiled(filename, progress=job.progress), on_done, "Ошибка поиска по тайлам")
+
+    def handle_track_sequence(self, path=None):
+        if self.model._get_active_edge_image() is None: self.view.show_error("Ошибка", "Сначала примените фильтр границ!"); return
+        if self.model.original_template_pixels is None: self.view.show_error("Ошибка", "Шаблон не загружен."); return
+        params = self.view.get_sequence_parameters()
+        if params is None: return
+        if not path:
+            path = filedialog.askopenfilename(
+                title="Видео или любой кадр каталога последовательности",
+                filetypes=[("Video files", "*.mp4 *.avi *.mov *.mkv"), ("Image files (кадры каталога)", "*.png *.jpg *.jpeg *.bmp *.tif *.tiff"), ("All files", "*.*")],
+                parent=self.view.frame)
+            if path and path.lower().endswith(SEQUENCE_IMAGE_EXTENSIONS): path = os.path.dirname(path) # Выбран кадр - обходим весь каталог
+        if path:
+            window_pixels, window_degrees, fallback_score = params
+            def on_done(results):
+                self._update_view_state()
+                self.view.show_sequence_results(results)
+            self._run_in_background("Сопровождение по кадрам", lambda job: self.model.track_sequence(path, window_pixels, window_degrees, fallback_score, progress=job.progress),
+                                    on_done, "Ошибка сопровождения")
+
+    def handle_find_template_set(self, directory=None):
+        if self.model._get_active_edge_image() is None: self.view.show_error("Ошибка", "Сначала примените фильтр границ!"); return
+        if not directory: directory = filedialog.askdirectory(title="Каталог с XML-шаблонами", parent=self.view.frame)
+        if directory:
+            def on_done(results):
+                self._update_view_state()
+                self.view.show_template_set_results(results, self.handle_apply_template_set_result)
+            self._run_in_background("Поиск набора шаблонов", lambda job: self.model.find_templates_in_set(directory, progress=job.progress), on_done, "Ошибка поиска набора шаблонов")
+
+    def handle_apply_template_set_result(self, index):
+        def on_done(result):
+            self._update_full_view(update_info=True, update_angle_display=True)
+        self._run_in_background("Загрузка шаблона из набора", lambda job: self.model.apply_template_set_result(index), on_done, "Ошибка загрузки шаблона")
 
     # --- Обработчики поворота шаблона ---
+    def _set_template_angle(self, new_angle):
+        """ Поворот в фоне; следующий щелчок считается от еще не примененного угла, старое задание вытесняется """
+        self._pending_angle = new_angle
+        def on_done(success):
+            self._pending_angle = None
+            self._update_full_view(update_info=bool(success), update_angle_display=True)
+        self._run_in_background("Поворот шаблона", lambda job: self.model.set_template_angle(new_angle), on_done, "Ошибка установки угла")
+
+    def _current_target_angle(self):
+        return self._pending_angle if self._pending_angle is not None else self.model.template_angle_degrees
+
     def handle_rotate_template_left(self):
         if self.model.original_template_pixels is None: self.view.show_error("Ошибка", "Шаблон не загружен."); return
-        new_angle = (self.model.template_angle_degrees - 1)
-        if self.model.set_template_angle(new_angle):
-            self._update_full_view(update_info=True, update_angle_display=True)
-        else:
-            self._update_full_view(update_info=False, update_angle_display=True)
+        self._set_template_angle(self._current_target_angle() - 1)
 
     def handle_rotate_template_right(self):
         if self.model.original_template_pixels is None: self.view.show_error("Ошибка", "Шаблон не загружен."); return
-        new_angle = (self.model.template_angle_degrees + 1)
-        if self.model.set_template_angle(new_angle):
-            self._update_full_view(update_info=True, update_angle_display=True)
-        else:
-            self._update_full_view(update_info=False, update_angle_display=True)
+        self._set_template_angle(self._current_target_angle() + 1)
 
     def handle_angle_entry_change(self, event=None):
         """ Обработка изменения поля ввода угла """
@@ -208,19 +373,16 @@ class ComparisonController:
         try:
             angle_str = self.view.get_angle_entry_value() # Убедись, что этот метод есть в View
             new_angle = float(angle_str.replace(',', '.'))
-            if self.model.set_template_angle(new_angle):
-                self._update_full_view(update_info=True, update_angle_display=True)
-            else:
-                self._update_full_view(update_info=False, update_angle_display=True)
+            if new_angle != self._current_target_angle(): self._set_template_angle(new_angle)
         except ValueError:
             self.view.show_error("Ошибка ввода", "Угол должен быть числом.")
-            self._update_full_view(update_info=False, update_angle_display=True)
-        except Exception as e:
-            self.view.show_error("Ошибка установки угла", str(e))
-            self._update_full_view(update_info=False, update_angle_display=True)
+            # Во время задания модель меняется в фоновом потоке: поле угла восстановится по его завершении
+            if self.worker.busy: self._refresh_when_idle = True
+            else: self._update_full_view(update_info=False, update_angle_display=True)
 
     # --- Обработчики холста ---
     def handle_canvas_press(self, event):
+        if self.worker.busy: self._drag_start_info = None; self._deferred_canvas_events.pop('drag', None); self._deferred_canvas_events['press'] = event; return # Применится по завершении задания
         if self.model.template_pixels is None or self.model.get_display_image() is None: self._drag_start_info = None; return
         click_row, click_col = self.view.get_original_coords_from_canvas(event.x, event.y)
         tpl_r, tpl_c = self.model.current_pos; offset_r = click_row - tpl_r; offset_c = click_col - tpl_c
@@ -228,14 +390,16 @@ class ComparisonController:
         else: self._drag_start_info = None
 
     def handle_canvas_drag(self, event):
+        if self.worker.busy: self._deferred_canvas_events['drag'] = event; return # Применится последнее перетаскивание по завершении задания
         if self._drag_start_info is None or self.model.template_pixels is None or self.model.get_display_image() is None: return
         current_row, current_col = self.view.get_original_coords_from_canvas(event.x, event.y)
         offset_r = self._drag_start_info['offset_r']; offset_c = self._drag_start_info['offset_c']
         new_tpl_r = current_row - offset_r; new_tpl_c = current_col - offset_c
         position_changed = self.model.set_current_pos(new_tpl_r, new_tpl_c)
         if position_changed:
-            self.view.update_canvas(self.model.get_display_image(), self.model.template_pixels, self.model.current_pos)
+            self.view.move_template_overlay(self.model.current_pos) # Фон не меняется - только сдвиг слоя шаблона
             self.view.update_info_label(self.model.current_score, self.model.current_pos, self.model.template_angle_degrees)
 
     def handle_canvas_configure(self, event):
+        if self.worker.busy: self._deferred_canvas_events['configure'] = event; return # Вид обновится по завершении задания
         self._update_full_view(update_info=True, update_image_params_display=False, update_angle_display=False)
\ No newline at end of file
@@ -0,0 +1,40 @@
+# controller/Diagnostics.py
+from tkinter import filedialog, messagebox
+from model.Instrumentation import INSTRUMENTATION
+from view.StatusBar import StatusBar
+
+STATUS_REFRESH_MS = 500 # Период обновления строки состояния (перерисовка - только если были новые замеры)
+
+class DiagnosticsController:
+    """
+    Строка состояния вкладки: показывает замеры операций с префиксами prefixes (см. model.Instrumentation),
+    экспортирует все замеры в JSON и включает/выключает запись профиля cProfile (общую для обеих вкладок):
+    профилируются все действия пользователя между включением и выключением, включая фоновые задания.
+    """
+    def __init__(self, parent_frame, prefixes=None):
+        self.prefixes = prefixes
+        self.status_bar = StatusBar(parent_frame, self)
+        self._shown_version = None
+        self.status_bar.frame.after(STATUS_REFRESH_MS, self._refresh)
+
+    def _refresh(self):
+        if INSTRUMENTATION.version != self._shown_version:
+            self._shown_version = INSTRUMENTATION.version
+            self.status_bar.update_status(INSTRUMENTATION.summary(self.prefixes))
+            self.status_bar.set_profiling(INSTRUMENTATION.profiling) # Запись могла быть переключена на другой вкладке
+        self.status_bar.frame.after(STATUS_REFRESH_MS, self._refresh)
+
+    def handle_export_timings(self):
+        filename = filedialog.asksaveasfilename(title="Сохранить замеры", defaultextension=".json", initialfile="timings.json",
+                                                filetypes=[("JSON", "*.json"), ("All files", "*.*")], parent=self.status_bar.frame)
+        if not filename: return
+        try: INSTRUMENTATION.export_json(filename); print(f"Замеры сохранены в '{filename}'")
+        except Exception as e: messagebox.showerror("Ошибка сохранения", str(e), parent=self.status_bar.frame)
+
+    def handle_toggle_profiling(self):
+        if self.status_bar.is_profiling_requested(): INSTRUMENTATION.start_profiling(); print("Запись профиля начата"); return
+        filename = filedialog.asksaveasfilename(title="Сохранить профиль (pstats)", defaultextension=".prof", initialfile="profile.prof",
+                                                filetypes=[("cProfile stats", "*.prof"), ("All files", "*.*")], parent=self.status_bar.frame)
+        try: INSTRUMENTATION.stop_profiling(filename or None)
+        except Exception as e: messagebox.showerror("Ошибка сохранения профиля", str(e), parent=self.status_bar.frame); return
+        print(f"Профиль сохранен в '{filename}' (snakeviz, flameprof, gprof2dot)" if filename else "Запись профиля отменена")
@@ -3,11 +3,13 @@ import tkinter as tk
 from tkinter import messagebox, filedialog
 from model.DrawingModel import DrawingModel
 from view.DrawingView import DrawingView, DRAWING_PIXEL_SIZE
+from controller.Diagnostics import DiagnosticsController
 
 class DrawingController:
     def __init__(self, parent_frame):
         self.model = DrawingModel(40, 40)
         self.view = DrawingView(parent_frame, self)
+        self.diagnostics = DiagnosticsController(self.view.frame, prefixes=('drawing.', 'view.drawing.')) # Строка состояния с замерами редактора
         self._update_view()
 
     def _update_view(self):
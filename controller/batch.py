@@ -0,0 +1,132 @@
+# controller/batch.py
+"""
+Пакетный поиск без графического интерфейса: много изображений x много шаблонов.
+Каждое изображение обрабатывается в отдельном процессе: декодирование и фильтр границ выполняются
+один раз и используются для всех шаблонов. Результаты выводятся построчно (CSV или JSON lines)
+по мере готовности изображений.
+
+Пример:
+    python controller/batch.py "data/*.png" -t templates/*.xml --filter sobel --blur \
+        --meters-per-pixel 0.05 --angles 0 360 5 --format jsonl -o results.jsonl
+"""
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Добавляем корневую директорию проекта в sys.path (как в main.py)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from model.ComparisonModel import ComparisonModel, MATCH_METHODS
+
+FILTERS = ('sobel', 'kirsch', 'roberts', 'prewitt')
+RESULT_FIELDS = ['image', 'template', 'filter', 'method', 'score', 'row', 'col', 'angle', 'scale', 'variants', 'image_seconds', 'search_seconds', 'error']
+
+def expand_globs(patterns):
+    """ Раскрывает шаблоны имен файлов; несуществующий шаблон без '*' оставляется как есть (ошибка будет в строке результата) """
+    files = []
+    for pattern in patterns:
+        matched = sorted(glob.glob(pattern))
+        files.extend(matched if matched else ([] if glob.has_magic(pattern) else [pattern]))
+    return list(dict.fromkeys(files))
+
+def _prepare_image(model, image_path, options):
+    """ Загрузка изображения, физические параметры, размытие и фильтр - один раз на изображение """
+    if options.get('bank'): model.load_template_bank(options['bank'])
+    model.load_image(image_path)
+    if options['meters_per_pixel']: model.set_image_physical_parameters(meters_per_pixel=options['meters_per_pixel'])
+    if options['blur']: model.toggle_gaussian_blur()
+    filter_kwargs = {'threshold_value': options['threshold']} if options['threshold'] is not None else {}
+    getattr(model, f"apply_{options['filter']}")(**filter_kwargs)
+    model.set_match_method(options['method'])
+
+def _process_image(image_path, template_paths, options):
+    rows = []; base = {'image': image_path, 'filter': options['filter'], 'method': options['method']}
+    model = ComparisonModel()
+    try:
+        start_time = time.perf_counter(); _prepare_image(model, image_path, options)
+        image_seconds = time.perf_counter() - start_time
+    except Exception as e: return [dict(base, template=t, error=f"Изображение: {e}") for t in template_paths]
+    for template_path in template_paths:
+        row = dict(base, template=template_path, image_seconds=round(image_seconds, 4))
+        try:
+            start_time = time.perf_counter()
+            model.load_template_from_xml(template_path)
+            score, pos, angle, scale = model.find_best_match_sweep(*options['angles'], *options['scales'], max_workers=1)
+            row.update(score=round(score, 6), row=pos[0], col=pos[1], angle=round(angle, 4), scale=round(scale, 6),
+                       variants=len(model.sweep_results), search_seconds=round(time.perf_counter() - start_time, 4))
+        except Exception as e: row['error'] = str(e)
+        rows.append(row)
+    return rows
+
+def process_image(image_path, template_paths, options):
+    """ Все шаблоны на одном изображении (выполняется в процессе пула). Возвращает список строк результата. """
+    # Диагностические сообщения модели не должны смешиваться с результатами в stdout
+    log = sys.stderr if options['verbose'] else open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(log): return _process_image(image_path, template_paths, options)
+    finally:
+        if log is not sys.stderr: log.close()
+
+class ResultWriter:
+    """ Построчный вывод результатов в CSV или JSON lines """
+    def __init__(self, stream, output_format):
+        self.stream = stream; self.output_format = output_format
+        if output_format == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=RESULT_FIELDS, extrasaction='ignore'); self._csv.writeheader()
+
+    def write(self, row):
+        if self.output_format == 'csv': self._csv.writerow(row)
+        else: self.stream.write(json.dumps({k: row.get(k) for k in RESULT_FIELDS if k in row}, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Пакетный поиск шаблонов (.xml) на изображениях без графического интерфейса.")
+    parser.add_argument('images', nargs='+', help="Файлы изображений или шаблоны имен (glob)")
+    parser.add_argument('-t', '--templates', nargs='+', required=True, help="XML-файлы шаблонов (<polygon>) или шаблоны имен")
+    parser.add_argument('--bank', default=None, help="Банк шаблонов (.tplbank, см. controller/compile_bank.py)")
+    parser.add_argument('--filter', choices=FILTERS, default='sobel', help="Фильтр границ (по умолчанию sobel)")
+    parser.add_argument('--threshold', type=int, default=None, help="Порог фильтра (по умолчанию - как в интерфейсе)")
+    parser.add_argument('--blur', action='store_true', help="Размытие по Гауссу 5x5 перед фильтром")
+    parser.add_argument('--meters-per-pixel', type=float, default=0.0, help="Масштаб изображений, м/пкс (для автоподстройки масштаба шаблона)")
+    parser.add_argument('--method', choices=list(MATCH_METHODS), default='exhaustive', help="Метод поиска")
+    parser.add_argument('--angles', type=float, nargs=3, default=(0.0, 0.0, 1.0), metavar=('НАЧАЛО', 'КОНЕЦ', 'ШАГ'), help="Диапазон углов, градусы (конец не включается)")
+    parser.add_argument('--scales', type=float, nargs=3, default=(1.0, 1.0, 0.05), metavar=('МИН', 'МАКС', 'ШАГ'), help="Множители масштаба шаблона")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Число процессов")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv', help="Формат вывода")
+    parser.add_argument('-o', '--output', default=None, help="Файл результатов (по умолчанию stdout)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Сообщения модели в stderr")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    images = expand_globs(args.images); templates = expand_globs(args.templates)
+    if not images: print("Не найдено ни одного изображения.", file=sys.stderr); return 2
+    if not templates: print("Не найдено ни одного шаблона.", file=sys.stderr); return 2
+    options = {'filter': args.filter, 'threshold': args.threshold, 'blur': args.blur, 'meters_per_pixel': args.meters_per_pixel,
+               'method': args.method, 'bank': args.bank, 'angles': tuple(args.angles), 'scales': tuple(args.scales), 'verbose': args.verbose}
+    stream = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    writer = ResultWriter(stream, args.format); failures = 0
+    start_time = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(images)))) as executor:
+            futures = {executor.submit(process_image, image, templates, options): image for image in images}
+            for future in as_completed(futures):
+                try: rows = future.result()
+                except Exception as e: rows = [{'image': futures[future], 'template': t, 'error': f"Процесс: {e}"} for t in templates]
+                for row in rows:
+                    failures += 1 if row.get('error') else 0; writer.write(row)
+    finally:
+        if stream is not sys.stdout: stream.close()
+    print(f"Готово: {len(images)} изобр. x {len(templates)} шабл., ошибок {failures}, {time.perf_counter() - start_time:.1f} с", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# controller/compile_bank.py
+"""
+Компиляция XML-шаблонов в банк (.tplbank): растеризованный контур и варианты для сетки углов x масштабов.
+Банк подключается во вкладке сравнения ("Банк шаблонов...") или в пакетном поиске (--bank):
+загрузка шаблона и смена угла на сетке становятся поиском в банке вместо растеризации и warpAffine.
+Масштабы - абсолютные (template_scale_factor после автоподстройки под м/пкс изображения).
+
+Пример:
+    python controller/compile_bank.py templates/*.xml -o templates.tplbank --angles 0 360 1 --scales 0.5 1.5 0.05
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Добавляем корневую директорию проекта в sys.path (как в main.py)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from model.TemplateBank import compile_template_bank
+from controller.batch import expand_globs
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Компиляция XML-шаблонов (<polygon>) в банк вариантов.")
+    parser.add_argument('templates', nargs='+', help="XML-файлы шаблонов или шаблоны имен (glob)")
+    parser.add_argument('-o', '--output', default='templates.tplbank', help="Файл банка (по умолчанию templates.tplbank)")
+    parser.add_argument('--angles', type=float, nargs=3, default=(0.0, 360.0, 1.0), metavar=('НАЧАЛО', 'КОНЕЦ', 'ШАГ'), help="Диапазон углов, градусы (конец не включается)")
+    parser.add_argument('--scales', type=float, nargs=3, default=(1.0, 1.0, 0.05), metavar=('МИН', 'МАКС', 'ШАГ'), help="Абсолютные масштабы шаблона")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    templates = expand_globs(args.templates)
+    if not templates: print("Не найдено ни одного шаблона.", file=sys.stderr); return 2
+    angle_start, angle_end, angle_step = args.angles; scale_min, scale_max, scale_step = args.scales
+    if angle_step <= 0 or scale_step <= 0 or angle_end < angle_start or scale_max < scale_min or scale_min <= 0:
+        print("Некорректная сетка углов/масштабов.", file=sys.stderr); return 2
+    angles = np.arange(angle_start, angle_end, angle_step) if angle_end > angle_start else np.array([angle_start])
+    scales = np.arange(scale_min, scale_max + scale_step * 0.5, scale_step)
+    start_time = time.perf_counter()
+    def progress(fraction, text): print(f"\r{text}", end='', file=sys.stderr, flush=True)
+    count = compile_template_bank(templates, args.output, angles.tolist(), scales.tolist(), progress=progress)
+    print(f"\nБанк '{args.output}': {count} шабл. x {len(angles) * len(scales)} вариантов, "
+          f"{os.path.getsize(args.output) / 2**20:.1f} МБ, {time.perf_counter() - start_time:.1f} с", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,30 @@
 # model/ComparisonModel.py
+import os
+import time
+import hashlib
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
-from .DrawingModel import DrawingModel, GRID_MARGIN
-
-CV2_MATCH_METHOD = cv2.TM_CCORR # Используем базовую кросс-корреляцию
-
-# Ядра для операторов (определяем один раз)
-PREWITT_KERNEL_X = np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]], dtype=np.float32)
-PREWITT_KERNEL_Y = np.array([[-1,-1,-1], [ 0, 0, 0], [ 1, 1, 1]], dtype=np.float32)
-ROBERTS_KERNEL_X = np.array([[+1, 0], [ 0,-1]], dtype=np.float32)
-ROBERTS_KERNEL_Y = np.array([[ 0,+1], [-1, 0]], dtype=np.float32)
-KIRSCH_KERNELS = [
-    np.array([[ 5,  5,  5], [-3,  0, -3], [-3, -3, -3]], dtype=np.float32), # N
-    np.array([[ 5,  5, -3], [ 5,  0, -3], [-3, -3, -3]], dtype=np.float32), # NW
-    np.array([[ 5, -3, -3], [ 5,  0, -3], [ 5, -3, -3]], dtype=np.float32), # W
-    np.array([[-3, -3, -3], [ 5,  0, -3], [ 5,  5, -3]], dtype=np.float32), # SW
-    np.array([[-3, -3, -3], [-3,  0, -3], [ 5,  5,  5]], dtype=np.float32), # S
-    np.array([[-3, -3, -3], [-3,  0,  5], [-3,  5,  5]], dtype=np.float32), # SE
-    np.array([[-3, -3,  5], [-3,  0,  5], [-3, -3,  5]], dtype=np.float32), # E
-    np.array([[-3,  5,  5], [-3,  0,  5], [-3, -3, -3]], dtype=np.float32)  # NE
-]
+from .TemplateBank import TemplateBank, template_file_hash, rasterize_template_xml, rotate_and_scale_template, variant_key
+from .ProcessingPipeline import ProcessingPipeline
+from .Instrumentation import timed
+from .TiledProcessor import TiledProcessor, TILE_SIZE
+from .SequenceTracker import SequenceTracker, TRACK_WINDOW_PIXELS, TRACK_WINDOW_DEGREES, TRACK_FALLBACK_SCORE, TRACK_FALLBACK_DEGREES
+from .EdgeFilters import edge_filter, PREWITT_KERNEL_X, PREWITT_KERNEL_Y, ROBERTS_KERNEL_X, ROBERTS_KERNEL_Y, KIRSCH_KERNELS
+from .MatchingEngines import CV2_MATCH_METHOD, match_best_exhaustive, exhaustive_score_map, best_match_from_score_map, build_edge_pyramid, match_best_pyramid, FFTCorrelator, ChamferMatcher, SparseTemplate, SparseScorer, PackedTemplate, BitPackedMatcher, detect_peaks, DETECTION_MAX_OVERLAP
+
+# Доступные методы поиска лучшего совпадения (ключ -> подпись в интерфейсе)
+MATCH_METHODS = {
+    'exhaustive': "Полный перебор",
+    'pyramid': "Пирамида (грубо -> точно)",
+    'fft': "БПФ-корреляция",
+    'chamfer': "Chamfer (карта расстояний)",
+    'bitpacked': "Упакованные биты (AND + popcount)",
+}
+
+TEMPLATE_CACHE_LIMIT_BYTES = 64 * 1024 * 1024 # LRU повернутых/масштабированных шаблонов
+PRECOMPUTE_NEIGHBOUR_DEGREES = 10 # Сколько соседних углов (шаг 1°) готовить заранее в каждую сторону
 
 class ComparisonModel:
     def __init__(self):
@@ -42,13 +46,34 @@ class ComparisonModel:
         self.template_height_pixels_from_xml = 0
         self.best_score = 0.0; self.best_pos = (-1, -1)
         self.current_pos = (0, 0); self.current_score = 0.0
-
+        self.score_map = None # Нормированная карта счетов (float32) текущего шаблона на активном изображении границ
+        self.show_score_heatmap = False; self._heatmap_image = None
+        self.sweep_results = [] # Таблица последнего перебора углов/масштабов
+        self.match_method = 'exhaustive'; self.last_search_seconds = 0.0
+        self.tiled_result = None # Результат последнего поиска в большом файле по тайлам
+        self.template_set_results = [] # Таблица последнего поиска набора шаблонов (по убыванию счета)
+        self.sequence_results = [] # Сопровождение по последовательности кадров: строка на кадр
+        self.detections = None # Все совпадения текущего шаблона: {'scores', 'positions', 'template_shape', ...}
+        # Размытие, границы, пирамиды, спектры и карты счетов - узлы ленивого мемоизированного графа
+        self.pipeline = ProcessingPipeline()
+        self._blur_params = ((5, 5), 0)
+        self._edge_keys = {} # режим фильтра -> ключ узла границ в pipeline
+        self._sparse_template = None # Текущий шаблон в виде отрезков (SparseTemplate)
+        self._packed_template = None # Текущий шаблон в упакованном виде для 8 битовых сдвигов (PackedTemplate)
+        self._template_content_key = None # Хэш исходного шаблона (часть ключа карты счетов)
+        self.template_bank = None # Предкомпилированный банк шаблонов (TemplateBank) или None
+        self._template_file_hash = None # SHA-1 XML текущего шаблона (ключ в банке)
+        # (шаблон, угол, масштаб) -> (пиксели, макс. счет); тот же LRU по байтам, что и у графа обработки
+        self._template_cache = ProcessingPipeline(limit_bytes=TEMPLATE_CACHE_LIMIT_BYTES)
+
+    @timed('comparison.load_image')
     def load_image(self, filename):
         try:
             img = cv2.imread(filename, cv2.IMREAD_GRAYSCALE)
             if img is None: raise ValueError(f"Не удалось загрузить изображение.")
             self.original_image = img; self.grayscale_image = img
             self.image_rows, self.image_cols = img.shape[:2]
+            self.pipeline.set_source(img); self._edge_keys = {}
             self.gaussian_blur_active = False; self.blurred_image = None
             self.sobel_image = None; self.kirsch_image = None
             self.roberts_image = None; self.prewitt_image = None
@@ -65,12 +90,20 @@ class ComparisonModel:
         elif self.grayscale_image is not None: return self.grayscale_image
         else: return None
 
+    def _get_filter_input_key(self):
+        if self.gaussian_blur_active: return ProcessingPipeline.blur_key(*self._blur_params)
+        return ProcessingPipeline.SOURCE_KEY
+
+    @timed('comparison.blur')
     def toggle_gaussian_blur(self, ksize=(5, 5), sigmaX=0):
         if self.grayscale_image is None: return False
         if not self.gaussian_blur_active:
-            try: self.blurred_image = cv2.GaussianBlur(self.grayscale_image, ksize, sigmaX); self.gaussian_blur_active = True
+            try:
+                self.blurred_image = self.pipeline.input_image(ProcessingPipeline.blur_key(ksize, sigmaX)) # Повторное включение - из кэша
+                self._blur_params = (ksize, sigmaX); self.gaussian_blur_active = True
             except Exception as e: print(f"Error Gaussian Blur: {e}"); self.gaussian_blur_active = False; self.blurred_image = None; return False
         else: self.gaussian_blur_active = False; self.blurred_image = None
+        self._set_score_map(None)
         current_mode = self.image_display_mode
         try:
             if not self.gaussian_blur_active or current_mode != 'original': self.image_display_mode = 'original'
@@ -82,73 +115,54 @@ class ComparisonModel:
         except Exception as e: print(f"Error re-applying filter: {e}"); self.image_display_mode = 'original'; self.reset_results(); return False
         return True
 
-    def _apply_edge_filter(self, filter_func, *args, **kwargs):
+    def _apply_edge_filter(self, filter_name, filter_func, **kwargs):
         input_img = self._get_image_for_filtering()
         if input_img is None: raise ValueError("Нет изображения для применения фильтра.")
         try:
-            edge_image_01 = filter_func(input_img, *args, **kwargs)
+            # Результат мемоизирован по (фильтр, параметры, вход): повторное переключение фильтров мгновенно
+            edges_key, edge_image_01 = self.pipeline.edges(filter_name, filter_func, kwargs, self._get_filter_input_key())
+            self._edge_keys[filter_name] = edges_key
             return edge_image_01
         except Exception as e:
             raise Exception(f"Ошибка при применении фильтра {filter_func.__name__}: {str(e)}")
 
+    # Фильтры считаются в int16/int32 (точно) с переиспользуемыми буферами, см. EdgeFilters
+    @timed('filter.sobel')
     def _sobel_logic(self, img, ksize=3, threshold_value=50):
-        sobelx = cv2.Sobel(img, cv2.CV_64F, 1, 0, ksize=ksize)
-        sobely = cv2.Sobel(img, cv2.CV_64F, 0, 1, ksize=ksize)
-        magnitude = np.sqrt(sobelx**2 + sobely**2)
-        if np.max(magnitude) > 0: magnitude = (magnitude / np.max(magnitude) * 255)
-        magnitude = magnitude.astype(np.uint8)
-        _, binary = cv2.threshold(magnitude, threshold_value, 255, cv2.THRESH_BINARY)
-        return (binary // 255).astype(np.uint8)
+        return edge_filter('sobel', img, threshold_value, ksize=ksize)
 
+    @timed('filter.kirsch')
     def _kirsch_logic(self, img, threshold_value=60):
-        gray_float = img.astype(np.float32)
-        convolved_images = [cv2.filter2D(gray_float, -1, k) for k in KIRSCH_KERNELS]
-        max_magnitude = np.max(np.abs(np.stack(convolved_images, axis=0)), axis=0)
-        if np.max(max_magnitude) > 0: max_magnitude = (max_magnitude / np.max(max_magnitude) * 255)
-        max_magnitude = max_magnitude.astype(np.uint8)
-        _, binary = cv2.threshold(max_magnitude, threshold_value, 255, cv2.THRESH_BINARY)
-        return (binary // 255).astype(np.uint8)
+        return edge_filter('kirsch', img, threshold_value)
 
+    @timed('filter.roberts')
     def _roberts_logic(self, img, threshold_value=30):
-        img_float = img.astype(np.float64)
-        roberts_x_img = cv2.filter2D(img_float, -1, ROBERTS_KERNEL_X)
-        roberts_y_img = cv2.filter2D(img_float, -1, ROBERTS_KERNEL_Y)
-        magnitude = np.sqrt(roberts_x_img**2 + roberts_y_img**2)
-        if np.max(magnitude) > 0: magnitude = (magnitude / np.max(magnitude) * 255)
-        magnitude = magnitude.astype(np.uint8)
-        _, binary = cv2.threshold(magnitude, threshold_value, 255, cv2.THRESH_BINARY)
-        return (binary // 255).astype(np.uint8)
+        return edge_filter('roberts', img, threshold_value)
 
+    @timed('filter.prewitt')
     def _prewitt_logic(self, img, threshold_value=50):
-        img_float = img.astype(np.float64)
-        prewitt_x_img = cv2.filter2D(img_float, -1, PREWITT_KERNEL_X)
-        prewitt_y_img = cv2.filter2D(img_float, -1, PREWITT_KERNEL_Y)
-        magnitude = np.sqrt(prewitt_x_img**2 + prewitt_y_img**2)
-        if np.max(magnitude) > 0: magnitude = (magnitude / np.max(magnitude) * 255)
-        magnitude = magnitude.astype(np.uint8)
-        _, binary = cv2.threshold(magnitude, threshold_value, 255, cv2.THRESH_BINARY)
-        return (binary // 255).astype(np.uint8)
+        return edge_filter('prewitt', img, threshold_value)
 
     def apply_sobel(self, ksize=3, threshold_value=50):
-        self.sobel_image = self._apply_edge_filter(self._sobel_logic, ksize=ksize, threshold_value=threshold_value)
+        self.sobel_image = self._apply_edge_filter('sobel', self._sobel_logic, ksize=ksize, threshold_value=threshold_value)
         self.image_display_mode = 'sobel'
         self.reset_results(); self._recalculate_current_score()
         print(f"Собель применен {'с размытием' if self.gaussian_blur_active else 'без размытия'}.")
 
     def apply_kirsch(self, threshold_value=60):
-        self.kirsch_image = self._apply_edge_filter(self._kirsch_logic, threshold_value=threshold_value)
+        self.kirsch_image = self._apply_edge_filter('kirsch', self._kirsch_logic, threshold_value=threshold_value)
         self.image_display_mode = 'kirsch'
         self.reset_results(); self._recalculate_current_score()
         print(f"Кирш применен {'с размытием' if self.gaussian_blur_active else 'без размытия'}.")
 
     def apply_roberts(self, threshold_value=30):
-        self.roberts_image = self._apply_edge_filter(self._roberts_logic, threshold_value=threshold_value)
+        self.roberts_image = self._apply_edge_filter('roberts', self._roberts_logic, threshold_value=threshold_value)
         self.image_display_mode = 'roberts'
         self.reset_results(); self._recalculate_current_score()
         print(f"Робертс применен {'с размытием' if self.gaussian_blur_active else 'без размытия'}.")
 
     def apply_prewitt(self, threshold_value=50):
-        self.prewitt_image = self._apply_edge_filter(self._prewitt_logic, threshold_value=threshold_value)
+        self.prewitt_image = self._apply_edge_filter('prewitt', self._prewitt_logic, threshold_value=threshold_value)
         self.image_display_mode = 'prewitt'
         self.reset_results(); self._recalculate_current_score()
         print(f"Превитт применен {'с размытием' if self.gaussian_blur_active else 'без размытия'}.")
@@ -161,35 +175,30 @@ class ComparisonModel:
 
     def get_display_image(self):
         active_edge_image = self._get_active_edge_image()
-        if active_edge_image is not None: return (active_edge_image * 255).astype(np.uint8)
+        # Только готовая карта: ее строит фоновое задание (prepare_heatmap), пока ее нет - обычное изображение границ
+        if self.show_score_heatmap and active_edge_image is not None and self.score_map is not None: return self._get_heatmap_image()
+        # Один и тот же массив, пока границы не изменились: вид по нему кэширует масштабированный фон
+        if active_edge_image is not None: return self.pipeline.derived('display', self._get_active_edge_key(), lambda: active_edge_image * np.uint8(255))
         elif self.gaussian_blur_active and self.blurred_image is not None: return self.blurred_image
         elif self.grayscale_image is not None: return self.grayscale_image
         else: return None
 
+    def _read_template_source(self, filename):
+        """ (пиксели контура, физ. высота, высота в пикселях, хэш XML, источник) - из банка, если он есть, иначе из XML """
+        content_hash = template_file_hash(filename)
+        if self.template_bank is not None and content_hash in self.template_bank:
+            return (*self.template_bank.original(content_hash), content_hash, "банк")
+        return (*rasterize_template_xml(filename), content_hash, "XML")
+
+    @timed('template.load_xml')
     def load_template_from_xml(self, filename):
         try:
-            parser_model = DrawingModel(1, 1)
-            parser_model.load_from_xml(filename)
-            if not parser_model.vertices: raise ValueError("В файле не найдено корректных вершин.")
-            self.template_physical_height_meters_from_xml = parser_model.template_physical_height_meters
-            min_y_tpl, max_y_tpl = float('inf'), float('-inf')
-            if parser_model.vertices:
-                for _, y_coord in parser_model.vertices:
-                    if y_coord < min_y_tpl: min_y_tpl = y_coord
-                    if y_coord > max_y_tpl: max_y_tpl = y_coord
-                self.template_height_pixels_from_xml = (max_y_tpl - min_y_tpl + 1) if max_y_tpl >= min_y_tpl else 0
-            else: self.template_height_pixels_from_xml = 0
-            print(f"Загружено из XML: Физ. высота шаблона = {self.template_physical_height_meters_from_xml} м, Пикс. высота шаблона = {self.template_height_pixels_from_xml}")
-            max_x = -1; max_y = -1
-            for x, y in parser_model.vertices:
-                if x > max_x: max_x = x
-                if y > max_y: max_y = y
-            template_actual_rows = max_y + 1; template_actual_cols = max_x + 1
-            if template_actual_rows <= 0 or template_actual_cols <= 0: raise ValueError("Не удалось определить размеры шаблона.")
-            outline_model = DrawingModel(template_actual_rows, template_actual_cols)
-            outline_model.vertices = parser_model.vertices
-            outline_model.update_field()
-            self.original_template_pixels = np.array(outline_model.pixel_field, dtype=np.uint8)
+            pixels, physical_height, height_pixels, content_hash, source = self._read_template_source(filename)
+            self.template_physical_height_meters_from_xml = physical_height
+            self.template_height_pixels_from_xml = height_pixels
+            print(f"Загружено из {source}: Физ. высота шаблона = {self.template_physical_height_meters_from_xml} м, Пикс. высота шаблона = {self.template_height_pixels_from_xml}")
+            self.original_template_pixels = pixels; self._template_file_hash = content_hash
+            self._template_content_key = hashlib.sha1(self.original_template_pixels.tobytes() + str(self.original_template_pixels.shape).encode()).hexdigest()
             if np.sum(self.original_template_pixels) == 0: print("Предупреждение: Шаблон пуст после отрисовки.")
             self.template_angle_degrees = 0.0
             self._adjust_template_scale_to_image()
@@ -211,13 +220,19 @@ class ComparisonModel:
         self._recalculate_current_score()
         return True
 
+    def _scale_factor_for_template(self, physical_height_meters, height_pixels):
+        """ Масштаб шаблона по м/пкс изображения и XML; None, если данных недостаточно """
+        if self.image_meters_per_pixel <= 0 or physical_height_meters <= 0 or height_pixels <= 0: return None
+        return (physical_height_meters / height_pixels) / self.image_meters_per_pixel
+
     def _adjust_template_scale_to_image(self):
-        if self.original_template_pixels is None or self.image_meters_per_pixel <= 0 or \
-           self.template_physical_height_meters_from_xml <= 0 or self.template_height_pixels_from_xml <= 0:
+        new_scale_factor = None
+        if self.original_template_pixels is not None:
+            new_scale_factor = self._scale_factor_for_template(self.template_physical_height_meters_from_xml, self.template_height_pixels_from_xml)
+        if new_scale_factor is None:
             print("Недостаточно данных для автоподстройки масштаба шаблона. Используется текущий относительный масштаб.")
             return self._apply_template_scale()
         template_xml_m_per_pixel = self.template_physical_height_meters_from_xml / self.template_height_pixels_from_xml
-        new_scale_factor = template_xml_m_per_pixel / self.image_meters_per_pixel
         print(f"Автоподстройка: Image м/пкс={self.image_meters_per_pixel:.4f}, "
               f"Tpl XML м/пкс={template_xml_m_per_pixel:.4f}, "
               f"Новый фактор масштаба={new_scale_factor:.3f}")
@@ -239,45 +254,61 @@ class ComparisonModel:
             print(f"Не удалось применить угол {self.template_angle_degrees:.1f}°.")
             return False
 
+    def load_template_bank(self, filename):
+        """ Подключает банк шаблонов; шаблоны из него загружаются и поворачиваются без растеризации """
+        bank = TemplateBank(filename)
+        if self.template_bank is not None: self.template_bank.close()
+        self.template_bank = bank
+        print(f"Банк шаблонов '{filename}': {', '.join(f'{name} ({count} вар.)' for name, _, count in bank.describe())}")
+        return len(bank)
+
+    def _template_variant(self, angle_degrees, scale_factor):
+        """
+        (пиксели, макс. счет) повернутого/масштабированного шаблона из LRU-кэша по (шаблон, угол, масштаб).
+        При промахе - из банка, если вариант скомпилирован, иначе warpAffine. Пиксели только для чтения (общие с кэшем).
+        """
+        key = ('template', self._template_content_key) + variant_key(angle_degrees, scale_factor)
+        return self._template_cache.get(key, lambda: self._compute_template_variant(angle_degrees, scale_factor))
+
+    @timed('template.rotate_scale')
+    def _compute_template_variant(self, angle_degrees, scale_factor):
+        template = None
+        if self.template_bank is not None and self._template_file_hash is not None:
+            template = self.template_bank.variant(self._template_file_hash, angle_degrees, scale_factor)
+        if template is None: template = rotate_and_scale_template(self.original_template_pixels, angle_degrees, scale_factor)
+        if template is None: return None, 0
+        template.setflags(write=False)
+        return template, int(np.sum(template))
+
+    def precompute_template_neighbours(self, radius_degrees=PRECOMPUTE_NEIGHBOUR_DEGREES, step_degrees=1.0, progress=None):
+        """
+        Спекулятивно заполняет кэш углами текущий ± k*шаг (ближние первыми) при текущем масштабе,
+        чтобы повороты кнопками брали готовый шаблон. progress(доля, текст) вызывается перед каждым углом
+        (исключение из него прерывает предрасчет). Возвращает число посчитанных вариантов.
+        """
+        if self.original_template_pixels is None: return 0
+        center = self.template_angle_degrees; scale = self.template_scale_factor
+        steps = int(radius_degrees / step_degrees); computed = 0
+        angles = [center + sign * k * step_degrees for k in range(1, steps + 1) for sign in (1, -1)]
+        for index, angle in enumerate(angles):
+            if progress: progress(index / len(angles), f"угол {angle % 360.0:.1f}°")
+            key = ('template', self._template_content_key) + variant_key(angle, scale)
+            if self._template_cache.peek(key) is None: self._template_variant(angle, scale); computed += 1
+        return computed
+
     def _apply_template_scale(self): # Теперь также применяет поворот
         if self.original_template_pixels is None: return False
-
-        # 1. Поворот оригинального шаблона (original_template_pixels)
-        src_h, src_w = self.original_template_pixels.shape[:2]
-        if src_h == 0 or src_w == 0: return False # Нечего поворачивать/масштабировать
-
-        center_x, center_y = src_w / 2.0, src_h / 2.0 # Используем float для центра
-        rotation_matrix = cv2.getRotationMatrix2D((center_x, center_y), self.template_angle_degrees, 1.0)
-
-        cos_abs = np.abs(rotation_matrix[0, 0])
-        sin_abs = np.abs(rotation_matrix[0, 1])
-        new_w = int(np.ceil((src_h * sin_abs) + (src_w * cos_abs))) # Округляем вверх
-        new_h = int(np.ceil((src_h * cos_abs) + (src_w * sin_abs)))
-
-        rotation_matrix[0, 2] += (new_w / 2.0) - center_x
-        rotation_matrix[1, 2] += (new_h / 2.0) - center_y
-
-        # Применяем поворот к original_template_pixels
-        rotated_template = cv2.warpAffine(self.original_template_pixels, rotation_matrix, (new_w, new_h),
-                                          flags=cv2.INTER_NEAREST, borderValue=0) # INTER_NEAREST для бинарных
-        rotated_template_binary = (rotated_template > 0.5).astype(np.uint8)
-
-        # 2. Масштабирование повернутого шаблона
-        current_scale_factor = self.template_scale_factor
-        final_rows = max(1, int(np.round(rotated_template_binary.shape[0] * current_scale_factor)))
-        final_cols = max(1, int(np.round(rotated_template_binary.shape[1] * current_scale_factor)))
-
-        if self.image_rows > 0 and self.image_cols > 0:
-             if final_rows > self.image_rows or final_cols > self.image_cols:
-                 print(f"Предупреждение: Повернутый/масштабированный шаблон ({final_rows}x{final_cols}) больше изображения ({self.image_rows}x{self.image_cols}).")
-                 return False
         try:
-            if final_rows <=0 or final_cols <=0: return False
-
-            scaled_and_rotated_template = cv2.resize(rotated_template_binary, (final_cols, final_rows), interpolation=cv2.INTER_NEAREST)
-            self.template_pixels = (scaled_and_rotated_template > 0.5).astype(np.uint8)
+            scaled_and_rotated_template, max_score = self._template_variant(self.template_angle_degrees, self.template_scale_factor)
+            if scaled_and_rotated_template is None: return False
+            final_rows, final_cols = scaled_and_rotated_template.shape
+            if self.image_rows > 0 and self.image_cols > 0:
+                 if final_rows > self.image_rows or final_cols > self.image_cols:
+                     print(f"Предупреждение: Повернутый/масштабированный шаблон ({final_rows}x{final_cols}) больше изображения ({self.image_rows}x{self.image_cols}).")
+                     return False
+            self.template_pixels = scaled_and_rotated_template; self._sparse_template = None; self._packed_template = None; self._set_score_map(None)
             self.template_rows, self.template_cols = self.template_pixels.shape
-            self.template_max_score = np.sum(self.template_pixels)
+            self.template_max_score = max_score
             return True
         except Exception as e: print(f"Ошибка масштабирования/поворота: {e}"); return False
 
@@ -288,7 +319,9 @@ class ComparisonModel:
         elif self.image_display_mode == 'prewitt' and self.prewitt_image is not None: return self.prewitt_image
         else: return None
 
-    def find_best_match(self):
+    @timed('match.{self.match_method}')
+    def find_best_match(self, progress=None):
+        """ Лучшее совпадение текущего шаблона. progress(доля, текст) вызывается перед записью результата в модель (может прервать поиск) """
         active_edge_image = self._get_active_edge_image()
         if active_edge_image is None: raise ValueError("Фильтр границ не применен.")
         if self.template_pixels is None: raise ValueError("Шаблон не загружен.")
@@ -297,34 +330,344 @@ class ComparisonModel:
             print("Предупреждение: Поиск с пустым шаблоном (max_score=0)."); self.best_score = 0.0; self.best_pos = (0, 0); self.current_pos = (0, 0); self.current_score = 0.0
             return self.best_score, self.best_pos
         try:
-            tpl_for_match = self.template_pixels
-            img_float = active_edge_image.astype(np.float32)
-            tpl_float = tpl_for_match.astype(np.float32)
-            result_map_raw = cv2.matchTemplate(img_float, tpl_float, CV2_MATCH_METHOD)
-            epsilon = 1e-7
-            result_map_normalized = result_map_raw / (self.template_max_score + epsilon)
-            minVal, maxVal, minLoc, maxLoc = cv2.minMaxLoc(result_map_normalized)
-            self.best_score = float(maxVal); best_r, best_c = maxLoc[1], maxLoc[0]
-            self.best_pos = (best_r, best_c); self.best_score = np.clip(self.best_score, 0.0, 1.0)
-            self.current_pos = self.best_pos; self.current_score = self.best_score
-            print(f"Лучшее совпадение (Custom Normalized CCORR на {self.image_display_mode}): счет={self.best_score:.4f} в {self.best_pos}, Угол: {self.template_angle_degrees:.1f}°") # Добавил угол
+            start_time = time.perf_counter()
+            prepared = self._prepare_match_input(active_edge_image)
+            score_map = None
+            if self.match_method != 'pyramid':
+                score_map = self.pipeline.get(self._score_map_key(self.match_method), lambda: self._score_map_prepared(prepared, self.template_pixels, self.template_max_score))
+            if score_map is not None: best_score, best_pos = best_match_from_score_map(score_map)
+            else: best_score, best_pos = self._match_prepared(prepared, self.template_pixels, self.template_max_score)
         except cv2.error as e:
              if "template size is larger than image size" in str(e): raise ValueError("Ошибка OpenCV: Шаблон больше изображения.")
              else: print(f"Ошибка cv2.matchTemplate: {e}"); self.reset_results(); raise Exception(f"Ошибка поиска: {str(e)}")
         except Exception as e: print(f"Неизвестная ошибка поиска: {e}"); self.reset_results(); raise Exception(f"Неизвестная ошибка поиска: {str(e)}")
+        if progress: progress(1.0, "результат") # Вытесненный поиск прерывается здесь и не меняет позицию шаблона
+        self.best_score, self.best_pos = best_score, best_pos
+        self._set_score_map(score_map) # Карта служит для O(1) оценки при перетаскивании и для тепловой карты
+        self.last_search_seconds = time.perf_counter() - start_time
+        self.current_pos = self.best_pos; self.current_score = self.best_score
+        print(f"Лучшее совпадение ({MATCH_METHODS[self.match_method]}, CCORR на {self.image_display_mode}): счет={self.best_score:.4f} в {self.best_pos}, "
+              f"Угол: {self.template_angle_degrees:.1f}°, время {self.last_search_seconds:.3f} с")
         return self.best_score, self.best_pos
 
+    def set_match_method(self, method):
+        if method not in MATCH_METHODS: raise ValueError(f"Неизвестный метод поиска '{method}'.")
+        if method != self.match_method: self.match_method = method; self._set_score_map(None)
+        self._recalculate_current_score()
+        print(f"Метод поиска: {MATCH_METHODS[method]}")
+
+    def _get_active_edge_key(self):
+        return self._edge_keys.get(self.image_display_mode) if self._get_active_edge_image() is not None else None
+
+    def _prepare_match_input(self, active_edge_image):
+        """ Данные изображения для текущего метода поиска (узлы pipeline, делятся между вариантами шаблона) """
+        edges_key = self._get_active_edge_key()
+        if self.match_method == 'pyramid': return self.pipeline.derived('pyramid', edges_key, lambda: build_edge_pyramid(active_edge_image))
+        if self.match_method == 'fft': return self.pipeline.derived('fft', edges_key, lambda: FFTCorrelator(active_edge_image))
+        if self.match_method == 'chamfer': return self._get_chamfer_matcher(active_edge_image)
+        if self.match_method == 'bitpacked': return self._get_bitpacked_matcher(active_edge_image)
+        return self.pipeline.edges_float32(edges_key, active_edge_image)
+
+    def _get_chamfer_matcher(self, active_edge_image):
+        return self.pipeline.derived('chamfer', self._get_active_edge_key(), lambda: ChamferMatcher(active_edge_image))
+
+    def _get_bitpacked_matcher(self, active_edge_image):
+        return self.pipeline.derived('packed', self._get_active_edge_key(), lambda: BitPackedMatcher(active_edge_image))
+
+    def _get_sparse_scorer(self, active_edge_image):
+        return self.pipeline.derived('sparse', self._get_active_edge_key(), lambda: SparseScorer(active_edge_image))
+
+    def _score_map_key(self, method):
+        """ Ключ узла карты счетов: изображение границ + метод + шаблон (содержимое, угол, масштаб) """
+        edges_key = self._get_active_edge_key()
+        if edges_key is None or self.template_pixels is None: return None
+        return ('score_map', edges_key, method, self._template_content_key, round(self.template_angle_degrees, 6), round(self.template_scale_factor, 9))
+
+    def _get_sparse_template(self):
+        if self._sparse_template is None and self.template_pixels is not None: self._sparse_template = SparseTemplate(self.template_pixels)
+        return self._sparse_template
+
+    def _get_packed_template(self, template_pixels=None):
+        if template_pixels is not None and template_pixels is not self.template_pixels: return PackedTemplate(template_pixels)
+        if self._packed_template is None and self.template_pixels is not None: self._packed_template = PackedTemplate(self.template_pixels)
+        return self._packed_template
+
+    def _match_prepared(self, prepared, template_pixels, template_max_score):
+        if self.match_method == 'pyramid': return match_best_pyramid(prepared, template_pixels, template_max_score)
+        if self.match_method in ('fft', 'chamfer'): return prepared.best_match(template_pixels, template_max_score)
+        if self.match_method == 'bitpacked': return prepared.best_match(self._get_packed_template(template_pixels), template_max_score)
+        # Большой разреженный шаблон с малым числом отрезков дешевле перебрать по префиксным суммам
+        sparse_template = self._get_sparse_template() if template_pixels is self.template_pixels else SparseTemplate(template_pixels)
+        if sparse_template.is_sparse_enough():
+            return self._get_sparse_scorer(self._get_active_edge_image()).best_match(sparse_template, template_max_score)
+        return match_best_exhaustive(prepared, template_pixels, template_max_score)
+
+    def _score_map_prepared(self, prepared, template_pixels, template_max_score):
+        """ Полная нормированная карта счетов для текущего метода (None для пирамиды - она карту не строит) """
+        if self.match_method == 'pyramid': return None
+        if self.match_method in ('fft', 'chamfer'): return prepared.score_map(template_pixels, template_max_score)
+        if self.match_method == 'bitpacked': return prepared.score_map(self._get_packed_template(template_pixels), template_max_score)
+        sparse_template = self._get_sparse_template() if template_pixels is self.template_pixels else SparseTemplate(template_pixels)
+        if sparse_template.is_sparse_enough():
+            return self._get_sparse_scorer(self._get_active_edge_image()).score_map(sparse_template, template_max_score)
+        return exhaustive_score_map(prepared, template_pixels, template_max_score)
+
+    @timed('match.score_map')
+    def compute_score_map(self):
+        """ Строит карту счетов текущего шаблона без изменения позиции (для тепловой карты) """
+        active_edge_image = self._get_active_edge_image()
+        if active_edge_image is None or self.template_pixels is None or self.template_max_score <= 0: return None
+        if self.score_map is None:
+            method = self.match_method if self.match_method != 'pyramid' else 'exhaustive' # Пирамида не дает полной карты
+            saved_method = self.match_method; self.match_method = method
+            try: self._set_score_map(self.pipeline.get(self._score_map_key(method), lambda: self._score_map_prepared(self._prepare_match_input(active_edge_image), self.template_pixels, self.template_max_score)))
+            finally: self.match_method = saved_method
+        return self.score_map
+
+    def _set_score_map(self, score_map):
+        self.score_map = score_map; self._heatmap_image = None
+        if score_map is None: self.detections = None # Совпадения найдены по прежней карте (другой шаблон/фильтр/метод)
+
+    def toggle_score_heatmap(self):
+        """ Включает/выключает отображение тепловой карты счетов. Возвращает новое состояние. """
+        if not self.show_score_heatmap and self.compute_score_map() is None: return False
+        self.show_score_heatmap = not self.show_score_heatmap
+        return self.show_score_heatmap
+
+    def prepare_heatmap(self):
+        """ Строит карту счетов, если тепловая карта включена, а карта сброшена (вызывается в фоновом потоке после каждого задания) """
+        if self.show_score_heatmap and self.score_map is None: self.compute_score_map()
+
+    def _get_heatmap_image(self):
+        """ RGB-изображение размера исходного: карта счетов в палитре JET, позиция = левый верхний угол шаблона """
+        if self._heatmap_image is None and self.score_map is not None:
+            normalized = cv2.normalize(self.score_map, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+            colored = cv2.cvtColor(cv2.applyColorMap(normalized, cv2.COLORMAP_JET), cv2.COLOR_BGR2RGB)
+            heatmap = np.zeros((self.image_rows, self.image_cols, 3), dtype=np.uint8)
+            heatmap[:colored.shape[0], :colored.shape[1]] = colored
+            self._heatmap_image = heatmap
+        return self._heatmap_image
+
+    @timed('match.detect')
+    def find_all_matches(self, threshold=None, top_k=None, max_overlap=DETECTION_MAX_OVERLAP, progress=None):
+        """
+        Все экземпляры шаблона: пики карты счетов со счетом >= threshold и/или K лучших, с подавлением
+        немаксимумов по рамке шаблона. Сильнейшее совпадение становится лучшим и текущим. Возвращает число совпадений.
+        progress(доля, текст) вызывается перед записью результата в модель (может прервать поиск).
+        """
+        if threshold is None and top_k is None: raise ValueError("Нужен порог счета или число совпадений K.")
+        start_time = time.perf_counter()
+        score_map = self.compute_score_map()
+        if score_map is None: raise ValueError("Нужны фильтр границ и шаблон.")
+        scores, positions = detect_peaks(score_map, self.template_pixels.shape, threshold=threshold, top_k=top_k, max_overlap=max_overlap)
+        if progress: progress(1.0, "результат")
+        self.detections = {'scores': scores, 'positions': positions, 'template_shape': self.template_pixels.shape,
+                           'threshold': threshold, 'top_k': top_k, 'seconds': time.perf_counter() - start_time}
+        if len(scores):
+            self.best_score = float(scores[0]); self.best_pos = tuple(int(v) for v in positions[0])
+            self.current_pos = self.best_pos; self.current_score = self.best_score
+        print(f"Найдено совпадений: {len(scores)} (порог {threshold}, K {top_k}), {self.detections['seconds']:.3f} с")
+        return len(scores)
+
+    def compare_search_methods(self, method='pyramid', progress=None):
+        """
+        Сравнивает метод с полным перебором на текущем шаблоне, не меняя результатов модели.
+        Возвращает словарь со временем обоих поисков, ускорением и признаком совпадения пика.
+        progress(доля, текст) вызывается перед каждым поиском (может прервать сравнение исключением).
+        """
+        active_edge_image = self._get_active_edge_image()
+        if active_edge_image is None: raise ValueError("Фильтр границ не применен.")
+        if self.template_pixels is None or self.template_max_score <= 0: raise ValueError("Шаблон не загружен.")
+        saved_method = self.match_method
+        timings = {}; results = {}
+        try:
+            for index, name in enumerate(('exhaustive', method)):
+                if progress: progress(index / 2, MATCH_METHODS[name])
+                self.match_method = name
+                start_time = time.perf_counter()
+                prepared = self._prepare_match_input(active_edge_image)
+                results[name] = self._match_prepared(prepared, self.template_pixels, self.template_max_score)
+                timings[name] = time.perf_counter() - start_time
+        finally: self.match_method = saved_method
+        report = {
+            'method': method,
+            'exhaustive_seconds': timings['exhaustive'], 'method_seconds': timings[method],
+            'speedup': timings['exhaustive'] / max(timings[method], 1e-9),
+            'exhaustive_score': results['exhaustive'][0], 'exhaustive_pos': results['exhaustive'][1],
+            'method_score': results[method][0], 'method_pos': results[method][1],
+            'same_peak': results['exhaustive'][1] == results[method][1],
+        }
+        print(f"Сравнение: полный перебор {report['exhaustive_seconds']:.3f} с, {MATCH_METHODS[method]} {report['method_seconds']:.3f} с "
+              f"(ускорение x{report['speedup']:.1f}), пик {'совпал' if report['same_peak'] else 'НЕ совпал'}")
+        return report
+
+    @timed('match.sweep')
+    def find_best_match_sweep(self, angle_start=0.0, angle_end=360.0, angle_step=1.0,
+                              scale_min=1.0, scale_max=1.0, scale_step=0.05, max_workers=None, progress=None):
+        """
+        Перебор углов и масштабов шаблона с параллельным вызовом cv2.matchTemplate.
+        Масштабы задаются множителями относительно текущего template_scale_factor.
+        Лучший вариант применяется к модели, полная таблица сохраняется в sweep_results.
+        progress(доля, текст) вызывается после каждого варианта; исключение из него прерывает перебор
+        без изменения модели. Возвращает (счет, позиция, угол, масштаб. фактор).
+        """
+        active_edge_image = self._get_active_edge_image()
+        if active_edge_image is None: raise ValueError("Фильтр границ не применен.")
+        if self.original_template_pixels is None: raise ValueError("Шаблон не загружен.")
+        if angle_step <= 0 or scale_step <= 0: raise ValueError("Шаг перебора должен быть положительным.")
+        if angle_end < angle_start or scale_max < scale_min or scale_min <= 0: raise ValueError("Некорректный диапазон перебора.")
+        angles = np.arange(angle_start, angle_end, angle_step) if angle_end > angle_start else np.array([angle_start])
+        multipliers = np.arange(scale_min, scale_max + scale_step * 0.5, scale_step)
+        base_scale = self.template_scale_factor
+        variants = [(float(a) % 360.0, float(base_scale * m)) for a in angles for m in multipliers]
+        prepared = self._prepare_match_input(active_edge_image) # Общие для всех потоков данные (только чтение)
+        image_rows, image_cols = self.image_rows, self.image_cols
+
+        def evaluate(variant):
+            angle, scale = variant
+            tpl, max_score = self._template_variant(angle, scale)
+            if tpl is None or tpl.shape[0] > image_rows or tpl.shape[1] > image_cols: return None
+            if max_score <= 0: return None
+            score, pos = self._match_prepared(prepared, tpl, max_score)
+            return {'angle': angle, 'scale': scale, 'score': score, 'pos': pos}
+
+        # cv2 освобождает GIL, поэтому потоки дают реальный параллелизм без копирования изображения в процессы
+        workers = max_workers if max_workers else (os.cpu_count() or 1)
+        executor = ThreadPoolExecutor(max_workers=workers); results = []
+        try:
+            for index, result in enumerate(executor.map(evaluate, variants)):
+                if result is not None: results.append(result)
+                if progress: progress((index + 1) / len(variants), f"вариант {index + 1} из {len(variants)}")
+        finally: executor.shutdown(wait=True, cancel_futures=True) # При прерывании не досчитываем оставшиеся варианты
+        if not results: raise ValueError("Ни один вариант шаблона не помещается в изображение.")
+        self.sweep_results = results
+        best = max(results, key=lambda r: r['score'])
+        self.template_angle_degrees = best['angle']; self.template_scale_factor = best['scale']
+        if not self._apply_template_scale(): raise ValueError("Не удалось применить найденный угол/масштаб.")
+        self.best_score = best['score']; self.best_pos = best['pos']
+        self.current_pos = self.best_pos; self.current_score = self.best_score
+        print(f"Перебор ({len(results)} вариантов, потоков: {workers}): счет={self.best_score:.4f} в {self.best_pos}, "
+              f"Угол: {self.template_angle_degrees:.1f}°, Масштаб: {self.template_scale_factor:.3f}")
+        return self.best_score, self.best_pos, self.template_angle_degrees, self.template_scale_factor
+
+    @timed('match.tiled')
+    def find_best_match_tiled(self, filename, tile_size=TILE_SIZE, progress=None):
+        """
+        Поиск текущего шаблона в большом файле по тайлам с текущими фильтром, порогом и размытием.
+        Загруженное изображение и результаты на нем не меняются; результат - в self.tiled_result.
+        """
+        edges_key = self._get_active_edge_key()
+        if edges_key is None: raise ValueError("Фильтр границ не применен.")
+        if self.template_pixels is None: raise ValueError("Шаблон не загружен.")
+        if self.template_max_score <= 0: raise ValueError("Шаблон пуст.")
+        params = dict(edges_key[2]); threshold_value = params.pop('threshold_value')
+        blur = self._blur_params if self.gaussian_blur_active else None
+        start_time = time.perf_counter()
+        with TiledProcessor(filename, tile_size=tile_size, progress=progress) as processor:
+            processor.extract_edges(self.image_display_mode, threshold_value, params, blur=blur, progress=progress)
+            score, pos = processor.match(self.template_pixels, self.template_max_score, keep_score_map=False, progress=progress)
+            self.tiled_result = {'filename': filename, 'score': score, 'pos': pos, 'image_shape': (processor.rows, processor.cols),
+                                 'tiles': processor.tiles_processed, 'seconds': time.perf_counter() - start_time}
+        print(f"Поиск по тайлам ({self.tiled_result['tiles']} тайлов, {processor.rows}x{processor.cols}): счет={score:.4f} в {pos}, "
+              f"время {self.tiled_result['seconds']:.1f} с")
+        return score, pos
+
+    @timed('match.template_set')
+    def find_templates_in_set(self, directory, max_workers=None, progress=None):
+        """
+        Поиск всех шаблонов <polygon> каталога (*.xml) на активном изображении границ текущим методом.
+        Каждый шаблон масштабируется по м/пкс изображения и своего XML (как _adjust_template_scale_to_image;
+        без физических данных - масштаб 1), угол 0°. Данные изображения (float32, пирамида, спектры,
+        префиксные суммы, упакованные биты) готовятся один раз и делятся между потоками.
+        Текущий шаблон и результаты не меняются; таблица по убыванию счета - в template_set_results.
+        """
+        active_edge_image = self._get_active_edge_image()
+        if active_edge_image is None: raise ValueError("Фильтр границ не применен.")
+        filenames = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith('.xml'))
+        if not filenames: raise ValueError(f"В каталоге '{directory}' нет XML-шаблонов.")
+        prepared = self._prepare_match_input(active_edge_image)
+        if self.match_method == 'exhaustive': self._get_sparse_scorer(active_edge_image) # Префиксные суммы - до запуска потоков
+        image_rows, image_cols = self.image_rows, self.image_cols
+
+        def evaluate(filename):
+            row = {'template': filename, 'name': os.path.basename(filename), 'score': None, 'pos': None, 'scale': None, 'shape': None, 'error': None}
+            try:
+                pixels, physical_height, height_pixels, content_hash, _ = self._read_template_source(filename)
+                scale = self._scale_factor_for_template(physical_height, height_pixels) or 1.0
+                tpl = self.template_bank.variant(content_hash, 0.0, scale) if self.template_bank is not None else None
+                if tpl is None: tpl = rotate_and_scale_template(pixels, 0.0, scale)
+                row.update(scale=scale, shape=None if tpl is None else tpl.shape)
+                if tpl is None or tpl.shape[0] > image_rows or tpl.shape[1] > image_cols: raise ValueError("Шаблон больше изображения.")
+                max_score = int(np.sum(tpl))
+                if max_score <= 0: raise ValueError("Шаблон пуст.")
+                row['score'], row['pos'] = self._match_prepared(prepared, tpl, max_score)
+            except Exception as e: row['error'] = str(e)
+            return row
+
+        start_time = time.perf_counter()
+        workers = max_workers if max_workers else (os.cpu_count() or 1)
+        executor = ThreadPoolExecutor(max_workers=workers); results = []
+        try:
+            for index, result in enumerate(executor.map(evaluate, filenames)):
+                results.append(result)
+                if progress: progress((index + 1) / len(filenames), f"шаблон {index + 1} из {len(filenames)}")
+        finally: executor.shutdown(wait=True, cancel_futures=True)
+        results.sort(key=lambda r: (r['score'] is None, -(r['score'] or 0.0), r['name']))
+        self.template_set_results = results
+        found = [r for r in results if r['score'] is not None]
+        print(f"Набор шаблонов ({len(found)} из {len(filenames)}, потоков: {workers}, {time.perf_counter() - start_time:.2f} с): "
+              + (f"лучший {found[0]['name']} счет={found[0]['score']:.4f} в {found[0]['pos']}" if found else "совпадений нет"))
+        return results
+
+    @timed('match.sequence')
+    def track_sequence(self, path, window_pixels=TRACK_WINDOW_PIXELS, window_degrees=TRACK_WINDOW_DEGREES,
+                       fallback_score=TRACK_FALLBACK_SCORE, fallback_degrees=TRACK_FALLBACK_DEGREES, progress=None):
+        """
+        Сопровождение текущего шаблона по кадрам каталога или видео (см. SequenceTracker): поиск в окне
+        ±window_pixels / ±window_degrees вокруг прежнего совпадения, полный поиск (кадр целиком, углы ±fallback_degrees)
+        при счете ниже fallback_score и на первом кадре.
+        Загруженное изображение и результаты на нем не меняются; строки по кадрам - в sequence_results.
+        """
+        tracker = SequenceTracker(self, window_pixels=window_pixels, window_degrees=window_degrees, fallback_score=fallback_score,
+                                  fallback_degrees=fallback_degrees)
+        start_time = time.perf_counter()
+        results = tracker.track(path, progress=progress)
+        self.sequence_results = results
+        full_searches = sum(r['mode'] == 'full' for r in results)
+        print(f"Последовательность ({len(results)} кадров, полных поисков: {full_searches}, {time.perf_counter() - start_time:.2f} с): "
+              f"средний счет {np.mean([r['score'] for r in results]):.4f}")
+        return results
+
+    def apply_template_set_result(self, index):
+        """ Загружает шаблон из строки таблицы набора и ставит его в найденную позицию """
+        result = self.template_set_results[index]
+        if result['score'] is None: raise ValueError(result['error'] or "Шаблон не был найден.")
+        self.load_template_from_xml(result['template'])
+        if abs(self.template_scale_factor - result['scale']) > 1e-9: # Без физических данных в наборе использовался масштаб 1
+            self.template_scale_factor = result['scale']
+            if not self._apply_template_scale(): raise ValueError("Не удалось применить масштаб шаблона.")
+        self.set_current_pos(*result['pos'])
+        return result
+
+    def get_sweep_angle_table(self):
+        """ Лучший счет для каждого угла из последнего перебора: [(угол, счет, позиция, масштаб), ...] """
+        best_per_angle = {}
+        for r in self.sweep_results:
+            if r['angle'] not in best_per_angle or r['score'] > best_per_angle[r['angle']]['score']: best_per_angle[r['angle']] = r
+        return [(a, r['score'], r['pos'], r['scale']) for a, r in sorted(best_per_angle.items())]
+
+    @timed('score_at')
     def get_score_at(self, r, c):
         active_edge_image = self._get_active_edge_image()
         if active_edge_image is None or self.template_pixels is None: return 0.0
         if self.template_max_score <= 0: return 0.0
         if 0 <= r <= self.image_rows - self.template_rows and 0 <= c <= self.image_cols - self.template_cols:
             try:
-                img_slice = active_edge_image[r : r + self.template_rows, c : c + self.template_cols]
-                img_slice_float = img_slice.astype(np.float32)
-                tpl_float = self.template_pixels.astype(np.float32)
-                result_raw = cv2.matchTemplate(img_slice_float, tpl_float, CV2_MATCH_METHOD)
-                raw_score = result_raw[0, 0]
+                if self.score_map is not None: return float(np.clip(self.score_map[r, c], 0.0, 1.0)) # O(1) из кэшированной карты
+                if self.match_method == 'chamfer': return self._get_chamfer_matcher(active_edge_image).score_at(self._get_sparse_template().coords, r, c)
+                if self.match_method == 'bitpacked': raw_score = self._get_bitpacked_matcher(active_edge_image).raw_score_at(self._get_packed_template(), r, c)
+                # Разреженная оценка: O(число отрезков контура) вместо O(площади рамки)
+                else: raw_score = self._get_sparse_scorer(active_edge_image).raw_score_at(self._get_sparse_template(), r, c)
                 epsilon = 1e-7
                 normalized_score = raw_score / (self.template_max_score + epsilon)
                 score = np.clip(normalized_score, 0.0, 1.0)
@@ -345,10 +688,11 @@ class ComparisonModel:
 
     def reset_results(self):
         self.best_score = 0.0; self.best_pos = (-1, -1); self.current_pos = (0, 0)
+        self.sweep_results = []; self._set_score_map(None)
         self._recalculate_current_score()
 
     def reset_template_and_results(self):
-        self.original_template_pixels = None; self.template_pixels = None
+        self.original_template_pixels = None; self.template_pixels = None; self._sparse_template = None; self._packed_template = None; self._template_content_key = None; self._template_file_hash = None
         self.template_scale_factor = 1.0; self.template_angle_degrees = 0.0
         self.template_rows = 0; self.template_cols = 0
         self.template_max_score = 0
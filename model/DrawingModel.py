@@ -1,9 +1,45 @@
 # model/DrawingModel.py
 import xml.etree.ElementTree as ET
 import numpy as np
-from PIL import Image, ImageTk
+from PIL import Image
+from .VertexStore import VertexStore
+from .Instrumentation import timed
 
 GRID_MARGIN = 5 # Отступ при авто-определении размера сетки из XML
+RASTER_CHUNK_PIXELS = 1 << 20 # Пикселей ребер на один блок при полной перерисовке
+
+def rasterize_line(p1, p2):
+    """
+    Пиксели отрезка p1 -> p2 как массивы (xs, ys), без цикла Python.
+    Совпадают с целочисленным алгоритмом Брезенхэма (err = dx - dy), которым поле рисовалось раньше:
+    по главной оси шаг 1, по второй - floor((2*i*d_minor + d_major - 1) / (2*d_major)).
+    """
+    x1, y1 = int(p1[0]), int(p1[1]); x2, y2 = int(p2[0]), int(p2[1])
+    dx = abs(x2 - x1); dy = abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1; sy = 1 if y1 < y2 else -1
+    if dx >= dy:
+        major = np.arange(dx + 1); minor = (2 * major * dy + dx - 1) // (2 * dx) if dx else np.zeros(1, dtype=major.dtype)
+        return x1 + sx * major, y1 + sy * minor
+    major = np.arange(dy + 1); minor = (2 * major * dx + dy - 1) // (2 * dy)
+    return x1 + sx * minor, y1 + sy * major
+
+def rasterize_segments(starts, ends):
+    """
+    Пиксели многих отрезков сразу (массивы (N, 2) начал и концов): (xs, ys) всех отрезков подряд.
+    Та же формула, что в rasterize_line, но одним набором векторных операций без цикла по отрезкам.
+    """
+    starts = np.asarray(starts, dtype=np.int64).reshape(-1, 2); ends = np.asarray(ends, dtype=np.int64).reshape(-1, 2)
+    delta = ends - starts; dx = np.abs(delta[:, 0]); dy = np.abs(delta[:, 1])
+    sx = np.where(delta[:, 0] > 0, 1, -1); sy = np.where(delta[:, 1] > 0, 1, -1)
+    d_major = np.maximum(dx, dy); d_minor = np.minimum(dx, dy); x_major = dx >= dy
+    lengths = d_major + 1; offsets = np.cumsum(lengths) - lengths
+    segment = np.repeat(np.arange(len(starts)), lengths); i = np.arange(lengths.sum()) - offsets[segment] # Шаг по главной оси
+    d_major_s = d_major[segment]
+    minor = np.where(d_major_s > 0, (2 * i * d_minor[segment] + d_major_s - 1) // np.maximum(2 * d_major_s, 1), 0)
+    x_major_s = x_major[segment]
+    xs = starts[segment, 0] + sx[segment] * np.where(x_major_s, i, minor)
+    ys = starts[segment, 1] + sy[segment] * np.where(x_major_s, minor, i)
+    return xs, ys
 
 class DrawingModel:
     """
@@ -15,8 +51,9 @@ class DrawingModel:
     def __init__(self, rows, cols):
         self.rows = rows
         self.cols = cols
-        self.vertices = [] # Список кортежей (int, int)
-        self.pixel_field = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
+        self.vertices = [] # Хранилище VertexStore: ведет себя как список кортежей (int, int)
+        self._reset_field()
+        # Журнал команд: каждая запись - добавленная вершина (отмена снимает ее с конца контура, повтор возвращает)
         self.undo_stack = []
         self.redo_stack = []
         self.overlay_image_pil = None
@@ -25,58 +62,101 @@ class DrawingModel:
         self.overlay_scale = 1.0
         self.template_physical_height_meters = 0.0 # Физическая высота шаблона в метрах
 
+    @property
+    def vertices(self): return self._vertices
+
+    @vertices.setter
+    def vertices(self, vertices):
+        """ Замена всех вершин (блоком, повторы пропускаются); поле перерисовывается в update_field() """
+        self._vertices = VertexStore(vertices); self._field_in_sync = False
+
+    @timed('drawing.add_vertex')
     def add_vertex(self, x, y):
         try: x_int = int(round(x)); y_int = int(round(y))
         except (ValueError, TypeError): return False
         if 0 <= x_int < self.cols and 0 <= y_int < self.rows and (x_int, y_int) not in self.vertices:
             new_vertex = (x_int, y_int)
-            self.vertices.append(new_vertex); self.update_field()
+            self.vertices.append(new_vertex); self._draw_tail(new_vertex, 1)
             self.undo_stack.append(new_vertex); self.redo_stack.clear()
             return True
         return False
 
+    @timed('drawing.undo')
     def undo_vertex(self):
         if not self.undo_stack: return False
-        last_vertex = self.undo_stack.pop(); self.redo_stack.append(last_vertex)
-        if last_vertex in self.vertices: self.vertices.remove(last_vertex)
-        else: self.redo_stack.pop(); self.undo_stack.append(last_vertex); return False
-        self.update_field(); return True
+        last_vertex = self.undo_stack[-1]
+        # Отменяемая вершина всегда последняя в контуре (вершины добавляются только в конец)
+        if not self.vertices or self.vertices[-1] != last_vertex: return False
+        self.vertices.pop(); self._draw_tail(last_vertex, -1)
+        self.redo_stack.append(self.undo_stack.pop()); return True
 
+    @timed('drawing.redo')
     def redo_vertex(self):
         if not self.redo_stack: return False
-        vertex_to_redo = self.redo_stack.pop(); self.undo_stack.append(vertex_to_redo)
-        if vertex_to_redo not in self.vertices: self.vertices.append(vertex_to_redo)
-        else: self.undo_stack.pop(); self.redo_stack.append(vertex_to_redo); return False
-        self.update_field(); return True
+        vertex_to_redo = self.redo_stack[-1]
+        if not self.vertices.append(vertex_to_redo): return False
+        self._draw_tail(vertex_to_redo, 1)
+        self.undo_stack.append(self.redo_stack.pop()); return True
+
+    def _reset_field(self):
+        """ Пустое поле (uint8 0/1) и счетчик покрытия: сколько вершин/ребер проходит через каждый пиксель """
+        self.pixel_field = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        self._coverage = np.zeros((self.rows, self.cols), dtype=np.int32)
+        self._field_in_sync = not self.vertices # Пустое поле соответствует только пустому контуру
 
+    @timed('drawing.update_field')
     def update_field(self):
-        self.pixel_field = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
-        for vertex in self.vertices:
-            try:
-                vx = int(vertex[0]); vy = int(vertex[1])
-                if 0 <= vy < self.rows and 0 <= vx < self.cols: self.pixel_field[vy][vx] = 1
-            except (TypeError, IndexError, ValueError) as e: print(f"Ошибка в update_field: {e}"); continue
-        if len(self.vertices) >= 2:
-            for i in range(len(self.vertices) - 1): self._draw_line(self.vertices[i], self.vertices[i + 1])
-            if len(self.vertices) >= 3: self._draw_line(self.vertices[-1], self.vertices[0])
-
-    def _draw_line(self, p1, p2):
-        try: x1, y1 = int(p1[0]), int(p1[1]); x2, y2 = int(p2[0]), int(p2[1])
-        except (TypeError, IndexError, ValueError) as e: print(f"Ошибка в _draw_line: {e}"); return
-        dx = abs(x2 - x1); dy = abs(y2 - y1)
-        sx = 1 if x1 < x2 else -1; sy = 1 if y1 < y2 else -1
-        err = dx - dy; x_curr, y_curr = x1, y1
-        while True:
-            if 0 <= y_curr < self.rows and 0 <= x_curr < self.cols:
-                try: self.pixel_field[y_curr][x_curr] = 1
-                except IndexError: print(f"Ошибка индекса в _draw_line"); break
-            if x_curr == x2 and y_curr == y2: break
-            e2 = 2 * err
-            if e2 > -dy: err -= dy; x_curr += sx
-            if e2 < dx: err += dx; y_curr += sy
+        """
+        Полная перерисовка поля по текущим вершинам: ребра растеризуются блоками (не больше
+        RASTER_CHUNK_PIXELS пикселей за раз, чтобы длинные ребра не требовали гигантских массивов индексов).
+        """
+        self._coverage = np.zeros((self.rows, self.cols), dtype=np.int32)
+        coverage = self._coverage.reshape(-1); coords = self.vertices.coords.astype(np.int64)
+        self._accumulate(coverage, coords[:, 0], coords[:, 1])
+        if len(coords) >= 2:
+            ends = np.roll(coords, -1, axis=0) if len(coords) >= 3 else coords[1:] # Замыкающее ребро - при 3+ вершинах
+            starts = coords[:len(ends)]
+            lengths = np.abs(ends - starts).max(axis=1) + 1; cumulative = np.cumsum(lengths)
+            first = 0
+            while first < len(starts):
+                last = max(first + 1, int(np.searchsorted(cumulative, cumulative[first] - lengths[first] + RASTER_CHUNK_PIXELS, side='right')))
+                self._accumulate(coverage, *rasterize_segments(starts[first:last], ends[first:last])); first = last
+        self.pixel_field = (self._coverage > 0).astype(np.uint8)
+        self._field_in_sync = True
+
+    def _accumulate(self, coverage, xs, ys):
+        """ +1 к покрытию (плоский массив) для каждой точки внутри поля, с учетом повторов """
+        inside = (xs >= 0) & (xs < self.cols) & (ys >= 0) & (ys < self.rows)
+        flat = ys[inside] * self.cols + xs[inside]
+        if flat.size == 0: return
+        low = int(flat.min()); span = int(flat.max()) - low + 1
+        if span <= 4 * flat.size: coverage[low:low + span] += np.bincount(flat - low, minlength=span).astype(np.int32) # Компактный блок (обычный контур)
+        else: indices, counts = np.unique(flat, return_counts=True); coverage[indices] += counts.astype(np.int32)
+
+    def _draw_tail(self, tail, delta):
+        """
+        Инкрементальная перерисовка после добавления (delta=1) или снятия (delta=-1) последней вершины tail:
+        сама вершина, входящее и замыкающее ребра, а замыкающее ребро контура без нее - с обратным знаком.
+        Не больше трех ребер при любом числе вершин. Пиксель гаснет, только когда его покрытие падает до нуля,
+        поэтому общие пиксели ребер сохраняются. Если поле не соответствует вершинам - полная перерисовка.
+        """
+        if not self._field_in_sync: self.update_field(); return
+        vertices = self.vertices; count = len(vertices) + (0 if delta > 0 else 1) # Число вершин вместе с tail
+        self._stamp(np.array([tail[0]]), np.array([tail[1]]), delta)
+        if count >= 2: previous = vertices[count - 2]; self._stamp(*rasterize_line(previous, tail), delta)
+        if count >= 3: self._stamp(*rasterize_line(tail, vertices[0]), delta)
+        if count >= 4: self._stamp(*rasterize_line(previous, vertices[0]), -delta)
+
+    def _stamp(self, xs, ys, delta):
+        """ Изменяет покрытие пикселей (xs, ys) на delta (точки вне поля пропускаются) и обновляет поле """
+        inside = (xs >= 0) & (xs < self.cols) & (ys >= 0) & (ys < self.rows)
+        xs = xs[inside]; ys = ys[inside]
+        if xs.size == 0: return
+        self._coverage[ys, xs] += delta # Пиксели одного отрезка не повторяются
+        self.pixel_field[ys, xs] = self._coverage[ys, xs] > 0
 
     def clear(self):
-        self.vertices = []; self.pixel_field = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
+        self.vertices = []; self._reset_field()
         self.undo_stack.clear(); self.redo_stack.clear()
         # Физическую высоту НЕ сбрасываем при простой очистке поля,
         # она должна сбрасываться/устанавливаться при загрузке нового шаблона или изменении размера.
@@ -88,7 +168,7 @@ class DrawingModel:
             # Важно: очищаем вершины и историю, т.к. старые вершины могут быть вне новых границ.
             # Физическую высоту шаблона не трогаем, она не зависит от размера сетки.
             self.vertices = []
-            self.pixel_field = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
+            self._reset_field()
             self.undo_stack.clear()
             self.redo_stack.clear()
             return True
@@ -115,6 +195,7 @@ class DrawingModel:
         except Exception as e:
             raise Exception(f"Ошибка при записи XML '{filename}': {str(e)}")
 
+    @timed('drawing.load_xml')
     def load_from_xml(self, filename):
         try:
             tree = ET.parse(filename); root = tree.getroot()
@@ -166,12 +247,11 @@ class DrawingModel:
             final_vertices = []
             for x, y in temp_vertices:
                 if 0 <= x < self.cols and 0 <= y < self.rows: # Проверка на текущие self.cols, self.rows
-                    if (x, y) not in final_vertices:
-                        final_vertices.append((x, y))
+                    final_vertices.append((x, y))
                 else:
                     print(f"Предупреждение: Вершина ({x},{y}) вне установленных границ сетки ({self.rows}x{self.cols}), пропущена.")
 
-            self.vertices = final_vertices
+            self.vertices = final_vertices # Повторы отбрасываются при вставке блоком (VertexStore.extend)
             self.undo_stack.clear() # Очищаем историю после загрузки
             self.redo_stack.clear()
             self.update_field()
@@ -181,6 +261,7 @@ class DrawingModel:
         except (ValueError, TypeError, AttributeError, KeyError) as e: raise Exception(f"Ошибка в структуре/данных '{filename}': {str(e)}")
         except Exception as e: raise Exception(f"Неизвестная ошибка при загрузке '{filename}': {str(e)}")
 
+    @timed('drawing.load_overlay')
     def load_overlay_image(self, filename):
         try:
             self.overlay_image_pil = Image.open(filename)
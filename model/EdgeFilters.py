@@ -0,0 +1,141 @@
+# model/EdgeFilters.py
+import threading
+import numpy as np
+import cv2
+
+# Ядра для операторов (определяем один раз)
+PREWITT_KERNEL_X = np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]], dtype=np.float32)
+PREWITT_KERNEL_Y = np.array([[-1,-1,-1], [ 0, 0, 0], [ 1, 1, 1]], dtype=np.float32)
+ROBERTS_KERNEL_X = np.array([[+1, 0], [ 0,-1]], dtype=np.float32)
+ROBERTS_KERNEL_Y = np.array([[ 0,+1], [-1, 0]], dtype=np.float32)
+KIRSCH_KERNELS = [
+    np.array([[ 5,  5,  5], [-3,  0, -3], [-3, -3, -3]], dtype=np.float32), # N
+    np.array([[ 5,  5, -3], [ 5,  0, -3], [-3, -3, -3]], dtype=np.float32), # NW
+    np.array([[ 5, -3, -3], [ 5,  0, -3], [ 5, -3, -3]], dtype=np.float32), # W
+    np.array([[-3, -3, -3], [ 5,  0, -3], [ 5,  5, -3]], dtype=np.float32), # SW
+    np.array([[-3, -3, -3], [-3,  0, -3], [ 5,  5,  5]], dtype=np.float32), # S
+    np.array([[-3, -3, -3], [-3,  0,  5], [-3,  5,  5]], dtype=np.float32), # SE
+    np.array([[-3, -3,  5], [-3,  0,  5], [-3, -3,  5]], dtype=np.float32), # E
+    np.array([[-3,  5,  5], [-3,  0,  5], [-3, -3, -3]], dtype=np.float32)  # NE
+]
+
+# Радиус ядра каждого фильтра (нужен для перекрытия тайлов)
+FILTER_KERNEL_RADIUS = {'sobel': 1, 'kirsch': 1, 'roberts': 1, 'prewitt': 1}
+# До этого размера ядра Собеля квадраты производных 8-битного изображения помещаются в int32
+SOBEL_MAX_EXACT_KSIZE = 5
+
+
+class EdgeBuffers:
+    """
+    Переиспользуемые промежуточные буферы фильтров (свои для каждого потока).
+    Буфер пересоздается только при смене размера или типа изображения; при смене размера освобождаются
+    все буферы потока - между вызовами удерживается не больше буферов одного (последнего) изображения.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, name, shape, dtype):
+        buffers = self._local.__dict__.setdefault('buffers', {})
+        buffer = buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            if buffer is not None and buffer.shape != shape: buffers.clear() # Буферы прежнего размера больше не понадобятся
+            buffer = np.empty(shape, dtype=dtype); buffers[name] = buffer
+        return buffer
+
+    def nbytes(self):
+        """ Память, удерживаемая буферами вызывающего потока между вызовами """
+        return sum(buffer.nbytes for buffer in self._local.__dict__.get('buffers', {}).values())
+
+    def release(self):
+        self._local.__dict__.pop('buffers', None)
+
+DEFAULT_BUFFERS = EdgeBuffers()
+
+
+class EdgeStrength:
+    """
+    Сила границы до нормировки: либо квадрат модуля градиента (int32, точно),
+    либо максимум модулей откликов (int16, точно), либо модуль градиента (float32).
+    Порог сравнивается с исходной формулой floor(сила / max * 255) > порог без лишних проходов.
+    """
+    SQUARED = 'squared'; LINEAR = 'linear'
+
+    def __init__(self, values, kind):
+        self.values = values; self.kind = kind
+
+    def max_value(self):
+        return self.values.max().item()
+
+    def threshold(self, threshold_value, max_value=None, out=None):
+        """ Бинарное изображение 0/1 (uint8); max_value - глобальный максимум (для тайлов) """
+        if max_value is None: max_value = self.max_value()
+        if out is None: out = np.empty(self.values.shape, dtype=np.uint8)
+        if max_value <= 0: out[...] = 0; return out # Как и раньше: нет градиента - нет границ
+        # floor(m / M * 255) > t  <=>  m * 255 >= (t + 1) * M (для квадратов - в квадрате); точные равенства - см. _round_ties_like_float
+        if np.issubdtype(self.values.dtype, np.integer):
+            max_value = int(max_value)
+            if self.kind == self.SQUARED: limit = -(-((threshold_value + 1) ** 2 * max_value) // (255 * 255))
+            else: limit = -(-((threshold_value + 1) * max_value) // 255)
+        else:
+            limit = (threshold_value + 1) * float(max_value) / 255.0
+            if self.kind == self.SQUARED: limit = limit * limit
+        np.greater_equal(self.values, limit, out=out.view(np.bool_))
+        if np.issubdtype(self.values.dtype, np.integer): self._round_ties_like_float(threshold_value, max_value, limit, out)
+        return out
+
+    def _round_ties_like_float(self, threshold_value, max_value, limit, out):
+        """
+        Ровно на границе (m / M * 255 = t + 1) прежний расчет в плавающей точке (sqrt в float64, у Кирша - float32)
+        мог дать t + 1 - ε и не пропустить пиксель. Все такие пиксели равны limit, поэтому достаточно одного
+        скалярного расчета; лишний проход по изображению - только если он действительно гасит пиксели.
+        """
+        squared = self.kind == self.SQUARED
+        if limit * (255 * 255 if squared else 255) != (threshold_value + 1) ** (2 if squared else 1) * max_value: return # Равенство невозможно
+        if squared: legacy_value = np.sqrt(np.float64(limit)) / np.sqrt(np.float64(max_value)) * 255
+        else: legacy_value = np.float32(limit) / np.float32(max_value) * np.float32(255)
+        if int(legacy_value) <= threshold_value: out[self.values == limit] = 0
+
+
+def _squared_gradient(gx, gy, buffers):
+    """ gx^2 + gy^2 в int32 в переиспользуемом буфере (gx, gy - int16) """
+    squared = buffers.get('squared', gx.shape, np.int32); temp = buffers.get('squared_tmp', gx.shape, np.int32)
+    np.multiply(gx, gx, out=squared, dtype=np.int32)
+    np.multiply(gy, gy, out=temp, dtype=np.int32)
+    np.add(squared, temp, out=squared)
+    return EdgeStrength(squared, EdgeStrength.SQUARED)
+
+def sobel_strength(img, ksize=3, buffers=DEFAULT_BUFFERS):
+    if img.dtype == np.uint8 and ksize <= SOBEL_MAX_EXACT_KSIZE:
+        gx = cv2.Sobel(img, cv2.CV_16S, 1, 0, dst=buffers.get('gx16', img.shape, np.int16), ksize=ksize)
+        gy = cv2.Sobel(img, cv2.CV_16S, 0, 1, dst=buffers.get('gy16', img.shape, np.int16), ksize=ksize)
+        return _squared_gradient(gx, gy, buffers)
+    gx = cv2.Sobel(img, cv2.CV_32F, 1, 0, dst=buffers.get('gx32', img.shape, np.float32), ksize=ksize)
+    gy = cv2.Sobel(img, cv2.CV_32F, 0, 1, dst=buffers.get('gy32', img.shape, np.float32), ksize=ksize)
+    return EdgeStrength(cv2.magnitude(gx, gy, magnitude=buffers.get('magnitude32', img.shape, np.float32)), EdgeStrength.LINEAR)
+
+def _pair_strength(img, kernel_x, kernel_y, buffers):
+    gx = cv2.filter2D(img, cv2.CV_16S, kernel_x, dst=buffers.get('gx16', img.shape, np.int16))
+    gy = cv2.filter2D(img, cv2.CV_16S, kernel_y, dst=buffers.get('gy16', img.shape, np.int16))
+    return _squared_gradient(gx, gy, buffers)
+
+def roberts_strength(img, buffers=DEFAULT_BUFFERS):
+    return _pair_strength(img, ROBERTS_KERNEL_X, ROBERTS_KERNEL_Y, buffers)
+
+def prewitt_strength(img, buffers=DEFAULT_BUFFERS):
+    return _pair_strength(img, PREWITT_KERNEL_X, PREWITT_KERNEL_Y, buffers)
+
+def kirsch_strength(img, buffers=DEFAULT_BUFFERS):
+    """ Максимум модулей 8 откликов Кирша: |отклик| <= 15 * 255, поэтому int16 точен """
+    accumulated = buffers.get('kirsch_max', img.shape, np.int16); response = buffers.get('kirsch_response', img.shape, np.int16)
+    for index, kernel in enumerate(KIRSCH_KERNELS):
+        target = accumulated if index == 0 else response
+        cv2.filter2D(img, cv2.CV_16S, kernel, dst=target)
+        np.abs(target, out=target)
+        if index > 0: np.maximum(accumulated, response, out=accumulated)
+    return EdgeStrength(accumulated, EdgeStrength.LINEAR)
+
+EDGE_STRENGTH_FUNCTIONS = {'sobel': sobel_strength, 'kirsch': kirsch_strength, 'roberts': roberts_strength, 'prewitt': prewitt_strength}
+
+def edge_filter(filter_name, img, threshold_value, buffers=DEFAULT_BUFFERS, **params):
+    """ Полный фильтр: сила границы -> нормировка по максимуму -> порог. Результат - новый массив 0/1. """
+    return EDGE_STRENGTH_FUNCTIONS[filter_name](img, buffers=buffers, **params).threshold(threshold_value)
@@ -0,0 +1,141 @@
+# model/Instrumentation.py
+import bisect
+import contextlib
+import cProfile
+import functools
+import json
+import pstats
+import threading
+import time
+
+# Границы корзин гистограммы длительностей, мс (логарифмическая сетка); последняя корзина - все, что дольше
+SPAN_BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class SpanStats:
+    """ Гистограмма длительностей одной операции: число, сумма, минимум, максимум и корзины SPAN_BUCKET_BOUNDS_MS """
+    __slots__ = ('count', 'total_ms', 'min_ms', 'max_ms', 'last_ms', 'buckets')
+
+    def __init__(self):
+        self.count = 0; self.total_ms = 0.0; self.min_ms = float('inf'); self.max_ms = 0.0; self.last_ms = 0.0
+        self.buckets = [0] * (len(SPAN_BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, milliseconds):
+        self.count += 1; self.total_ms += milliseconds; self.last_ms = milliseconds
+        self.min_ms = min(self.min_ms, milliseconds); self.max_ms = max(self.max_ms, milliseconds)
+        self.buckets[bisect.bisect_left(SPAN_BUCKET_BOUNDS_MS, milliseconds)] += 1
+
+    def percentile(self, fraction):
+        """ Верхняя граница корзины, в которую попадает доля fraction замеров (для последней корзины - максимум) """
+        if not self.count: return 0.0
+        needed = fraction * self.count; cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= needed: return min(self.max_ms, SPAN_BUCKET_BOUNDS_MS[index]) if index < len(SPAN_BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        return {'count': self.count, 'total_ms': round(self.total_ms, 3), 'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+                'min_ms': round(self.min_ms, 3) if self.count else 0.0, 'max_ms': round(self.max_ms, 3), 'last_ms': round(self.last_ms, 3),
+                'p50_ms': round(self.percentile(0.5), 3), 'p95_ms': round(self.percentile(0.95), 3),
+                'buckets': [{'le_ms': bound, 'count': n} for bound, n in zip(list(SPAN_BUCKET_BOUNDS_MS) + [None], self.buckets)]}
+
+
+class Instrumentation:
+    """
+    Замеры длительности именованных операций модели и отрисовки (из любых потоков) в гистограммы SpanStats,
+    плюс запись профиля cProfile на время действий пользователя.
+    Имя операции - строка с точками ('filter.sobel', 'match.fft', 'view.comparison.redraw'); в декораторе timed
+    имя может ссылаться на первый аргумент: timed('match.{self.match_method}').
+    version растет с каждым замером - строка состояния перерисовывается только при изменениях.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {} # имя -> SpanStats
+        self.last_name = None; self.version = 0
+        self._profiler = None; self._thread_profiles = [] # Профиль главного потока и профили фоновых заданий
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None: stats = self._stats[name] = SpanStats()
+            stats.add(seconds * 1000.0); self.last_name = name; self.version += 1
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """ with span('имя'): ... - замер блока (исключение тоже учитывается) """
+        if not self.enabled: yield; return
+        start = time.perf_counter()
+        try: yield
+        finally: self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """ Декоратор замера функции/метода """
+        def decorator(func):
+            dynamic = '{' in name
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled: return func(*args, **kwargs)
+                start = time.perf_counter()
+                try: return func(*args, **kwargs)
+                finally: self.record(name.format(self=args[0]) if dynamic else name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """ {имя: словарь SpanStats.to_dict()} по алфавиту """
+        with self._lock: return {name: self._stats[name].to_dict() for name in sorted(self._stats)}
+
+    def summary(self, prefixes=None):
+        """ Строка состояния: последняя операция с нужным префиксом и ее гистограмма; '' если замеров еще нет """
+        with self._lock:
+            names = [name for name in self._stats if prefixes is None or name.startswith(tuple(prefixes))]
+            if not names: return ""
+            name = self.last_name if self.last_name in names else max(names, key=lambda n: self._stats[n].count)
+            s = self._stats[name]
+            return (f"{name}: {s.last_ms:.1f} мс (n={s.count}, ср. {s.total_ms / s.count:.1f}, p50 ≤ {s.percentile(0.5):.3g}, "
+                    f"p95 ≤ {s.percentile(0.95):.3g}, макс. {s.max_ms:.1f} мс) | операций: {len(names)}")
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'bucket_bounds_ms': list(SPAN_BUCKET_BOUNDS_MS), 'spans': self.snapshot()},
+                      f, ensure_ascii=False, indent=1)
+
+    def reset(self):
+        with self._lock: self._stats.clear(); self.last_name = None; self.version += 1
+
+    # --- Профилирование cProfile ---
+    @property
+    def profiling(self): return self._profiler is not None
+
+    def start_profiling(self):
+        """ Начинает запись профиля в вызывающем (главном) потоке; фоновые задания профилируются через profiled() """
+        if self._profiler is not None: return
+        profiler = cProfile.Profile(); profiler.enable()
+        with self._lock: self._profiler = profiler; self._thread_profiles = []; self.version += 1
+
+    def profiled(self, func, *args):
+        """ Вызов func(*args) под отдельным профилем, если идет запись (профиль потока добавится к общему) """
+        if self._profiler is None: return func(*args)
+        profiler = cProfile.Profile()
+        try: profiler.enable()
+        except ValueError: return func(*args) # Python 3.12+: профиль главного потока уже охватывает все потоки
+        try: return func(*args)
+        finally:
+            profiler.disable()
+            with self._lock: self._thread_profiles.append(profiler)
+
+    def stop_profiling(self, path=None):
+        """ Останавливает запись; при заданном path сохраняет объединенную статистику (pstats, .prof) для flamegraph """
+        with self._lock: profiler, thread_profiles = self._profiler, self._thread_profiles; self._profiler = None; self._thread_profiles = []; self.version += 1
+        if profiler is None: return
+        profiler.disable()
+        if path is None: return
+        stats = pstats.Stats(profiler)
+        for thread_profile in thread_profiles:
+            with contextlib.suppress(TypeError): stats.add(thread_profile) # Пустой профиль (задание отменено до старта) не добавляется
+        stats.dump_stats(path)
+
+INSTRUMENTATION = Instrumentation() # Общий для модели, отрисовки и фонового потока
+timed = INSTRUMENTATION.timed
+span = INSTRUMENTATION.span
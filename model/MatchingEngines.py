@@ -0,0 +1,415 @@
+# model/MatchingEngines.py
+import threading
+import numpy as np
+import cv2
+
+CV2_MATCH_METHOD = cv2.TM_CCORR # Используем базовую кросс-корреляцию
+
+# Параметры пирамидального поиска
+PYRAMID_MAX_LEVELS = 4 # Максимум уровней уменьшения (в 2 раза каждый)
+PYRAMID_MIN_TEMPLATE_SIDE = 8 # Шаблон на грубом уровне не меньше этого размера
+PYRAMID_TOP_CANDIDATES = 5 # Сколько кандидатов уточняется на каждом уровне
+PYRAMID_REFINE_RADIUS = 2 # Окно уточнения вокруг кандидата (в пикселях уровня)
+PYRAMID_MAX_EDGE_DENSITY = 0.35 # Более плотные уровни не строим: после OR-пулинга корреляция там насыщается
+
+# Параметры FFT-корреляции (overlap-save по тайлам)
+FFT_MIN_TILE_SIZE = 512 # Минимальный размер тайла БПФ (степень двойки)
+FFT_SPECTRUM_CACHE_LIMIT_BYTES = 512 * 1024 * 1024 # Сверх этого спектры тайлов не кэшируются
+
+# Параметры chamfer-сопоставления
+CHAMFER_MAX_DISTANCE = 20.0 # Расстояния усекаются, чтобы далекие выбросы не доминировали в среднем
+
+# Разреженный шаблон выгоден, когда контур занимает малую долю большой рамки
+SPARSE_TEMPLATE_MAX_DENSITY = 0.05
+SPARSE_TEMPLATE_MIN_AREA = 64 * 64
+# Полная карта по отрезкам стоит ~2 прохода по карте на отрезок, а matchTemplate (через ДПФ)
+# - около 20 проходов на всю карту, поэтому для полного перебора берем только шаблоны с малым числом отрезков
+SPARSE_MAX_RUNS_FOR_FULL_SEARCH = 10
+
+# Поиск всех совпадений (несколько экземпляров объекта)
+DETECTION_MAX_OVERLAP = 0.3 # Совпадение подавляется, если его рамка перекрывает более сильное больше чем на эту долю (IoU)
+DETECTION_MAX_PEAK_WINDOW = 101 # Предел окна поиска локальных максимумов (окно - половина шаблона)
+
+# Число единичных бит каждого байта: np.bitwise_count есть только в NumPy 2+, иначе - таблица на 256 значений
+POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+def popcount_u8(values, out=None):
+    """ popcount массива uint8 (out может совпадать с values) """
+    if hasattr(np, 'bitwise_count'): return np.bitwise_count(values, out=out)
+    return np.take(POPCOUNT_TABLE, values, out=out) # Режим 'raise' буферизует out, поэтому запись на место безопасна
+
+def exhaustive_score_map(img_float, template_pixels, template_max_score):
+    """
+    Нормированная карта счетов всех позиций через cv2.matchTemplate (float32).
+    Границы и шаблон бинарные, поэтому сырая корреляция целая: округление убирает погрешность ДПФ внутри
+    matchTemplate, которая зависит от размера блока, - карта и равные максимумы не зависят от разбиения на тайлы.
+    """
+    tpl_float = template_pixels.astype(np.float32)
+    result_map_raw = cv2.matchTemplate(img_float, tpl_float, CV2_MATCH_METHOD)
+    return np.rint(result_map_raw, out=result_map_raw) / np.float32(template_max_score + 1e-7)
+
+def best_match_from_score_map(score_map):
+    """ Максимум карты счетов: (счет, (r, c)) """
+    _, maxVal, _, maxLoc = cv2.minMaxLoc(score_map)
+    return float(np.clip(maxVal, 0.0, 1.0)), (maxLoc[1], maxLoc[0])
+
+def detect_peaks(score_map, template_shape, threshold=None, top_k=None, max_overlap=DETECTION_MAX_OVERLAP):
+    """
+    Все совпадения на карте счетов: (счета float32 (N,), позиции int32 (N, 2) как (r, c)) по убыванию счета.
+    1. Кандидаты - локальные максимумы (cv2.dilate окном в половину шаблона) со счетом > 0 и >= threshold;
+       плато равных максимумов (связная область) дает одного кандидата.
+    2. Жадное подавление немаксимумов: кандидаты берутся по убыванию счета, каждый принятый подавляет
+       остальных, чьи рамки шаблона перекрываются с его рамкой больше max_overlap (IoU равных прямоугольников).
+       Соседи принятого ищутся через searchsorted по строкам, поэтому тысячи совпадений обрабатываются
+       векторно без циклов по пикселям. top_k ограничивает число принятых совпадений.
+    """
+    rows, cols = template_shape
+    window_rows = min(DETECTION_MAX_PEAK_WINDOW, 2 * (rows // 4) + 1); window_cols = min(DETECTION_MAX_PEAK_WINDOW, 2 * (cols // 4) + 1)
+    local_max = cv2.dilate(score_map, cv2.getStructuringElement(cv2.MORPH_RECT, (window_cols, window_rows)))
+    candidates = (score_map >= local_max) & (score_map > 0) # Нулевой счет (пустой фон) совпадением не считается и без порога
+    if threshold is not None: candidates &= score_map >= np.float32(threshold)
+    # Соседние кандидаты равны друг другу (каждый не меньше другого), т.е. образуют плато: от плато остается первая точка в порядке строк
+    _, labels = cv2.connectedComponents(candidates.view(np.uint8), connectivity=8, ltype=cv2.CV_32S)
+    cand_r, cand_c = np.nonzero(candidates)
+    _, first = np.unique(labels[cand_r, cand_c], return_index=True)
+    cand_r = cand_r[first]; cand_c = cand_c[first]
+    cand_scores = score_map[cand_r, cand_c]
+    order = np.lexsort((cand_c, cand_r, -cand_scores)) # По убыванию счета; при равенстве - первая позиция в порядке строк
+    cand_r = cand_r[order].astype(np.int64); cand_c = cand_c[order].astype(np.int64); cand_scores = cand_scores[order]
+    by_row = np.argsort(cand_r, kind='stable'); rows_sorted = cand_r[by_row]
+    alive = np.ones(len(cand_r), dtype=bool); kept = []
+    area = rows * cols; limit = len(cand_r) if top_k is None else min(top_k, len(cand_r))
+    for index in range(len(cand_r)): # Цикл по кандидатам (не пикселям); подавленные пропускаются
+        if len(kept) >= limit: break
+        if not alive[index]: continue
+        kept.append(index)
+        r, c = cand_r[index], cand_c[index]
+        lo = np.searchsorted(rows_sorted, r - rows + 1, side='left'); hi = np.searchsorted(rows_sorted, r + rows - 1, side='right')
+        neighbours = by_row[lo:hi]
+        neighbours = neighbours[alive[neighbours]]
+        intersection = np.maximum(0, rows - np.abs(cand_r[neighbours] - r)) * np.maximum(0, cols - np.abs(cand_c[neighbours] - c))
+        alive[neighbours[intersection > max_overlap * (2 * area - intersection)]] = False # IoU > max_overlap
+    kept = np.asarray(kept, dtype=np.int64)
+    positions = np.stack([cand_r[kept], cand_c[kept]], axis=1).astype(np.int32) if len(kept) else np.zeros((0, 2), dtype=np.int32)
+    return np.clip(cand_scores[kept], 0.0, 1.0).astype(np.float32), positions
+
+def match_best_exhaustive(img_float, template_pixels, template_max_score):
+    """ Полный перебор позиций через cv2.matchTemplate. Возвращает (счет, (r, c)). """
+    return best_match_from_score_map(exhaustive_score_map(img_float, template_pixels, template_max_score))
+
+def max_pool_2x2(binary_image):
+    """ Уменьшение в 2 раза с OR (max) по блокам 2x2 - тонкие границы не пропадают. """
+    rows, cols = binary_image.shape
+    padded = np.pad(binary_image, ((0, rows % 2), (0, cols % 2)))
+    return padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).max(axis=(1, 3))
+
+def build_edge_pyramid(edge_image, levels=PYRAMID_MAX_LEVELS):
+    """ Пирамида бинарного изображения границ: [полное разрешение (float32), /2, /4, ...] """
+    pyramid_uint8 = [edge_image]
+    for _ in range(levels):
+        next_level = max_pool_2x2(pyramid_uint8[-1])
+        if np.count_nonzero(next_level) > PYRAMID_MAX_EDGE_DENSITY * next_level.size: break
+        pyramid_uint8.append(next_level)
+    return [level.astype(np.float32) for level in pyramid_uint8]
+
+def _pyramid_levels_for_template(template_pixels, image_pyramid):
+    levels = 0
+    while levels + 1 < len(image_pyramid) and min(template_pixels.shape) / 2 ** (levels + 1) >= PYRAMID_MIN_TEMPLATE_SIDE:
+        levels += 1
+    return levels
+
+def _top_candidates(score_map, count, suppress_rows, suppress_cols):
+    """ Несколько лучших максимумов карты с подавлением окрестности вокруг каждого найденного. """
+    work = score_map.copy(); candidates = []
+    for _ in range(count):
+        _, max_val, _, max_loc = cv2.minMaxLoc(work)
+        if max_val <= 0 and candidates: break
+        r, c = max_loc[1], max_loc[0]; candidates.append((r, c))
+        work[max(0, r - suppress_rows):r + suppress_rows + 1, max(0, c - suppress_cols):c + suppress_cols + 1] = -1.0
+    return candidates
+
+def match_best_pyramid(image_pyramid, template_pixels, template_max_score):
+    """
+    Поиск от грубого к точному: полный перебор на самом грубом уровне,
+    затем уточнение только в малых окнах вокруг лучших кандидатов.
+    image_pyramid - результат build_edge_pyramid. Возвращает (счет, (r, c)) на полном разрешении.
+    """
+    levels = _pyramid_levels_for_template(template_pixels, image_pyramid)
+    if levels == 0: return match_best_exhaustive(image_pyramid[0], template_pixels, template_max_score)
+    template_pyramid = [template_pixels]
+    for _ in range(levels): template_pyramid.append(max_pool_2x2(template_pyramid[-1]))
+
+    # Грубый уровень: полный перебор
+    coarse_tpl = template_pyramid[levels].astype(np.float32)
+    coarse_map = cv2.matchTemplate(image_pyramid[levels], coarse_tpl, CV2_MATCH_METHOD)
+    candidates = _top_candidates(coarse_map, PYRAMID_TOP_CANDIDATES, coarse_tpl.shape[0] // 2, coarse_tpl.shape[1] // 2)
+
+    # Уточнение на более детальных уровнях
+    best = (0.0, (0, 0))
+    for level in range(levels - 1, -1, -1):
+        img_level = image_pyramid[level]; tpl_level = template_pyramid[level].astype(np.float32)
+        tpl_rows, tpl_cols = tpl_level.shape
+        max_r = img_level.shape[0] - tpl_rows; max_c = img_level.shape[1] - tpl_cols
+        refined = []
+        for r, c in candidates:
+            r0 = min(max(0, 2 * r - PYRAMID_REFINE_RADIUS), max_r); r1 = min(max_r, 2 * r + PYRAMID_REFINE_RADIUS + 1)
+            c0 = min(max(0, 2 * c - PYRAMID_REFINE_RADIUS), max_c); c1 = min(max_c, 2 * c + PYRAMID_REFINE_RADIUS + 1)
+            window = img_level[r0:r1 + tpl_rows, c0:c1 + tpl_cols]
+            window_map = cv2.matchTemplate(window, tpl_level, CV2_MATCH_METHOD)
+            _, max_val, _, max_loc = cv2.minMaxLoc(window_map)
+            refined.append((max_val, (r0 + max_loc[1], c0 + max_loc[0])))
+        refined.sort(key=lambda item: item[0], reverse=True)
+        candidates = list(dict.fromkeys(pos for _, pos in refined)) # Убираем совпавшие кандидаты
+        best = refined[0]
+    raw_score, best_pos = best
+    return float(np.clip(raw_score / (template_max_score + 1e-7), 0.0, 1.0)), best_pos
+
+
+class FFTCorrelator:
+    """
+    Кросс-корреляция (как TM_CCORR) в частотной области для одного изображения границ.
+    Изображение режется на тайлы размера N с перекрытием N/4 (overlap-save), поэтому память
+    на вычисление ограничена размером тайла. Спектры тайлов кэшируются: повторный поиск другим
+    шаблоном (угол, масштаб) с тем же размером тайла требует только БПФ самого шаблона.
+    """
+    def __init__(self, edge_image):
+        self.image = edge_image.astype(np.float32)
+        self.rows, self.cols = self.image.shape
+        self._spectra = {} # (N, r0, c0) -> спектр тайла (упакованный CCS, float32 N x N)
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self): return self.image.nbytes + self._cached_bytes
+
+    @staticmethod
+    def tile_size_for(template_shape):
+        """ Размер тайла: степень двойки, шаблон занимает не больше четверти стороны """
+        needed = max(FFT_MIN_TILE_SIZE, 4 * max(template_shape))
+        return 1 << (needed - 1).bit_length()
+
+    def _tile_spectrum(self, fft_size, r0, c0):
+        key = (fft_size, r0, c0)
+        spectrum = self._spectra.get(key)
+        if spectrum is not None: return spectrum
+        tile = np.zeros((fft_size, fft_size), dtype=np.float32) # Дополнение нулями до N x N
+        part = self.image[r0:r0 + fft_size, c0:c0 + fft_size]
+        tile[:part.shape[0], :part.shape[1]] = part
+        spectrum = cv2.dft(tile)
+        with self._lock:
+            if self._cached_bytes + spectrum.nbytes <= FFT_SPECTRUM_CACHE_LIMIT_BYTES and key not in self._spectra:
+                self._spectra[key] = spectrum; self._cached_bytes += spectrum.nbytes
+        return spectrum
+
+    def raw_correlation_map(self, template_pixels):
+        """ Карта сырой корреляции размера (rows - t_rows + 1, cols - t_cols + 1), как у cv2.matchTemplate """
+        tpl_rows, tpl_cols = template_pixels.shape
+        out_rows = self.rows - tpl_rows + 1; out_cols = self.cols - tpl_cols + 1
+        if out_rows <= 0 or out_cols <= 0: raise ValueError("Шаблон больше изображения.")
+        fft_size = self.tile_size_for(template_pixels.shape); step = fft_size - fft_size // 4
+        # Один прямой БПФ шаблона на весь поиск
+        padded_template = np.zeros((fft_size, fft_size), dtype=np.float32)
+        padded_template[:tpl_rows, :tpl_cols] = template_pixels
+        template_spectrum = cv2.dft(padded_template)
+        result = np.empty((out_rows, out_cols), dtype=np.float32)
+        for r0 in range(0, out_rows, step):
+            for c0 in range(0, out_cols, step):
+                # Сопряжение спектра шаблона дает корреляцию вместо свертки
+                product = cv2.mulSpectrums(self._tile_spectrum(fft_size, r0, c0), template_spectrum, 0, conjB=True)
+                valid_rows = min(step, out_rows - r0); valid_cols = min(step, out_cols - c0)
+                correlation = cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+                result[r0:r0 + valid_rows, c0:c0 + valid_cols] = correlation[:valid_rows, :valid_cols]
+        return result
+
+    def score_map(self, template_pixels, template_max_score):
+        """ Нормированная карта: сырая корреляция / template_max_score """
+        return self.raw_correlation_map(template_pixels) / np.float32(template_max_score + 1e-7)
+
+    def best_match(self, template_pixels, template_max_score):
+        return best_match_from_score_map(self.score_map(template_pixels, template_max_score))
+
+
+class ChamferMatcher:
+    """
+    Chamfer-сопоставление: карта расстояний до ближайшей границы считается один раз
+    на изображение границ, позиция шаблона оценивается средним расстоянием под его
+    пикселями контура. Счет переводится в диапазон (0, 1]: 1 / (1 + среднее расстояние).
+    """
+    def __init__(self, edge_image):
+        # distanceTransform считает расстояние до ближайшего нуля, поэтому границы делаем нулями
+        self.distance_map = cv2.distanceTransform((edge_image == 0).astype(np.uint8), cv2.DIST_L2, 3)
+        np.minimum(self.distance_map, CHAMFER_MAX_DISTANCE, out=self.distance_map)
+
+    @property
+    def nbytes(self): return self.distance_map.nbytes
+
+    @staticmethod
+    def score_from_mean_distance(mean_distance):
+        return 1.0 / (1.0 + max(0.0, float(mean_distance)))
+
+    def mean_distance_map(self, template_pixels, template_max_score):
+        """ Среднее расстояние под контуром шаблона для всех позиций (сумма - та же корреляция, что и в TM_CCORR) """
+        summed = cv2.matchTemplate(self.distance_map, template_pixels.astype(np.float32), CV2_MATCH_METHOD)
+        return summed / np.float32(max(template_max_score, 1))
+
+    def score_map(self, template_pixels, template_max_score):
+        return 1.0 / (1.0 + np.maximum(self.mean_distance_map(template_pixels, template_max_score), 0.0))
+
+    def best_match(self, template_pixels, template_max_score):
+        min_val, _, min_loc, _ = cv2.minMaxLoc(self.mean_distance_map(template_pixels, template_max_score))
+        return self.score_from_mean_distance(min_val), (min_loc[1], min_loc[0])
+
+    def score_at(self, template_coords, r, c):
+        """ Счет в одной позиции по координатам пикселей контура (rows, cols): O(длина контура) """
+        rows, cols = template_coords
+        if rows.size == 0: return 0.0
+        return self.score_from_mean_distance(self.distance_map[rows + r, cols + c].mean())
+
+
+class SparseTemplate:
+    """
+    Шаблон, скомпилированный в горизонтальные отрезки (строка, начало, конец не включительно).
+    Счет позиции = сумма по отрезкам разностей префиксных сумм строки: O(число отрезков).
+    """
+    def __init__(self, template_pixels):
+        self.rows, self.cols = template_pixels.shape
+        self.pixel_count = int(np.count_nonzero(template_pixels))
+        padded = np.zeros((self.rows, self.cols + 2), dtype=np.int8)
+        padded[:, 1:-1] = template_pixels != 0
+        transitions = np.diff(padded, axis=1) # +1 - начало отрезка, -1 - конец
+        self.run_rows, self.run_starts = np.nonzero(transitions == 1)
+        _, self.run_ends = np.nonzero(transitions == -1) # Порядок обхода строк тот же, пары совпадают
+        self._coords = None
+
+    @property
+    def run_count(self): return len(self.run_rows)
+
+    @property
+    def coords(self):
+        """ Координаты всех пикселей контура (rows, cols) """
+        if self._coords is None:
+            lengths = self.run_ends - self.run_starts
+            rows = np.repeat(self.run_rows, lengths)
+            offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            self._coords = (rows, np.repeat(self.run_starts, lengths) + offsets)
+        return self._coords
+
+    def is_sparse_enough(self, out_area=None):
+        """ Стоит ли использовать разреженную форму для перебора (out_area - число проверяемых позиций) """
+        area = self.rows * self.cols
+        if area < SPARSE_TEMPLATE_MIN_AREA or self.pixel_count > SPARSE_TEMPLATE_MAX_DENSITY * area: return False
+        if out_area is None: return self.run_count <= SPARSE_MAX_RUNS_FOR_FULL_SEARCH
+        return 2 * self.run_count * out_area <= area * SPARSE_MAX_RUNS_FOR_FULL_SEARCH # Малое окно поиска
+
+
+class SparseScorer:
+    """ Префиксные суммы по строкам изображения границ для оценки разреженных шаблонов. """
+    def __init__(self, edge_image):
+        self.rows, self.cols = edge_image.shape
+        self.prefix = np.zeros((self.rows, self.cols + 1), dtype=np.int32)
+        np.cumsum(edge_image, axis=1, dtype=np.int32, out=self.prefix[:, 1:])
+
+    @property
+    def nbytes(self): return self.prefix.nbytes
+
+    def raw_score_at(self, sparse_template, r, c):
+        rows = sparse_template.run_rows + r
+        return int((self.prefix[rows, sparse_template.run_ends + c] - self.prefix[rows, sparse_template.run_starts + c]).sum())
+
+    def raw_score_map(self, sparse_template, window=None):
+        """
+        Карта сырых счетов позиций: по два сдвинутых среза префиксных сумм на отрезок.
+        window=(r0, c0, rows, cols) ограничивает перебор окном позиций, иначе - все позиции.
+        """
+        max_rows = self.rows - sparse_template.rows + 1; max_cols = self.cols - sparse_template.cols + 1
+        if max_rows <= 0 or max_cols <= 0: raise ValueError("Шаблон больше изображения.")
+        r0, c0, out_rows, out_cols = window if window is not None else (0, 0, max_rows, max_cols)
+        out_rows = min(out_rows, max_rows - r0); out_cols = min(out_cols, max_cols - c0)
+        if r0 < 0 or c0 < 0 or out_rows <= 0 or out_cols <= 0: raise ValueError("Окно поиска вне изображения.")
+        result = np.zeros((out_rows, out_cols), dtype=np.int32)
+        for row, start, end in zip(sparse_template.run_rows, sparse_template.run_starts, sparse_template.run_ends):
+            prefix_rows = self.prefix[r0 + row:r0 + row + out_rows]
+            result += prefix_rows[:, c0 + end:c0 + end + out_cols]; result -= prefix_rows[:, c0 + start:c0 + start + out_cols]
+        return result
+
+    def score_map(self, sparse_template, template_max_score):
+        """ Нормированная карта всех позиций (float32) """
+        return self.raw_score_map(sparse_template).astype(np.float32) / np.float32(template_max_score + 1e-7)
+
+    def best_match(self, sparse_template, template_max_score, window=None):
+        _, max_val, _, max_loc = cv2.minMaxLoc(self.raw_score_map(sparse_template, window).astype(np.float32))
+        r0, c0 = window[:2] if window is not None else (0, 0)
+        return float(np.clip(max_val / (template_max_score + 1e-7), 0.0, 1.0)), (r0 + max_loc[1], c0 + max_loc[0])
+
+
+class PackedEdgeImage:
+    """
+    Бинарное изображение 0/1, упакованное по 8 пикселей в байт вдоль строк (np.packbits, старший бит - левый пиксель).
+    Занимает в 8 раз меньше uint8 и в 32 раза меньше float32; хвост последнего байта строки заполнен нулями.
+    """
+    def __init__(self, binary_image):
+        self.rows, self.cols = binary_image.shape
+        self.packed = np.packbits(binary_image, axis=1)
+
+    @property
+    def nbytes(self): return self.packed.nbytes
+
+    def unpack(self):
+        return np.unpackbits(self.packed, axis=1, count=self.cols)
+
+
+class PackedTemplate:
+    """
+    Шаблон в упакованном виде для всех 8 битовых сдвигов: сдвиг s соответствует столбцу позиции c = 8 * q + s,
+    тогда строки шаблона ложатся на байты q, q + 1, ... упакованного изображения без перепаковки изображения.
+    """
+    def __init__(self, template_pixels):
+        self.rows, self.cols = template_pixels.shape
+        self.pixel_count = int(np.count_nonzero(template_pixels))
+        self.shifted = []; self.nonzero_bytes = []
+        for shift in range(8):
+            padded = np.zeros((self.rows, self.cols + shift), dtype=np.uint8)
+            padded[:, shift:] = template_pixels != 0
+            packed = np.packbits(padded, axis=1)
+            self.shifted.append(packed); self.nonzero_bytes.append(np.argwhere(packed))
+
+
+class BitPackedMatcher:
+    """ Корреляция бинарных изображений как AND + popcount по упакованным строкам. """
+    def __init__(self, edge_image):
+        self.image = edge_image if isinstance(edge_image, PackedEdgeImage) else PackedEdgeImage(edge_image)
+
+    @property
+    def nbytes(self): return self.image.nbytes
+
+    def raw_score_at(self, packed_template, r, c):
+        q, shift = divmod(c, 8); template = packed_template.shifted[shift]
+        window = self.image.packed[r:r + template.shape[0], q:q + template.shape[1]]
+        return int(popcount_u8(window & template).sum(dtype=np.int64))
+
+    def raw_score_map(self, packed_template):
+        """
+        Карта сырых счетов всех позиций. Для каждого сдвига и каждого ненулевого байта шаблона
+        к накопителю добавляется popcount(сдвинутый срез байтов изображения & байт шаблона).
+        """
+        out_rows = self.image.rows - packed_template.rows + 1; out_cols = self.image.cols - packed_template.cols + 1
+        if out_rows <= 0 or out_cols <= 0: raise ValueError("Шаблон больше изображения.")
+        accumulator_type = np.uint16 if packed_template.pixel_count < 2**16 else np.int32
+        result = np.zeros((out_rows, out_cols), dtype=accumulator_type)
+        counts = np.empty(0, dtype=np.uint8)
+        for shift in range(min(8, out_cols)):
+            positions = (out_cols - 1 - shift) // 8 + 1 # Столбцы c = shift, shift + 8, ...
+            accumulator = np.zeros((out_rows, positions), dtype=accumulator_type)
+            if counts.shape != accumulator.shape: counts = np.empty(accumulator.shape, dtype=np.uint8)
+            template = packed_template.shifted[shift]
+            for i, j in packed_template.nonzero_bytes[shift]:
+                np.bitwise_and(self.image.packed[i:i + out_rows, j:j + positions], template[i, j], out=counts)
+                popcount_u8(counts, out=counts); np.add(accumulator, counts, out=accumulator)
+            result[:, shift::8] = accumulator
+        return result
+
+    def score_map(self, packed_template, template_max_score):
+        return self.raw_score_map(packed_template).astype(np.float32) / np.float32(template_max_score + 1e-7)
+
+    def best_match(self, packed_template, template_max_score):
+        return best_match_from_score_map(self.score_map(packed_template, template_max_score))
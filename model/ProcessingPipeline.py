@@ -0,0 +1,98 @@
+# model/ProcessingPipeline.py
+import threading
+from collections import OrderedDict
+import numpy as np
+import cv2
+
+PIPELINE_CACHE_LIMIT_BYTES = 1024 * 1024 * 1024 # Общий лимит памяти на промежуточные результаты
+
+def estimate_nbytes(value):
+    """ Оценка занимаемой памяти результата узла (массивы, списки массивов, объекты с nbytes) """
+    if value is None: return 0
+    if isinstance(value, (list, tuple)): return sum(estimate_nbytes(item) for item in value)
+    return int(getattr(value, 'nbytes', 0))
+
+class ProcessingPipeline:
+    """
+    Ленивый граф обработки изображения для вкладки сравнения:
+    полутоновое -> размытие -> границы (фильтр + порог) -> float32 / пирамида / спектры -> карта счетов.
+    Каждый узел вычисляется по запросу и мемоизируется по ключу из своих параметров
+    и ключа входного узла. Кэш вытесняет давно не использованные узлы (LRU) при превышении лимита байт.
+    """
+    SOURCE_KEY = ('gray',)
+
+    def __init__(self, limit_bytes=PIPELINE_CACHE_LIMIT_BYTES):
+        self.limit_bytes = limit_bytes
+        self._source = None
+        self._cache = OrderedDict() # ключ узла -> результат
+        self._lock = threading.RLock()
+        self.hits = 0; self.misses = 0
+
+    def set_source(self, grayscale_image):
+        """ Новое исходное изображение: все производные узлы становятся недействительными """
+        with self._lock: self._source = grayscale_image; self._cache.clear()
+
+    def clear(self):
+        with self._lock: self._cache.clear()
+
+    @property
+    def cached_bytes(self):
+        with self._lock: return sum(estimate_nbytes(value) for value in self._cache.values())
+
+    def get(self, key, compute):
+        """ Результат узла key; при отсутствии вычисляется compute() и запоминается """
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key); self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        value = compute() # Вне блокировки: параллельные потоки перебора не ждут друг друга
+        with self._lock:
+            if key in self._cache: return self._cache[key] # Другой поток успел раньше
+            self._cache[key] = value
+            self._evict(keep_key=key)
+        return value
+
+    def peek(self, key):
+        """ Результат узла, если он уже вычислен, иначе None (без вычисления) """
+        with self._lock:
+            if key not in self._cache: return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def put(self, key, value):
+        with self._lock: self._cache[key] = value; self._cache.move_to_end(key); self._evict(keep_key=key)
+
+    def _evict(self, keep_key):
+        total = sum(estimate_nbytes(value) for value in self._cache.values())
+        while total > self.limit_bytes and len(self._cache) > 1:
+            oldest_key = next(iter(self._cache))
+            if oldest_key == keep_key: break
+            total -= estimate_nbytes(self._cache.pop(oldest_key))
+
+    # --- Узлы графа ---
+    @staticmethod
+    def blur_key(ksize, sigmaX):
+        return ('blur', tuple(ksize), float(sigmaX))
+
+    def input_image(self, input_key):
+        """ Полутоновое изображение (SOURCE_KEY) или размытое (blur_key) """
+        if input_key == self.SOURCE_KEY: return self._source
+        _, ksize, sigmaX = input_key
+        return self.get(input_key, lambda: cv2.GaussianBlur(self._source, ksize, sigmaX))
+
+    @staticmethod
+    def edges_key(filter_name, params, input_key):
+        return ('edges', filter_name, tuple(sorted(params.items())), input_key)
+
+    def edges(self, filter_name, filter_func, params, input_key):
+        """ Бинарное изображение границ (0/1) фильтра filter_name с параметрами params """
+        key = self.edges_key(filter_name, params, input_key)
+        return key, self.get(key, lambda: filter_func(self.input_image(input_key), **params))
+
+    def derived(self, kind, edges_key, compute):
+        """ Производный от изображения границ узел (float32, пирамида, спектры, карта расстояний, ...) """
+        return self.get((kind, edges_key), compute)
+
+    def edges_float32(self, edges_key, edge_image):
+        return self.derived('float32', edges_key, lambda: edge_image.astype(np.float32))
@@ -0,0 +1,166 @@
+# model/SequenceTracker.py
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+from .EdgeFilters import edge_filter
+from .MatchingEngines import exhaustive_score_map, best_match_from_score_map, FFTCorrelator
+
+SEQUENCE_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+TRACK_WINDOW_PIXELS = 24 # Окно поиска вокруг прежней позиции: ±пикселей по каждой оси
+TRACK_WINDOW_DEGREES = 5.0 # Окно поиска вокруг прежнего угла: ±градусов
+TRACK_ANGLE_STEP = 1.0
+TRACK_FALLBACK_SCORE = 0.5 # Ниже этого счета цель считается потерянной: полный поиск по кадру
+TRACK_FALLBACK_DEGREES = 180.0 # Углы полного поиска: ±градусов вокруг прежнего угла (180 - весь круг)
+TRACK_FALLBACK_ANGLE_STEP = 5.0 # Грубый шаг углов полного поиска; найденный угол уточняется с шагом angle_step
+
+def _natural_key(name):
+    """ Ключ сортировки кадров: frame_2 раньше frame_10 """
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+def sequence_frame_names(directory):
+    """ Изображения каталога в порядке кадров """
+    return sorted((name for name in os.listdir(directory) if name.lower().endswith(SEQUENCE_IMAGE_EXTENSIONS)), key=_natural_key)
+
+def read_sequence_frames(path):
+    """ Кадры каталога изображений или видеофайла по порядку: (имя кадра, полутоновое изображение uint8) """
+    if os.path.isdir(path):
+        for name in sequence_frame_names(path):
+            img = cv2.imread(os.path.join(path, name), cv2.IMREAD_GRAYSCALE)
+            if img is None: raise ValueError(f"Не удалось загрузить кадр '{name}'.")
+            yield name, img
+        return
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened(): raise ValueError(f"Не удалось открыть видео '{path}'.")
+    try:
+        index = 0
+        while True:
+            ok, frame = capture.read()
+            if not ok: break
+            yield f"кадр {index}", (cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame)
+            index += 1
+    finally: capture.release()
+
+def sequence_frame_count(path):
+    """ Число кадров (для видео - по заголовку файла, может быть неточным); None, если неизвестно """
+    if os.path.isdir(path): return len(sequence_frame_names(path))
+    capture = cv2.VideoCapture(path)
+    try: return int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+    finally: capture.release()
+
+class SequenceTracker:
+    """
+    Сопровождение шаблона по последовательности кадров (каталог или видео).
+    Цель между соседними кадрами смещается мало, поэтому на каждом кадре проверяется только окно
+    ±window_pixels вокруг центра прежнего совпадения и углы ±window_degrees вокруг прежнего угла
+    (cv2.matchTemplate по вырезке кадра). Если лучший счет в окне ниже fallback_score (или это первый кадр),
+    выполняется полный поиск: по всему кадру и углам ±fallback_degrees с грубым шагом fallback_angle_step
+    (БПФ-корреляция, спектры кадра общие для всех углов), затем уточнение в окне вокруг найденного
+    с углами ±fallback_angle_step и шагом angle_step. Так цель находится снова, даже если повернулась за окно.
+    Чтение и фильтрация следующего кадра идут в отдельном потоке, пока сопоставляется текущий.
+    Фильтр, порог, размытие, шаблон и его масштаб берутся из модели сравнения и не меняются.
+    """
+    def __init__(self, model, window_pixels=TRACK_WINDOW_PIXELS, window_degrees=TRACK_WINDOW_DEGREES,
+                 angle_step=TRACK_ANGLE_STEP, fallback_score=TRACK_FALLBACK_SCORE,
+                 fallback_degrees=TRACK_FALLBACK_DEGREES, fallback_angle_step=TRACK_FALLBACK_ANGLE_STEP):
+        edges_key = model._get_active_edge_key()
+        if edges_key is None: raise ValueError("Фильтр границ не применен.")
+        if model.original_template_pixels is None: raise ValueError("Шаблон не загружен.")
+        if window_pixels < 0 or window_degrees < 0 or angle_step <= 0: raise ValueError("Некорректное окно поиска.")
+        if fallback_degrees < 0 or fallback_angle_step <= 0: raise ValueError("Некорректный диапазон углов полного поиска.")
+        self.model = model
+        self.filter_name = model.image_display_mode
+        self.filter_params = dict(edges_key[2]); self.threshold_value = self.filter_params.pop('threshold_value')
+        self.blur = model._blur_params if model.gaussian_blur_active else None
+        self.scale = model.template_scale_factor
+        self.window_pixels = int(window_pixels); self.window_degrees = float(window_degrees)
+        self.angle_step = float(angle_step); self.fallback_score = float(fallback_score)
+        self.fallback_degrees = float(fallback_degrees); self.fallback_angle_step = float(fallback_angle_step)
+
+    def _edges(self, gray):
+        """ Изображение границ кадра (float32 0/1) теми же фильтром, порогом и размытием, что в модели """
+        if self.blur is not None: gray = cv2.GaussianBlur(gray, tuple(self.blur[0]), self.blur[1])
+        return edge_filter(self.filter_name, gray, self.threshold_value, **self.filter_params).astype(np.float32)
+
+    def _prefetched_frames(self, path):
+        """ Кадры с готовыми границами; следующий кадр читается и фильтруется в фоне, пока текущий сопоставляется """
+        frames = read_sequence_frames(path)
+        def load_next():
+            item = next(frames, None)
+            return None if item is None else (item[0], self._edges(item[1]))
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            pending = executor.submit(load_next)
+            while True:
+                frame = pending.result()
+                if frame is None: break
+                pending = executor.submit(load_next)
+                yield frame
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True); frames.close()
+
+    @staticmethod
+    def _angles(center_angle, half_range, step):
+        """ Углы center ± half_range с шагом step (без повторов, если диапазон замыкает круг) """
+        count = int(np.floor(half_range / step + 1e-9))
+        return list(dict.fromkeys(round((center_angle + k * step) % 360.0, 9) for k in range(-count, count + 1)))
+
+    def _variants(self, angles, image_shape):
+        """ [(угол, пиксели, макс. счет), ...] вариантов шаблона, помещающихся в кадр """
+        variants = []
+        for angle in angles:
+            tpl, max_score = self.model._template_variant(angle, self.scale)
+            if tpl is None or max_score <= 0 or tpl.shape[0] > image_shape[0] or tpl.shape[1] > image_shape[1]: continue
+            variants.append((angle, tpl, max_score))
+        return variants
+
+    def _window_search(self, edges, variants, center):
+        """ Лучшее совпадение в окне ±window_pixels вокруг центра (r, c): (счет, позиция, угол, размер шаблона) """
+        rows, cols = edges.shape; best = (-1.0, None, None, None)
+        for angle, tpl, max_score in variants:
+            h, w = tpl.shape
+            r_lo = max(0, int(round(center[0] - h / 2.0)) - self.window_pixels); r_hi = min(rows - h, int(round(center[0] - h / 2.0)) + self.window_pixels)
+            c_lo = max(0, int(round(center[1] - w / 2.0)) - self.window_pixels); c_hi = min(cols - w, int(round(center[1] - w / 2.0)) + self.window_pixels)
+            if r_hi < r_lo or c_hi < c_lo: continue
+            score, (r, c) = best_match_from_score_map(exhaustive_score_map(edges[r_lo:r_hi + h, c_lo:c_hi + w], tpl, max_score))
+            if score > best[0]: best = (score, (r + r_lo, c + c_lo), angle, tpl.shape)
+        return best
+
+    def _full_search(self, edges, center_angle):
+        """ Полный поиск: весь кадр, углы ±fallback_degrees с грубым шагом, затем уточнение угла и позиции в окне """
+        variants = self._variants(self._angles(center_angle, self.fallback_degrees, self.fallback_angle_step), edges.shape)
+        correlator = FFTCorrelator(edges); best = (-1.0, None, None, None)
+        for angle, tpl, max_score in variants:
+            score, pos = correlator.best_match(tpl, max_score)
+            if score > best[0]: best = (score, pos, angle, tpl.shape)
+        if best[1] is None: return best
+        _, pos, angle, shape = best
+        fine = self._variants(self._angles(angle, self.fallback_angle_step, self.angle_step), edges.shape)
+        refined = self._window_search(edges, fine, (pos[0] + shape[0] / 2.0, pos[1] + shape[1] / 2.0))
+        return refined if refined[0] > best[0] else best
+
+    def track(self, path, progress=None):
+        """
+        Сопровождение по всем кадрам path. Возвращает строки по кадрам:
+        {'index', 'name', 'score', 'pos', 'angle', 'shape', 'mode' ('window'/'full'), 'seconds'}.
+        progress(доля или None, текст) вызывается после каждого кадра; исключение из него прерывает обход.
+        """
+        total = sequence_frame_count(path)
+        results = []; center = None; angle = self.model.template_angle_degrees
+        for index, (name, edges) in enumerate(self._prefetched_frames(path)):
+            start_time = time.perf_counter()
+            score, pos, found_angle, shape, mode = -1.0, None, None, None, 'window'
+            if center is not None:
+                variants = self._variants(self._angles(angle, self.window_degrees, self.angle_step), edges.shape)
+                score, pos, found_angle, shape = self._window_search(edges, variants, center)
+            if pos is None or score < self.fallback_score:
+                mode = 'full'; score, pos, found_angle, shape = self._full_search(edges, angle)
+                if pos is None: raise ValueError(f"Шаблон больше кадра '{name}'.")
+            angle = found_angle; center = (pos[0] + shape[0] / 2.0, pos[1] + shape[1] / 2.0)
+            results.append({'index': index, 'name': name, 'score': score, 'pos': pos, 'angle': found_angle, 'shape': shape,
+                            'mode': mode, 'seconds': time.perf_counter() - start_time})
+            if progress: progress(min(1.0, (index + 1) / total) if total else None, f"кадр {index + 1}" + (f" из {total}" if total else ""))
+        if not results: raise ValueError(f"В '{path}' нет кадров.")
+        return results
@@ -0,0 +1,161 @@
+# model/TemplateBank.py
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+import cv2
+from .DrawingModel import DrawingModel
+
+BANK_MAGIC = b'TPLBANK1'
+BANK_ALIGNMENT = 64 # Начало блока данных выравнивается (memmap и чтение строк без смещений)
+
+def template_file_hash(filename):
+    """ SHA-1 содержимого XML-файла шаблона: ключ шаблона в банке """
+    with open(filename, 'rb') as f: return hashlib.sha1(f.read()).hexdigest()
+
+def rasterize_template_xml(filename):
+    """
+    Растеризация контура <polygon> в бинарный шаблон (uint8 0/1, размер по крайним вершинам).
+    Возвращает (пиксели, физическая высота из XML в метрах, высота контура в пикселях).
+    """
+    parser_model = DrawingModel(1, 1)
+    parser_model.load_from_xml(filename)
+    if not parser_model.vertices: raise ValueError("В файле не найдено корректных вершин.")
+    coords = parser_model.vertices.coords # (x, y) всех вершин одним массивом
+    min_y, max_y = int(coords[:, 1].min()), int(coords[:, 1].max())
+    rows = max_y + 1; cols = int(coords[:, 0].max()) + 1
+    if rows <= 0 or cols <= 0: raise ValueError("Не удалось определить размеры шаблона.")
+    outline_model = DrawingModel(rows, cols)
+    outline_model.vertices = parser_model.vertices
+    outline_model.update_field()
+    return np.array(outline_model.pixel_field, dtype=np.uint8), parser_model.template_physical_height_meters, max_y - min_y + 1
+
+def rotate_and_scale_template(original_pixels, angle_degrees, scale_factor):
+    """ Поворачивает и масштабирует бинарный шаблон. Возвращает uint8 0/1 или None. """
+    src_h, src_w = original_pixels.shape[:2]
+    if src_h == 0 or src_w == 0: return None # Нечего поворачивать/масштабировать
+
+    # 1. Поворот оригинального шаблона
+    center_x, center_y = src_w / 2.0, src_h / 2.0 # Используем float для центра
+    rotation_matrix = cv2.getRotationMatrix2D((center_x, center_y), angle_degrees, 1.0)
+
+    cos_abs = np.abs(rotation_matrix[0, 0])
+    sin_abs = np.abs(rotation_matrix[0, 1])
+    new_w = int(np.ceil((src_h * sin_abs) + (src_w * cos_abs))) # Округляем вверх
+    new_h = int(np.ceil((src_h * cos_abs) + (src_w * sin_abs)))
+
+    rotation_matrix[0, 2] += (new_w / 2.0) - center_x
+    rotation_matrix[1, 2] += (new_h / 2.0) - center_y
+
+    rotated_template = cv2.warpAffine(original_pixels, rotation_matrix, (new_w, new_h),
+                                      flags=cv2.INTER_NEAREST, borderValue=0) # INTER_NEAREST для бинарных
+    rotated_template_binary = (rotated_template > 0.5).astype(np.uint8)
+
+    # 2. Масштабирование повернутого шаблона
+    final_rows = max(1, int(np.round(rotated_template_binary.shape[0] * scale_factor)))
+    final_cols = max(1, int(np.round(rotated_template_binary.shape[1] * scale_factor)))
+    scaled_and_rotated_template = cv2.resize(rotated_template_binary, (final_cols, final_rows), interpolation=cv2.INTER_NEAREST)
+    return (scaled_and_rotated_template > 0.5).astype(np.uint8)
+
+def variant_key(angle_degrees, scale_factor):
+    """ Ключ варианта: угол по модулю 360 и масштаб, округленные, чтобы ошибки float не мешали поиску """
+    return (round(float(angle_degrees) % 360.0, 6) % 360.0, round(float(scale_factor), 6))
+
+def _pack(pixels):
+    """ Бинарный шаблон -> (байты строк, упакованных по 8 пикселей) """
+    return np.packbits(pixels.astype(bool), axis=1).tobytes()
+
+class TemplateBank:
+    """
+    Банк предкомпилированных шаблонов: один файл, отображаемый в память.
+    Для каждого XML (ключ - SHA-1 содержимого) хранит растеризованный контур и варианты
+    для сетки углов x масштабов, упакованные по битам (np.packbits по строкам).
+    Формат: BANK_MAGIC, длина заголовка (uint64 LE), заголовок JSON (смещения и размеры массивов),
+    выравнивание до BANK_ALIGNMENT, блок данных. Загрузка шаблона и смена угла на сетке - поиск в словаре
+    и распаковка нескольких килобайт вместо разбора XML, растеризации и warpAffine.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(BANK_MAGIC)) != BANK_MAGIC: raise ValueError(f"'{path}' не является банком шаблонов.")
+            header_length, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        self.data_offset = header['data_offset']
+        self.templates = header['templates'] # хэш -> описание (имя, физ. высота, контур, сетка, варианты)
+        data_size = os.path.getsize(path) - self.data_offset
+        self._data = np.memmap(path, dtype=np.uint8, mode='r', offset=self.data_offset, shape=(data_size,)) if data_size > 0 else np.zeros(0, np.uint8)
+        self._variant_index = {content_hash: {variant_key(angle, scale): index for index, (angle, scale) in enumerate(entry['grid'])}
+                               for content_hash, entry in self.templates.items()}
+
+    def __contains__(self, content_hash): return content_hash in self.templates
+
+    def __len__(self): return len(self.templates)
+
+    def close(self): self._data = None
+
+    def _unpack(self, record):
+        offset, rows, cols = record[:3]
+        row_bytes = (cols + 7) // 8
+        packed = self._data[offset:offset + rows * row_bytes].reshape(rows, row_bytes)
+        return np.unpackbits(packed, axis=1, count=cols)
+
+    def original(self, content_hash):
+        """ (пиксели контура, физическая высота в метрах, высота контура в пикселях) """
+        entry = self.templates[content_hash]
+        return self._unpack(entry['original']), entry['physical_height_m'], entry['height_pixels']
+
+    def variant(self, content_hash, angle_degrees, scale_factor):
+        """ Вариант шаблона uint8 0/1 для угла/масштаба сетки; None, если такого варианта в банке нет """
+        index = self._variant_index.get(content_hash, {}).get(variant_key(angle_degrees, scale_factor))
+        if index is None: return None
+        return self._unpack(self.templates[content_hash]['variants'][index])
+
+    def describe(self):
+        """ Краткое описание для сообщений: [(имя, хэш, число вариантов), ...] """
+        return [(entry['name'], content_hash, len(entry['variants'])) for content_hash, entry in self.templates.items()]
+
+def compile_template_bank(xml_paths, bank_path, angles, scales, progress=None):
+    """
+    Компилирует XML-шаблоны в банк: контур и варианты для всех пар (угол, масштаб) из angles x scales.
+    Масштабы - абсолютные template_scale_factor (как после автоподстройки под м/пкс изображения).
+    progress(доля, текст) вызывается после каждого шаблона. Возвращает число записанных шаблонов.
+    """
+    grid = [variant_key(angle, scale) for angle in angles for scale in scales]
+    grid = list(dict.fromkeys(grid))
+    templates = {}; chunks = []; data_size = 0
+
+    def add(pixels):
+        nonlocal data_size
+        chunk = _pack(pixels); record = [data_size, int(pixels.shape[0]), int(pixels.shape[1]), int(np.sum(pixels))]
+        chunks.append(chunk); data_size += len(chunk)
+        return record
+
+    for index, xml_path in enumerate(xml_paths):
+        content_hash = template_file_hash(xml_path)
+        if content_hash not in templates:
+            pixels, physical_height, height_pixels = rasterize_template_xml(xml_path)
+            variants = []; variant_grid = []
+            for angle, scale in grid:
+                variant = rotate_and_scale_template(pixels, angle, scale)
+                if variant is None: continue
+                variants.append(add(variant)); variant_grid.append([angle, scale])
+            templates[content_hash] = {'name': os.path.basename(xml_path), 'physical_height_m': physical_height,
+                                       'height_pixels': height_pixels, 'original': add(pixels), 'grid': variant_grid, 'variants': variants}
+        if progress: progress((index + 1) / len(xml_paths), f"шаблон {index + 1} из {len(xml_paths)}")
+
+    header = {'templates': templates, 'data_offset': 0}
+    # Смещение данных зависит от длины заголовка, а заголовок содержит смещение: подбираем до сходимости
+    while True:
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        prefix = len(BANK_MAGIC) + 8 + len(header_bytes)
+        data_offset = -(-prefix // BANK_ALIGNMENT) * BANK_ALIGNMENT
+        if data_offset == header['data_offset']: break
+        header['data_offset'] = data_offset
+    temporary_path = bank_path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(BANK_MAGIC); f.write(struct.pack('<Q', len(header_bytes))); f.write(header_bytes)
+        f.write(b'\0' * (data_offset - prefix))
+        for chunk in chunks: f.write(chunk)
+    os.replace(temporary_path, bank_path) # Открытый другими процессами банк не повреждается при перекомпиляции
+    return len(templates)
@@ -0,0 +1,160 @@
+# model/TiledProcessor.py
+import os
+import shutil
+import tempfile
+import numpy as np
+import cv2
+from PIL import Image
+from .EdgeFilters import EDGE_STRENGTH_FUNCTIONS, FILTER_KERNEL_RADIUS, EdgeBuffers, EdgeStrength
+from .MatchingEngines import CV2_MATCH_METHOD
+
+TILE_SIZE = 2048 # Сторона тайла (пиксели результата без перекрытия)
+
+# Несжатые форматы, которые PIL описывает как 'raw' (TIFF без сжатия, BMP, PGM/PPM): режим строки -> (каналов, преобразование в серый)
+RAW_PIXEL_LAYOUTS = {'L': (1, None), 'RGB': (3, cv2.COLOR_RGB2GRAY), 'BGR': (3, cv2.COLOR_BGR2GRAY),
+                     'RGBA': (4, cv2.COLOR_RGBA2GRAY), 'RGBX': (4, cv2.COLOR_RGBA2GRAY), 'BGRA': (4, cv2.COLOR_BGRA2GRAY), 'BGRX': (4, cv2.COLOR_BGRA2GRAY)}
+SOURCE_BAND_ROWS = 256 # Строк на одну полосу при переводе цветного несжатого файла в полутоновый memmap
+
+def _raw_pixel_bands(filename):
+    """
+    Для несжатого файла - ((строк, столбцов), [(r0, r1, строки memmap, преобразование в серый или None), ...]) без чтения пикселей;
+    None, если формат сжат или раскладка пикселей не поддерживается.
+    """
+    try: image = Image.open(filename)
+    except Exception: return None
+    with image: (cols, rows), tiles = image.size, list(image.tile)
+    if not tiles or any(tile[0] != 'raw' for tile in tiles): return None
+    bands = []
+    for _, (x0, y0, x1, y1), offset, args in tiles:
+        args = args if isinstance(args, tuple) else (args,)
+        raw_mode, stride, orientation = (tuple(args) + (0, 1))[:3]
+        if raw_mode not in RAW_PIXEL_LAYOUTS or x0 != 0 or x1 != cols: return None
+        channels, conversion = RAW_PIXEL_LAYOUTS[raw_mode]
+        stride = stride or cols * channels # Строки BMP дополнены до 4 байт - PIL передает шаг явно
+        block = np.memmap(filename, dtype=np.uint8, mode='r', offset=offset, shape=(y1 - y0, stride))[:, :cols * channels]
+        block = block.reshape(y1 - y0, cols, channels) if channels > 1 else block
+        bands.append((y0, y1, block[::-1] if orientation < 0 else block, conversion)) # BMP хранится снизу вверх
+    return (rows, cols), bands
+
+def open_grayscale_source(filename, scratch_dir, progress=None):
+    """
+    Полутоновый источник, читаемый по частям. Ограниченная память (размер тайла, а не изображения) - только для
+    несжатых входов: .npy (2D uint8) и полутоновые TIFF/PGM отображаются в память без копирования, цветные несжатые
+    TIFF/BMP/PPM переводятся в серый по полосам SOURCE_BAND_ROWS строк (cv2.cvtColor: отличие от cv2.imread - не более 1 уровня). Сжатые форматы (PNG, JPEG, TIFF со сжатием)
+    по частям не читаются: файл декодируется целиком один раз, сбрасывается в memmap и сразу освобождается,
+    поэтому пик памяти при открытии - размер полутонового изображения.
+    progress(доля, текст) вызывается перед каждой полосой (может прервать чтение исключением).
+    """
+    if os.path.splitext(filename)[1].lower() == '.npy':
+        source = np.load(filename, mmap_mode='r')
+        if source.ndim != 2 or source.dtype != np.uint8: raise ValueError(f"Ожидался 2D массив uint8, получен {source.dtype} {source.shape}.")
+        return source
+    raw = _raw_pixel_bands(filename)
+    if raw is not None:
+        shape, bands = raw
+        if len(bands) == 1 and bands[0][3] is None and bands[0][:2] == (0, shape[0]): return bands[0][2] # Полутоновый файл целиком - без копии
+        source = np.memmap(os.path.join(scratch_dir, 'source.u8'), dtype=np.uint8, mode='w+', shape=shape)
+        for r0, r1, block, conversion in bands:
+            for start in range(0, r1 - r0, SOURCE_BAND_ROWS):
+                if progress: progress(0.0, f"чтение: строки {r0 + start + 1} из {shape[0]}")
+                part = block[start:start + SOURCE_BAND_ROWS]
+                source[r0 + start:r0 + start + len(part)] = part if conversion is None else cv2.cvtColor(np.ascontiguousarray(part), conversion)
+        source.flush()
+        return source
+    img = cv2.imread(filename, cv2.IMREAD_GRAYSCALE)
+    if img is None: raise ValueError(f"Не удалось загрузить изображение '{filename}'.")
+    source = np.memmap(os.path.join(scratch_dir, 'source.u8'), dtype=np.uint8, mode='w+', shape=img.shape)
+    source[:] = img; del img # Декодированный кадр не держим до конца обработки тайлов
+    source.flush()
+    return source
+
+def _tile_ranges(length, tile_size):
+    return [(start, min(start + tile_size, length)) for start in range(0, length, tile_size)]
+
+class TiledProcessor:
+    """
+    Обработка изображения, не помещающегося в память: размытие, границы и поиск шаблона по тайлам.
+    Тайл читается с перекрытием (halo) на радиус размытия + радиус ядра фильтра, поэтому границы внутри тайла
+    совпадают с обработкой целого кадра; на краях изображения OpenCV отражает тот же край, что и для целого кадра.
+    Порог нормируется по глобальному максимуму силы границ (первый проход), изображение границ и карта счетов
+    хранятся в memmap-файлах во временном каталоге. Пиковая память определяется размером тайла и шаблона.
+    """
+    def __init__(self, filename, tile_size=TILE_SIZE, scratch_dir=None, progress=None):
+        self.tile_size = tile_size
+        self.scratch_dir = tempfile.mkdtemp(prefix='tiled_', dir=scratch_dir)
+        try: self.source = open_grayscale_source(filename, self.scratch_dir, progress)
+        except Exception: shutil.rmtree(self.scratch_dir, ignore_errors=True); raise
+        self.rows, self.cols = self.source.shape
+        self.edges = None; self.score_map = None
+        self.tiles_processed = 0
+        self._buffers = EdgeBuffers()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
+
+    def close(self):
+        """ Удаляет временные файлы (массивы memmap перестают быть действительными) """
+        self.source = None; self.edges = None; self.score_map = None; self._buffers.release()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def _scratch_array(self, name, dtype, shape):
+        return np.memmap(os.path.join(self.scratch_dir, name), dtype=dtype, mode='w+', shape=shape)
+
+    def _tiles(self, rows, cols, progress=None, stage=None, stage_fraction=(0.0, 1.0)):
+        """ Тайлы (r0, r1, c0, c1) в порядке строк; progress(доля, текст) вызывается перед каждым тайлом """
+        tiles = [(r0, r1, c0, c1) for r0, r1 in _tile_ranges(rows, self.tile_size) for c0, c1 in _tile_ranges(cols, self.tile_size)]
+        start, width = stage_fraction
+        for index, tile in enumerate(tiles):
+            if progress: progress(start + width * index / len(tiles), f"{stage}: тайл {index + 1} из {len(tiles)}")
+            yield tile
+
+    def _strength_tile(self, filter_name, params, blur, r0, r1, c0, c1):
+        """ Сила границ тайла [r0:r1, c0:c1], посчитанная по блоку с перекрытием """
+        blur_radius = max(blur[0]) // 2 if blur is not None else 0
+        filter_radius = max(FILTER_KERNEL_RADIUS[filter_name], (params.get('ksize', 3) - 1) // 2)
+        halo = blur_radius + filter_radius
+        br0 = max(0, r0 - halo); bc0 = max(0, c0 - halo)
+        block = np.ascontiguousarray(self.source[br0:min(self.rows, r1 + halo), bc0:min(self.cols, c1 + halo)])
+        if blur is not None: block = cv2.GaussianBlur(block, tuple(blur[0]), blur[1])
+        strength = EDGE_STRENGTH_FUNCTIONS[filter_name](block, buffers=self._buffers, **params)
+        return EdgeStrength(strength.values[r0 - br0:r1 - br0, c0 - bc0:c1 - bc0], strength.kind)
+
+    def extract_edges(self, filter_name, threshold_value, params=None, blur=None, progress=None):
+        """
+        Бинарное изображение границ (memmap uint8 0/1). blur - (ksize, sigmaX) или None.
+        Два прохода: глобальный максимум силы границ, затем порог каждого тайла относительно него.
+        """
+        params = dict(params or {})
+        max_value = 0
+        for r0, r1, c0, c1 in self._tiles(self.rows, self.cols, progress, "максимум границ", (0.0, 0.3)):
+            max_value = max(max_value, self._strength_tile(filter_name, params, blur, r0, r1, c0, c1).max_value())
+        self.edges = self._scratch_array('edges.u8', np.uint8, (self.rows, self.cols))
+        for r0, r1, c0, c1 in self._tiles(self.rows, self.cols, progress, "границы", (0.3, 0.3)):
+            strength = self._strength_tile(filter_name, params, blur, r0, r1, c0, c1)
+            self.edges[r0:r1, c0:c1] = strength.threshold(threshold_value, max_value=max_value)
+            self.tiles_processed += 1
+        self.edges.flush()
+        return self.edges
+
+    def match(self, template_pixels, template_max_score, keep_score_map=True, progress=None):
+        """
+        Лучшее совпадение шаблона на изображении границ: (счет, (r, c)).
+        Тайлы делят карту позиций без пересечений (блок границ шире на размер шаблона - 1),
+        поэтому максимум по тайлам точен; при равных счетах берется первая позиция в порядке строк, как в cv2.minMaxLoc.
+        """
+        if self.edges is None: raise ValueError("Границы не вычислены.")
+        tpl_rows, tpl_cols = template_pixels.shape
+        out_rows = self.rows - tpl_rows + 1; out_cols = self.cols - tpl_cols + 1
+        if out_rows <= 0 or out_cols <= 0: raise ValueError("Шаблон больше изображения.")
+        tpl_float = template_pixels.astype(np.float32); norm = np.float32(template_max_score + 1e-7)
+        self.score_map = self._scratch_array('scores.f32', np.float32, (out_rows, out_cols)) if keep_score_map else None
+        best = (-1.0, (0, 0))
+        for r0, r1, c0, c1 in self._tiles(out_rows, out_cols, progress, "поиск", (0.6, 0.4)):
+            block = self.edges[r0:r1 + tpl_rows - 1, c0:c1 + tpl_cols - 1].astype(np.float32)
+            scores = cv2.matchTemplate(block, tpl_float, CV2_MATCH_METHOD); np.rint(scores, out=scores); scores /= norm # Как exhaustive_score_map
+            if self.score_map is not None: self.score_map[r0:r1, c0:c1] = scores
+            _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+            pos = (r0 + max_loc[1], c0 + max_loc[0])
+            if max_val > best[0] or (max_val == best[0] and pos < best[1]): best = (max_val, pos)
+        if self.score_map is not None: self.score_map.flush()
+        return float(np.clip(best[0], 0.0, 1.0)), best[1]
@@ -0,0 +1,87 @@
+# model/VertexStore.py
+import numpy as np
+
+class VertexStore:
+    """
+    Вершины контура без повторов: координаты в массиве int32 (N x 2, емкость растет удвоением)
+    и словарь (x, y) -> позиция. Проверка принадлежности, добавление и удаление последней вершины - O(1),
+    extend добавляет целый список одной векторной операцией.
+    Для остального кода ведет себя как список кортежей: len, итерация, индексация, сравнение со списком.
+    """
+    def __init__(self, vertices=()):
+        self._coords = np.empty((0, 2), dtype=np.int32); self._count = 0
+        self._index = {} # (x, y) -> позиция в _coords
+        self.extend(vertices)
+
+    @property
+    def coords(self):
+        """ Массив (N, 2) координат (x, y) - представление без копирования, не изменять """
+        return self._coords[:self._count]
+
+    def __len__(self): return self._count
+
+    def __iter__(self): return iter([tuple(v) for v in self.coords.tolist()])
+
+    def __contains__(self, vertex): return (int(vertex[0]), int(vertex[1])) in self._index
+
+    def __getitem__(self, item):
+        if isinstance(item, slice): return [tuple(v) for v in self.coords[item].tolist()]
+        if item < 0: item += self._count
+        if not 0 <= item < self._count: raise IndexError("Индекс вершины вне диапазона.")
+        return (int(self._coords[item, 0]), int(self._coords[item, 1]))
+
+    def __eq__(self, other):
+        if isinstance(other, VertexStore): return np.array_equal(self.coords, other.coords)
+        try: return list(self) == list(other)
+        except TypeError: return NotImplemented
+
+    def __repr__(self): return f"VertexStore({list(self)!r})"
+
+    def index(self, vertex):
+        try: return self._index[(int(vertex[0]), int(vertex[1]))]
+        except KeyError: raise ValueError(f"Вершины {tuple(vertex)} нет в контуре.") from None
+
+    def tolist(self): return list(self)
+
+    def _reserve(self, count):
+        if count > len(self._coords):
+            grown = np.empty((max(count, 2 * len(self._coords), 16), 2), dtype=np.int32)
+            grown[:self._count] = self.coords; self._coords = grown
+
+    def append(self, vertex):
+        """ Добавляет вершину в конец; False, если такая уже есть """
+        key = (int(vertex[0]), int(vertex[1]))
+        if key in self._index: return False
+        self._reserve(self._count + 1)
+        self._coords[self._count] = key; self._index[key] = self._count; self._count += 1
+        return True
+
+    def pop(self):
+        """ Удаляет и возвращает последнюю вершину """
+        if not self._count: raise IndexError("Контур пуст.")
+        vertex = self[-1]; self._count -= 1; del self._index[vertex]
+        return vertex
+
+    def extend(self, vertices):
+        """
+        Добавляет вершины одним блоком, пропуская повторы (внутри списка и уже имеющиеся) с сохранением порядка.
+        Возвращает число добавленных вершин.
+        """
+        new = vertices.coords if isinstance(vertices, VertexStore) else np.asarray(list(vertices) if not isinstance(vertices, np.ndarray) else vertices, dtype=np.int64)
+        if new.size == 0: return 0
+        new = new.reshape(-1, 2).astype(np.int64)
+        keys = (new[:, 0] << 32) | (new[:, 1] & 0xFFFFFFFF)
+        _, first = np.unique(keys, return_index=True); first.sort() # Первые вхождения в исходном порядке
+        if self._count:
+            existing = self.coords.astype(np.int64); existing_keys = (existing[:, 0] << 32) | (existing[:, 1] & 0xFFFFFFFF)
+            first = first[~np.isin(keys[first], existing_keys)]
+        new = new[first]
+        if not len(new): return 0
+        self._reserve(self._count + len(new))
+        self._coords[self._count:self._count + len(new)] = new
+        self._index.update(zip(map(tuple, new.tolist()), range(self._count, self._count + len(new))))
+        self._count += len(new)
+        return len(new)
+
+    def clear(self):
+        self._count = 0; self._index.clear()
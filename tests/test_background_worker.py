@@ -0,0 +1,117 @@
+# tests/test_background_worker.py
+"""
+BackgroundWorker без Tk: after() подменен очередью, которую тест прокачивает сам (как главный цикл Tk).
+Проверяются доставка результатов, вытеснение, отмена, спекулятивные задания и ошибки.
+"""
+import threading
+import time
+import numpy as np
+import cv2
+import pytest
+from controller.BackgroundWorker import BackgroundWorker, JobCancelled
+
+class FakeWidget:
+    """ Вместо виджета Tk: after() копит вызовы, pump() выполняет их в вызывающем (главном) потоке """
+    def __init__(self): self.callbacks = []; self.thread = threading.current_thread()
+    def after(self, ms, func): self.callbacks.append(func); return len(self.callbacks)
+
+class Recorder:
+    def __init__(self): self.events = []; self.threads = set()
+    def __call__(self, *args): self.events.append(args); self.threads.add(threading.current_thread())
+
+def make_worker():
+    widget = FakeWidget(); progress = Recorder(); busy = Recorder()
+    return BackgroundWorker(widget, on_progress=progress, on_busy_changed=busy, poll_ms=1), widget, progress, busy
+
+def pump(worker, widget, until=lambda: False, timeout=5.0):
+    """ Выполняет отложенные вызовы, пока есть незавершенные задания (или пока не выполнится until) """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        callbacks, widget.callbacks = widget.callbacks, []
+        for callback in callbacks: callback()
+        if until() or (not widget.callbacks and not worker._jobs and worker._messages.empty()): return
+        time.sleep(0.002)
+    raise AssertionError("Фоновое задание не завершилось")
+
+def blocking_job(started, release, cooperative=True):
+    """ Задание ждет release; кооперативное проверяет отмену через job.progress """
+    def work(job):
+        started.set()
+        while not release.wait(0.005):
+            if cooperative: job.progress(None, "ждем")
+        return 'готово'
+    return work
+
+def test_result_and_busy_delivered_in_main_thread():
+    worker, widget, progress, busy = make_worker(); done = Recorder()
+    worker.submit("задание", lambda job: (job.progress(0.5, "половина"), 42)[1], on_done=done)
+    assert worker.busy
+    pump(worker, widget)
+    assert done.events == [(42,)] and done.threads == {widget.thread}
+    assert busy.events == [(True, "задание"), (False, None)] and not worker.busy
+    assert [event[1:] for event in progress.events] == [(0.5, "половина")]
+
+@pytest.mark.parametrize('cooperative', [True, False])
+def test_superseded_job_result_is_dropped(cooperative):
+    worker, widget, _, busy = make_worker(); first = Recorder(); second = Recorder(); cancelled = Recorder()
+    started, release = threading.Event(), threading.Event()
+    old = worker.submit("старое", blocking_job(started, release, cooperative), on_done=first, on_error=cancelled)
+    assert started.wait(5)
+    worker.submit("новое", lambda job: 'новый результат', on_done=second)
+    assert old.cancelled
+    release.set(); pump(worker, widget)
+    assert first.events == [] and cancelled.events == [] # Ни результат, ни ошибка вытесненного не доставляются
+    assert second.events == [('новый результат',)] and busy.events[-1] == (False, None)
+
+def test_cancel_stops_running_and_pending_jobs():
+    worker, widget, _, busy = make_worker(); done = Recorder(); ran = []
+    started, release = threading.Event(), threading.Event()
+    worker.submit("долгое", blocking_job(started, release), on_done=done)
+    worker.submit("в очереди", lambda job: ran.append(1), on_done=done, supersede=False)
+    assert started.wait(5)
+    worker.cancel(); pump(worker, widget)
+    assert done.events == [] and ran == [] and not worker.busy and busy.events[-1] == (False, None)
+    release.set()
+
+def test_speculative_jobs_do_not_block_and_yield_to_new_jobs():
+    worker, widget, progress, busy = make_worker(); speculative_done = Recorder(); done = Recorder()
+    worker.submit("предрасчет", lambda job: (job.progress(0.1, "угол"), 'предрасчет')[1], on_done=speculative_done, speculative=True)
+    assert not worker.busy and busy.events == []
+    pump(worker, widget)
+    assert speculative_done.events == [('предрасчет',)] and progress.events == [] and busy.events == [] # Без прогресса и занятости
+    started, release = threading.Event(), threading.Event()
+    speculative = worker.submit("предрасчет", blocking_job(started, release), on_done=speculative_done, speculative=True)
+    assert started.wait(5)
+    worker.submit("поиск", lambda job: 'найдено', on_done=done, supersede=False) # Даже без вытеснения спекулятивное уступает
+    assert speculative.cancelled
+    pump(worker, widget); release.set()
+    assert done.events == [('найдено',)] and speculative_done.events == [('предрасчет',)]
+
+def test_errors_go_to_on_error_only_for_current_job():
+    worker, widget, _, _ = make_worker(); errors = Recorder(); done = Recorder()
+    def failing(job): raise ValueError("сбой")
+    worker.submit("ошибка", failing, on_done=done, on_error=errors); pump(worker, widget)
+    assert done.events == [] and len(errors.events) == 1 and str(errors.events[0][0]) == "сбой"
+    started, release = threading.Event(), threading.Event()
+    def fail_later(job): started.set(); release.wait(5); raise ValueError("устарело")
+    worker.submit("старая ошибка", fail_later, on_error=errors); assert started.wait(5)
+    worker.submit("новое", lambda job: None, on_done=done)
+    release.set(); pump(worker, widget)
+    assert len(errors.events) == 1 and done.events == [(None,)]
+
+def test_superseded_search_does_not_move_template(tmp_path):
+    """ Поиск проверяет отмену перед записью результата: позиция шаблона в модели не меняется """
+    from model.ComparisonModel import ComparisonModel
+    from model.DrawingModel import DrawingModel
+    img = np.full((120, 160), 90, dtype=np.uint8); cv2.rectangle(img, (70, 40), (110, 80), 250, 2)
+    cv2.imwrite(str(tmp_path / 'image.png'), img)
+    drawing = DrawingModel(45, 45)
+    for x, y in [(2, 2), (42, 2), (42, 42), (2, 42)]: drawing.add_vertex(x, y)
+    drawing.template_physical_height_meters = 10.0; drawing.save_to_xml(str(tmp_path / 'template.xml'))
+    model = ComparisonModel(); model.load_image(str(tmp_path / 'image.png')); model.apply_sobel(); model.load_template_from_xml(str(tmp_path / 'template.xml'))
+    before = (model.current_pos, model.best_pos, model.score_map)
+    def superseded(fraction, text): raise JobCancelled()
+    for search in (lambda: model.find_best_match(progress=superseded), lambda: model.find_all_matches(top_k=3, progress=superseded)):
+        with pytest.raises(JobCancelled): search()
+        assert (model.current_pos, model.best_pos) == before[:2] and model.detections is None
+    assert model.find_best_match()[1] != before[0] # Без отмены поиск переносит шаблон
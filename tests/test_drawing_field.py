@@ -0,0 +1,64 @@
+# tests/test_drawing_field.py
+"""
+Инкрементальное поле DrawingModel (_draw_tail, счетчик покрытия) против прежней полной перерисовки
+алгоритмом Брезенхэма по списку вершин (как в DrawingModel до перехода на NumPy).
+"""
+import numpy as np
+import pytest
+from model.DrawingModel import DrawingModel, rasterize_line, rasterize_segments
+
+def reference_line(field, p1, p2):
+    """ Прежний _draw_line: целочисленный Брезенхэм (err = dx - dy) """
+    rows, cols = field.shape
+    x1, y1 = p1; x2, y2 = p2
+    dx = abs(x2 - x1); dy = abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1; sy = 1 if y1 < y2 else -1
+    err = dx - dy; x_curr, y_curr = x1, y1
+    while True:
+        if 0 <= y_curr < rows and 0 <= x_curr < cols: field[y_curr, x_curr] = 1
+        if x_curr == x2 and y_curr == y2: break
+        e2 = 2 * err
+        if e2 > -dy: err -= dy; x_curr += sx
+        if e2 < dx: err += dx; y_curr += sy
+
+def reference_field(vertices, rows, cols):
+    """ Прежний update_field: вершины, ребра по порядку и замыкающее ребро при 3+ вершинах """
+    field = np.zeros((rows, cols), dtype=np.uint8)
+    for x, y in vertices: field[y, x] = 1
+    for i in range(len(vertices) - 1): reference_line(field, vertices[i], vertices[i + 1])
+    if len(vertices) >= 3: reference_line(field, vertices[-1], vertices[0])
+    return field
+
+@pytest.mark.parametrize('seed', range(5))
+def test_rasterize_line_matches_bresenham(seed):
+    rng = np.random.default_rng(seed)
+    points = rng.integers(-20, 60, size=(200, 2, 2))
+    for p1, p2 in points:
+        expected = np.zeros((40, 40), dtype=np.uint8); reference_line(expected, tuple(p1), tuple(p2))
+        actual = np.zeros((40, 40), dtype=np.uint8); xs, ys = rasterize_line(p1, p2)
+        inside = (xs >= 0) & (xs < 40) & (ys >= 0) & (ys < 40); actual[ys[inside], xs[inside]] = 1
+        assert np.array_equal(actual, expected), (p1, p2)
+    xs, ys = rasterize_segments(points[:, 0], points[:, 1])
+    single = [rasterize_line(p1, p2) for p1, p2 in points]
+    assert np.array_equal(xs, np.concatenate([s[0] for s in single])) and np.array_equal(ys, np.concatenate([s[1] for s in single]))
+
+@pytest.mark.parametrize('seed', range(8))
+def test_incremental_field_matches_full_redraw(seed):
+    rng = np.random.default_rng(seed)
+    rows, cols = 37, 53
+    model = DrawingModel(rows, cols)
+    for _ in range(300):
+        action = rng.choice(['add', 'add', 'add', 'undo', 'redo'])
+        if action == 'add': model.add_vertex(int(rng.integers(0, cols)), int(rng.integers(0, rows)))
+        elif action == 'undo': model.undo_vertex()
+        else: model.redo_vertex()
+        assert np.array_equal(model.pixel_field, reference_field(list(model.vertices), rows, cols)), action
+        assert (model._coverage >= 0).all()
+    model.update_field() # Полная векторная перерисовка дает тот же счетчик покрытия, что и накопленный по шагам
+    assert np.array_equal(model.pixel_field, reference_field(list(model.vertices), rows, cols))
+
+def test_field_after_vertices_replacement():
+    model = DrawingModel(20, 20)
+    model.vertices = [(1, 1), (15, 3), (10, 18), (1, 1)] # Повтор пропускается
+    model.add_vertex(2, 12) # Поле не соответствовало вершинам - полная перерисовка
+    assert np.array_equal(model.pixel_field, reference_field([(1, 1), (15, 3), (10, 18), (2, 12)], 20, 20))
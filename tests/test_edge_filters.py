@@ -0,0 +1,51 @@
+# tests/test_edge_filters.py
+"""
+Целочисленные фильтры EdgeFilters против прежних реализаций на float (benchmarks/edge_filters_benchmark.py):
+бинарный результат должен совпадать бит в бит на случайных изображениях и порогах.
+"""
+import numpy as np
+import pytest
+from benchmarks.edge_filters_benchmark import legacy_sobel, legacy_kirsch, legacy_roberts, legacy_prewitt, synthetic_image
+from model.EdgeFilters import edge_filter, EdgeBuffers, EDGE_STRENGTH_FUNCTIONS
+
+LEGACY_FILTERS = {'sobel': legacy_sobel, 'kirsch': legacy_kirsch, 'roberts': legacy_roberts, 'prewitt': legacy_prewitt}
+
+def random_images(seed):
+    rng = np.random.default_rng(seed)
+    yield rng.integers(0, 256, size=(61, 89), dtype=np.uint8) # Шум: много пикселей у самого порога
+    yield (rng.random((40, 50)) < 0.5).astype(np.uint8) * 255 # Два уровня: большие одинаковые силы
+    yield synthetic_image(0.05, seed)
+    yield np.full((16, 16), 77, dtype=np.uint8) # Нет градиента - нет границ
+
+@pytest.mark.parametrize('filter_name', sorted(LEGACY_FILTERS))
+@pytest.mark.parametrize('seed', range(3))
+def test_matches_legacy_float_filter(filter_name, seed):
+    buffers = EdgeBuffers()
+    for img in random_images(seed):
+        for threshold_value in (0, 1, 30, 50, 60, 127, 200, 254, 255):
+            expected = LEGACY_FILTERS[filter_name](img, threshold_value=threshold_value)
+            actual = edge_filter(filter_name, img, threshold_value, buffers=buffers)
+            assert actual.dtype == np.uint8 and np.array_equal(actual, expected), (img.shape, threshold_value)
+
+@pytest.mark.parametrize('ksize', (1, 3, 5))
+def test_sobel_kernel_sizes_match_legacy(ksize):
+    for img in random_images(ksize):
+        for threshold_value in (10, 50, 200):
+            assert np.array_equal(edge_filter('sobel', img, threshold_value, ksize=ksize), legacy_sobel(img, ksize=ksize, threshold_value=threshold_value))
+
+@pytest.mark.parametrize('filter_name', sorted(LEGACY_FILTERS))
+def test_threshold_with_global_maximum(filter_name):
+    """ Порог части изображения с максимумом всего изображения (как в тайловой обработке) равен части полного результата """
+    img = synthetic_image(0.05, 7)
+    full = EDGE_STRENGTH_FUNCTIONS[filter_name](img, buffers=EdgeBuffers())
+    global_max = full.max_value(); expected = full.threshold(50)
+    part = EDGE_STRENGTH_FUNCTIONS[filter_name](img, buffers=EdgeBuffers())
+    part.values = part.values[10:60, 20:90]
+    assert np.array_equal(part.threshold(50, max_value=global_max), expected[10:60, 20:90])
+
+def test_buffers_follow_image_size():
+    buffers = EdgeBuffers()
+    edge_filter('sobel', np.zeros((100, 100), dtype=np.uint8), 50, buffers=buffers); large = buffers.nbytes()
+    edge_filter('sobel', np.zeros((10, 10), dtype=np.uint8), 50, buffers=buffers)
+    assert buffers.nbytes() == large // 100 # Буферы прежнего размера освобождены
+    buffers.release(); assert buffers.nbytes() == 0
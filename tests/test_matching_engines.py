@@ -0,0 +1,108 @@
+# tests/test_matching_engines.py
+import numpy as np
+import cv2
+import pytest
+from model.MatchingEngines import (BitPackedMatcher, PackedTemplate, FFTCorrelator, SparseTemplate, SparseScorer, ChamferMatcher,
+                                   build_edge_pyramid, detect_peaks, exhaustive_score_map, match_best_exhaustive, match_best_pyramid)
+
+@pytest.mark.parametrize('without_bitwise_count', (False, True))
+def test_bitpacked_scores_match_cv2(monkeypatch, without_bitwise_count):
+    """ AND + popcount по упакованным строкам равен TM_CCORR и с np.bitwise_count, и с таблицей (NumPy < 2) """
+    if without_bitwise_count: monkeypatch.delattr(np, 'bitwise_count', raising=False)
+    rng = np.random.default_rng(0)
+    img = (rng.random((120, 150)) < 0.2).astype(np.uint8); tpl = (rng.random((17, 23)) < 0.3).astype(np.uint8)
+    matcher = BitPackedMatcher(img); packed = PackedTemplate(tpl)
+    expected = np.rint(cv2.matchTemplate(img.astype(np.float32), tpl.astype(np.float32), cv2.TM_CCORR))
+    assert np.array_equal(matcher.raw_score_map(packed), expected)
+    assert matcher.raw_score_at(packed, 5, 13) == int(expected[5, 13])
+
+def test_detect_peaks_ignores_flat_maps():
+    """ Нулевой фон не дает совпадений ни без порога, ни с порогом 0; ровное плато - одно совпадение """
+    empty = np.zeros((300, 400), dtype=np.float32)
+    for kwargs in ({'top_k': 5}, {'threshold': 0.0}, {}):
+        scores, positions = detect_peaks(empty, (40, 40), **kwargs)
+        assert len(scores) == 0 and positions.shape == (0, 2)
+    scores, positions = detect_peaks(np.full((300, 400), 0.4, dtype=np.float32), (40, 40), threshold=0.0)
+    assert np.allclose(scores, [0.4]) and positions.tolist() == [[0, 0]]
+
+def test_detect_peaks_finds_planted_peaks():
+    rng = np.random.default_rng(1)
+    score_map = (rng.random((400, 500)) * 0.2).astype(np.float32)
+    planted = {(30, 40): 0.9, (30, 200): 0.8, (250, 60): 0.95, (300, 420): 0.7, (150, 250): 0.85}
+    for (r, c), score in planted.items():
+        score_map[r:r + 2, c:c + 3] = score # Плато 2x3 равных счетов - одно совпадение в левом верхнем углу
+        score_map[r + 5, c + 5] = score - 0.05 # Соседний пик внутри рамки подавляется
+    scores, positions = detect_peaks(score_map, (40, 40), threshold=0.5)
+    expected = sorted(planted.items(), key=lambda item: -item[1])
+    assert [tuple(p) for p in positions.tolist()] == [position for position, _ in expected]
+    assert np.allclose(scores, [score for _, score in expected])
+    top_scores, top_positions = detect_peaks(score_map, (40, 40), top_k=2)
+    assert [tuple(p) for p in top_positions.tolist()] == [position for position, _ in expected[:2]]
+
+def random_edges(shape, density, seed):
+    return (np.random.default_rng(seed).random(shape) < density).astype(np.uint8)
+
+def raw_ccorr(img, tpl):
+    """ Сырая TM_CCORR целыми (matchTemplate считает через ДПФ - округляем погрешность float) """
+    return np.rint(cv2.matchTemplate(img.astype(np.float32), tpl.astype(np.float32), cv2.TM_CCORR)).astype(np.int64)
+
+@pytest.mark.parametrize('image_shape, template_shape', [
+    ((300, 420), (9, 14)), # Один тайл 512
+    ((900, 1100), (31, 23)), # Много тайлов 512 со швами через 384
+    ((900, 1100), (128, 96)), # Шаблон ровно в четверть тайла 512
+    ((1300, 1200), (129, 40)), # Тайл 1024
+])
+def test_fft_correlator_matches_exhaustive(image_shape, template_shape):
+    img = random_edges(image_shape, 0.1, 2); tpl = random_edges(template_shape, 0.3, 3)
+    max_score = int(np.count_nonzero(tpl))
+    correlator = FFTCorrelator(img); expected = raw_ccorr(img, tpl)
+    assert np.array_equal(np.rint(correlator.raw_correlation_map(tpl)).astype(np.int64), expected)
+    assert np.allclose(correlator.score_map(tpl, max_score), exhaustive_score_map(img.astype(np.float32), tpl, max_score), atol=1e-4)
+    score, (r, c) = correlator.best_match(tpl, max_score)
+    assert expected[r, c] == expected.max() and abs(score - expected.max() / max_score) < 1e-4
+
+def test_fft_spectra_reused_across_templates():
+    """ Спектры тайлов из кэша дают тот же результат для других шаблонов того же и другого размера тайла """
+    img = random_edges((900, 1100), 0.1, 4); correlator = FFTCorrelator(img)
+    templates = [random_edges(shape, 0.3, seed) for seed, shape in enumerate([(20, 30), (45, 17), (20, 30), (140, 60), (33, 33)])]
+    for tpl in templates + templates[::-1]:
+        assert np.array_equal(np.rint(correlator.raw_correlation_map(tpl)).astype(np.int64), raw_ccorr(img, tpl))
+    assert correlator.nbytes > img.size * 4 # Спектры действительно кэшировались
+
+@pytest.mark.parametrize('seed', range(3))
+def test_sparse_scorer_matches_exhaustive(seed):
+    img = random_edges((150, 210), 0.15, seed)
+    tpl = np.zeros((70, 90), dtype=np.uint8); tpl[5, 3:60] = 1; tpl[40:42, 10:12] = 1; tpl[69, 80:90] = 1; tpl[:, 0] = random_edges((70,), 0.5, seed)
+    sparse = SparseTemplate(tpl); scorer = SparseScorer(img); expected = raw_ccorr(img, tpl)
+    assert np.array_equal(scorer.raw_score_map(sparse), expected)
+    for r0, c0, rows, cols in [(0, 0, 5, 5), (10, 20, 30, 40), (70, 100, 50, 50), (80, 120, 1, 1)]: # Последние выходят за край - обрезаются
+        window = scorer.raw_score_map(sparse, window=(r0, c0, rows, cols))
+        assert np.array_equal(window, expected[r0:r0 + rows, c0:c0 + cols])
+        score, (r, c) = scorer.best_match(sparse, sparse.pixel_count, window=(r0, c0, rows, cols))
+        assert expected[r, c] == expected[r0:r0 + rows, c0:c0 + cols].max() and r0 <= r < r0 + rows and c0 <= c < c0 + cols
+    assert scorer.raw_score_at(sparse, 17, 33) == expected[17, 33]
+    with pytest.raises(ValueError): scorer.raw_score_map(sparse, window=(200, 0, 5, 5))
+
+@pytest.mark.parametrize('seed', range(3))
+def test_pyramid_finds_exhaustive_peak(seed):
+    rng = np.random.default_rng(seed)
+    img = random_edges((480, 640), 0.02, seed)
+    tpl = np.zeros((48, 64), dtype=np.uint8); cv2.rectangle(tpl, (2, 2), (61, 45), 1); cv2.line(tpl, (2, 2), (61, 45), 1)
+    r, c = int(rng.integers(0, 480 - 48)), int(rng.integers(0, 640 - 64))
+    img[r:r + 48, c:c + 64] |= tpl
+    max_score = int(np.count_nonzero(tpl))
+    pyramid = build_edge_pyramid(img)
+    assert len(pyramid) > 1
+    expected_score, expected_pos = match_best_exhaustive(pyramid[0], tpl, max_score)
+    score, pos = match_best_pyramid(pyramid, tpl, max_score)
+    assert expected_pos == (r, c) and pos == expected_pos and score == pytest.approx(expected_score, abs=1e-6)
+
+def test_chamfer_position_scores_match_map():
+    img = random_edges((120, 160), 0.03, 5); tpl = random_edges((25, 30), 0.2, 6)
+    matcher = ChamferMatcher(img); max_score = int(np.count_nonzero(tpl))
+    score_map = matcher.score_map(tpl, max_score); coords = np.nonzero(tpl)
+    for r in range(0, score_map.shape[0], 7):
+        for c in range(0, score_map.shape[1], 11):
+            assert abs(matcher.score_at(coords, r, c) - score_map[r, c]) < 1e-5
+    score, (r, c) = matcher.best_match(tpl, max_score)
+    assert abs(score - score_map.max()) < 1e-5 and abs(matcher.score_at(coords, r, c) - score) < 1e-5
@@ -0,0 +1,57 @@
+# tests/test_sequence_tracker.py
+"""
+Сопровождение по синтетической последовательности: цель начинает под углом далеко от угла модели,
+несколько кадров смещается и поворачивается в пределах окна, затем перескакивает за окно по углу и позиции.
+"""
+import numpy as np
+import cv2
+import pytest
+from model.ComparisonModel import ComparisonModel
+from model.DrawingModel import DrawingModel
+from model.SequenceTracker import SequenceTracker
+from model.TemplateBank import rasterize_template_xml, rotate_and_scale_template
+
+FRAME_SHAPE = (320, 400)
+# (угол, позиция (r, c) левого верхнего угла повернутой копии) по кадрам
+TRUTH = [(60.0, (40, 50)), (62.0, (43, 54)), (64.0, (46, 58)), (66.0, (49, 62)), (68.0, (52, 66)),
+         (200.0, (200, 260)), (202.0, (203, 257)), (204.0, (206, 254))]
+
+def plant(template_pixels, angle, pos, seed):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(60, 160, size=(5, 6), dtype=np.uint8)
+    frame = cv2.add(cv2.resize(small, FRAME_SHAPE[::-1], interpolation=cv2.INTER_CUBIC), rng.integers(0, 12, size=FRAME_SHAPE, dtype=np.uint8))
+    instance = cv2.dilate(rotate_and_scale_template(template_pixels, angle, 1.0), np.ones((2, 2), np.uint8))
+    h, w = instance.shape; region = frame[pos[0]:pos[0] + h, pos[1]:pos[1] + w]; region[instance > 0] = 250
+    return frame
+
+@pytest.fixture(scope='module')
+def sequence(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('sequence')
+    drawing = DrawingModel(50, 60)
+    for x, y in [(2, 2), (55, 6), (40, 22), (52, 45), (8, 40), (20, 20)]: drawing.add_vertex(x, y) # Несимметричный контур
+    drawing.template_physical_height_meters = 10.0
+    xml_path = str(directory / 'template.xml'); drawing.save_to_xml(xml_path)
+    template_pixels = rasterize_template_xml(xml_path)[0]
+    frames_dir = directory / 'frames'; frames_dir.mkdir()
+    for index, (angle, pos) in enumerate(TRUTH): cv2.imwrite(str(frames_dir / f"frame_{index}.png"), plant(template_pixels, angle, pos, index))
+    model = ComparisonModel(); model.load_image(str(frames_dir / "frame_0.png")); model.apply_sobel(); model.load_template_from_xml(xml_path)
+    return model, str(frames_dir)
+
+def angle_error(a, b): return abs((a - b + 180.0) % 360.0 - 180.0)
+
+def test_window_tracking_and_full_search_fallback(sequence):
+    model, frames_dir = sequence
+    assert model.template_angle_degrees == 0.0 # Цель на первом кадре повернута на 60° - за пределами окна
+    results = SequenceTracker(model, window_pixels=8, window_degrees=3.0).track(frames_dir)
+    assert [row['mode'] for row in results] == ['full', 'window', 'window', 'window', 'window', 'full', 'window', 'window']
+    for row, (angle, pos) in zip(results, TRUTH):
+        assert angle_error(row['angle'], angle) <= 1.0 and max(abs(row['pos'][0] - pos[0]), abs(row['pos'][1] - pos[1])) <= 2, row
+        assert row['score'] >= 0.5
+    assert [row['name'] for row in results] == [f"frame_{index}.png" for index in range(len(TRUTH))]
+
+def test_fallback_limited_to_angle_range(sequence):
+    """ Полный поиск - только ±fallback_degrees (плюс уточнение на грубый шаг): цель под 60° при ±20° не находится """
+    model, frames_dir = sequence
+    rows = SequenceTracker(model, fallback_degrees=20.0, fallback_angle_step=5.0).track(frames_dir)
+    assert rows[0]['mode'] == 'full' and angle_error(rows[0]['angle'], 0.0) <= 25.0 + 1e-9
+    assert angle_error(rows[0]['angle'], TRUTH[0][0]) > 10.0
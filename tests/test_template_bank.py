@@ -0,0 +1,48 @@
+# tests/test_template_bank.py
+"""
+Банк шаблонов: после компиляции варианты и контур, прочитанные из банка, совпадают бит в бит
+с растеризацией XML и поворотом/масштабом на лету (rotate_and_scale_template).
+"""
+import numpy as np
+import pytest
+from model.DrawingModel import DrawingModel
+from model.TemplateBank import TemplateBank, compile_template_bank, rasterize_template_xml, rotate_and_scale_template, template_file_hash
+
+ANGLES = [0.0, 17.5, 45.0, 90.0, 233.0, 359.0]
+SCALES = [0.5, 1.0, 1.25]
+
+@pytest.fixture
+def bank(tmp_path):
+    paths = []
+    for name, (rows, cols), vertices in [('a', (40, 50), [(1, 1), (45, 4), (30, 35), (5, 30)]),
+                                         ('b', (33, 21), [(2, 30), (10, 1), (19, 12), (15, 31), (3, 20)])]:
+        drawing = DrawingModel(rows, cols)
+        for x, y in vertices: drawing.add_vertex(x, y)
+        drawing.template_physical_height_meters = 12.5
+        path = str(tmp_path / f"{name}.xml"); drawing.save_to_xml(path); paths.append(path)
+    bank_path = str(tmp_path / 'templates.tplbank')
+    assert compile_template_bank(paths + paths[:1], bank_path, ANGLES, SCALES) == 2 # Повтор файла не дублируется
+    template_bank = TemplateBank(bank_path)
+    yield template_bank, paths
+    template_bank.close()
+
+def test_bank_variants_match_live_rotation(bank):
+    template_bank, paths = bank
+    assert len(template_bank) == 2
+    for path in paths:
+        content_hash = template_file_hash(path); assert content_hash in template_bank
+        pixels, physical_height, height_pixels = rasterize_template_xml(path)
+        original, bank_height, bank_height_pixels = template_bank.original(content_hash)
+        assert np.array_equal(original, pixels) and (bank_height, bank_height_pixels) == (physical_height, height_pixels)
+        for angle in ANGLES:
+            for scale in SCALES:
+                variant = template_bank.variant(content_hash, angle, scale)
+                assert variant.dtype == np.uint8 and np.array_equal(variant, rotate_and_scale_template(pixels, angle, scale)), (angle, scale)
+
+def test_bank_lookup_normalises_angle_and_misses_off_grid(bank):
+    template_bank, paths = bank
+    content_hash = template_file_hash(paths[0]); pixels = rasterize_template_xml(paths[0])[0]
+    assert np.array_equal(template_bank.variant(content_hash, -1.0, 1.0), rotate_and_scale_template(pixels, 359.0, 1.0))
+    assert np.array_equal(template_bank.variant(content_hash, 377.5 + 1e-9, 0.5), rotate_and_scale_template(pixels, 17.5, 0.5))
+    assert template_bank.variant(content_hash, 10.0, 1.0) is None and template_bank.variant(content_hash, 0.0, 0.75) is None
+    assert template_bank.variant('нет такого', 0.0, 1.0) is None
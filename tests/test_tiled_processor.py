@@ -0,0 +1,62 @@
+# tests/test_tiled_processor.py
+"""
+Обработка по тайлам против целого кадра ComparisonModel: изображение границ (4 фильтра, с размытием и без)
+и карта счетов должны совпадать при размере тайла, не делящем изображение (швы в разных местах).
+"""
+import numpy as np
+import cv2
+import pytest
+from model.ComparisonModel import ComparisonModel
+from model.DrawingModel import DrawingModel
+from model.TiledProcessor import TiledProcessor
+
+TILE = 37 # Не делит ни одну сторону изображения
+
+@pytest.fixture(scope='module')
+def files(tmp_path_factory):
+    """ Одно изображение в PNG (сжатый - полное декодирование), BMP и .npy (memmap) плюс XML шаблона """
+    directory = tmp_path_factory.mktemp('tiled')
+    rng = np.random.default_rng(0)
+    img = cv2.resize(rng.integers(0, 256, size=(6, 7), dtype=np.uint8), (173, 151), interpolation=cv2.INTER_CUBIC)
+    for _ in range(12): cv2.circle(img, (int(rng.integers(0, 173)), int(rng.integers(0, 151))), int(rng.integers(5, 40)), int(rng.integers(0, 256)), 2)
+    img = cv2.add(img, rng.integers(0, 10, size=img.shape, dtype=np.uint8))
+    paths = {'png': str(directory / 'image.png'), 'bmp': str(directory / 'image.bmp'), 'npy': str(directory / 'image.npy')}
+    cv2.imwrite(paths['png'], img); cv2.imwrite(paths['bmp'], img); np.save(paths['npy'], img)
+    template = DrawingModel(20, 24)
+    for x, y in [(1, 1), (22, 3), (18, 18), (3, 15)]: template.add_vertex(x, y)
+    template.template_physical_height_meters = 10.0
+    xml_path = str(directory / 'template.xml'); template.save_to_xml(xml_path)
+    return img, paths, xml_path
+
+def full_frame_model(path, filter_name, blur, xml_path=None):
+    model = ComparisonModel(); model.load_image(path)
+    if blur: model.toggle_gaussian_blur()
+    getattr(model, f"apply_{filter_name}")()
+    if xml_path is not None: model.load_template_from_xml(xml_path); model.set_match_method('exhaustive')
+    return model
+
+@pytest.mark.parametrize('source', ['png', 'bmp', 'npy'])
+@pytest.mark.parametrize('blur', [False, True])
+@pytest.mark.parametrize('filter_name', ['sobel', 'kirsch', 'roberts', 'prewitt'])
+def test_tiled_edges_match_full_frame(files, source, blur, filter_name):
+    _, paths, _ = files
+    model = full_frame_model(paths['png'], filter_name, blur)
+    params = dict(model._get_active_edge_key()[2]); threshold_value = params.pop('threshold_value')
+    with TiledProcessor(paths[source], tile_size=TILE) as processor:
+        edges = processor.extract_edges(filter_name, threshold_value, params, blur=model._blur_params if blur else None)
+        assert np.array_equal(np.asarray(edges), model._get_active_edge_image())
+
+@pytest.mark.parametrize('source', ['png', 'bmp', 'npy'])
+@pytest.mark.parametrize('blur', [False, True])
+def test_tiled_match_matches_full_frame(files, source, blur):
+    _, paths, xml_path = files
+    model = full_frame_model(paths['png'], 'sobel', blur, xml_path)
+    params = dict(model._get_active_edge_key()[2]); threshold_value = params.pop('threshold_value')
+    expected_map = model.compute_score_map().copy()
+    expected_score, expected_pos = model.find_best_match()
+    with TiledProcessor(paths[source], tile_size=TILE) as processor:
+        processor.extract_edges('sobel', threshold_value, params, blur=model._blur_params if blur else None)
+        score, pos = processor.match(model.template_pixels, model.template_max_score)
+        assert processor.score_map.shape == expected_map.shape
+        assert np.array_equal(np.asarray(processor.score_map), expected_map)
+        assert pos == tuple(expected_pos) and score == expected_score
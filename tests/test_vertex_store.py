@@ -0,0 +1,66 @@
+# tests/test_vertex_store.py
+"""
+VertexStore и журнал undo/redo DrawingModel против прежней модели на обычном списке вершин:
+после любой случайной последовательности действий вершины, индекс (x, y) -> позиция и стеки совпадают.
+"""
+import numpy as np
+import pytest
+from model.DrawingModel import DrawingModel
+from model.VertexStore import VertexStore
+
+class ReferenceModel:
+    """ Прежняя логика add/undo/redo DrawingModel: список кортежей и проверки принадлежности по списку """
+    def __init__(self, rows, cols):
+        self.rows = rows; self.cols = cols; self.vertices = []; self.undo_stack = []; self.redo_stack = []
+
+    def add_vertex(self, x, y):
+        if 0 <= x < self.cols and 0 <= y < self.rows and (x, y) not in self.vertices:
+            self.vertices.append((x, y)); self.undo_stack.append((x, y)); self.redo_stack.clear(); return True
+        return False
+
+    def undo_vertex(self):
+        if not self.undo_stack: return False
+        last_vertex = self.undo_stack.pop(); self.redo_stack.append(last_vertex)
+        if last_vertex in self.vertices: self.vertices.remove(last_vertex)
+        else: self.redo_stack.pop(); self.undo_stack.append(last_vertex); return False
+        return True
+
+    def redo_vertex(self):
+        if not self.redo_stack: return False
+        vertex_to_redo = self.redo_stack.pop(); self.undo_stack.append(vertex_to_redo)
+        if vertex_to_redo not in self.vertices: self.vertices.append(vertex_to_redo)
+        else: self.undo_stack.pop(); self.redo_stack.append(vertex_to_redo); return False
+        return True
+
+def assert_consistent(store, expected):
+    assert len(store) == len(expected) and list(store) == expected and store == expected
+    assert np.array_equal(store.coords, np.array(expected, dtype=np.int32).reshape(-1, 2))
+    assert store._index == {vertex: position for position, vertex in enumerate(expected)}
+    for position, vertex in enumerate(expected): assert vertex in store and store.index(vertex) == position and store[position] == vertex
+
+@pytest.mark.parametrize('seed', range(10))
+def test_undo_redo_matches_list_model(seed):
+    rng = np.random.default_rng(seed)
+    rows, cols = 12, 12 # Маленькое поле: много повторных вершин
+    model = DrawingModel(rows, cols); reference = ReferenceModel(rows, cols)
+    for _ in range(500):
+        action = rng.choice(['add', 'add', 'undo', 'undo', 'redo'])
+        if action == 'add':
+            x, y = int(rng.integers(-1, cols + 1)), int(rng.integers(-1, rows + 1))
+            assert model.add_vertex(x, y) == reference.add_vertex(x, y)
+        else: assert getattr(model, f"{action}_vertex")() == getattr(reference, f"{action}_vertex")()
+        assert_consistent(model.vertices, reference.vertices)
+        assert model.undo_stack == reference.undo_stack and model.redo_stack == reference.redo_stack
+
+@pytest.mark.parametrize('seed', range(5))
+def test_extend_and_pop_keep_index(seed):
+    rng = np.random.default_rng(seed)
+    store = VertexStore(); expected = []
+    for _ in range(50):
+        if rng.random() < 0.3 and expected: assert store.pop() == expected.pop()
+        else:
+            block = [tuple(int(v) for v in p) for p in rng.integers(0, 15, size=(int(rng.integers(0, 30)), 2))]
+            added = [v for i, v in enumerate(block) if v not in expected and v not in block[:i]]
+            assert store.extend(block) == len(added); expected.extend(added)
+        assert_consistent(store, expected)
+    store.clear(); assert_consistent(store, [])
@@ -3,11 +3,16 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import numpy as np
 import cv2
-from PIL import Image, ImageTk
+from PIL import Image, ImageTk, ImageColor
+from model.Instrumentation import timed
 
 BACKGROUND_COLOR = '#F0F0F0'
 TEMPLATE_PIXEL_COLOR = 'red'
+TEMPLATE_PIXEL_RGBA = ImageColor.getrgb(TEMPLATE_PIXEL_COLOR) + (255,)
 GAUSS_ACTIVE_BG = '#90EE90'
+HEATMAP_ACTIVE_BG = '#FFD27F'
+DETECTION_COLOR = 'lime'
+DETECTION_RGBA = ImageColor.getrgb(DETECTION_COLOR) + (255,)
 
 class ComparisonView:
     """
@@ -18,9 +23,15 @@ class ComparisonView:
         self.frame = parent_frame
         self.controller = controller
         self._photo_image = None; self._current_scale = 1.0
+        self._overlay_photo = None # Слой шаблона (RGBA), одна картинка на холсте вместо прямоугольника на пиксель
+        self._background_item = None; self._background_key = None # Элемент фона и ключ его кэша
+        self._overlay_item = None; self._overlay_key = None; self._overlay_xy = (0, 0) # Элемент слоя шаблона и его позиция на холсте
         self._img_original_width = 1; self._img_original_height = 1
         self._display_width = 1; self._display_height = 1
         self._default_button_bg = None
+        self._template_set_window = None # Окно таблицы поиска набора шаблонов
+        self._sequence_window = None # Окно таблицы сопровождения по кадрам
+        self._detections_photo = None; self._detections_item = None; self._detections_key = None # Слой всех найденных совпадений
 
         # --- Панель загрузки ---
         self.load_frame = tk.Frame(self.frame)
@@ -31,6 +42,15 @@ class ComparisonView:
         self.load_template_button.pack(side=tk.LEFT, padx=5)
         self.load_template_button.config(state=tk.DISABLED)
 
+        self.load_bank_button = tk.Button(self.load_frame, text="Банк шаблонов...", command=self.controller.handle_load_template_bank)
+        self.load_bank_button.pack(side=tk.LEFT, padx=5)
+        # Поиск текущего шаблона в изображении, не помещающемся в память (обработка тайлами)
+        self.tiled_search_button = tk.Button(self.load_frame, text="Поиск в большом файле (тайлы)...", command=self.controller.handle_find_best_match_tiled, state=tk.DISABLED)
+        self.tiled_search_button.pack(side=tk.LEFT, padx=5)
+        # Поиск всех шаблонов каталога на текущем изображении границ (таблица результатов)
+        self.template_set_button = tk.Button(self.load_frame, text="Поиск набора шаблонов...", command=self.controller.handle_find_template_set, state=tk.DISABLED)
+        self.template_set_button.pack(side=tk.LEFT, padx=5)
+
         # --- Панель управления ---
         self.control_frame = tk.Frame(self.frame)
         self.control_frame.pack(pady=5, padx=10, fill=tk.X)
@@ -43,6 +63,14 @@ class ComparisonView:
         self.find_best_button.pack(side=tk.LEFT, padx=5)
         self.find_best_button.config(state=tk.DISABLED)
 
+        # Выбор метода поиска и сравнение с полным перебором
+        self.match_method_var = tk.StringVar()
+        self.match_method_combo = ttk.Combobox(self.top_control_frame, textvariable=self.match_method_var, state='readonly', width=24)
+        self.match_method_combo.pack(side=tk.LEFT, padx=5)
+        self.match_method_combo.bind("<<ComboboxSelected>>", self.controller.handle_match_method_change)
+        self.compare_methods_button = tk.Button(self.top_control_frame, text="Сравнить с полным", command=self.controller.handle_compare_search_methods, state=tk.DISABLED)
+        self.compare_methods_button.pack(side=tk.LEFT, padx=5)
+
         self.info_label = tk.Label(self.top_control_frame, text="Результат: - | Позиция: (-, -)") # Угол убран отсюда
         self.info_label.pack(side=tk.LEFT, padx=10)
 
@@ -63,6 +91,59 @@ class ComparisonView:
         self.rotate_right_button.pack(side=tk.LEFT, padx=0)
 
 
+        # --- 1a. Перебор углов/масштабов шаблона ---
+        self.sweep_control_frame = tk.Frame(self.control_frame)
+        self.sweep_control_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(self.sweep_control_frame, text="Перебор углов: от").pack(side=tk.LEFT)
+        self.sweep_angle_start_var = tk.StringVar(value="0")
+        tk.Entry(self.sweep_control_frame, textvariable=self.sweep_angle_start_var, width=5).pack(side=tk.LEFT, padx=(0, 2))
+        tk.Label(self.sweep_control_frame, text="до").pack(side=tk.LEFT)
+        self.sweep_angle_end_var = tk.StringVar(value="360")
+        tk.Entry(self.sweep_control_frame, textvariable=self.sweep_angle_end_var, width=5).pack(side=tk.LEFT, padx=(0, 2))
+        tk.Label(self.sweep_control_frame, text="шаг").pack(side=tk.LEFT)
+        self.sweep_angle_step_var = tk.StringVar(value="1")
+        tk.Entry(self.sweep_control_frame, textvariable=self.sweep_angle_step_var, width=4).pack(side=tk.LEFT, padx=(0, 10))
+        tk.Label(self.sweep_control_frame, text="Масштаб (×): от").pack(side=tk.LEFT)
+        self.sweep_scale_min_var = tk.StringVar(value="1.0")
+        tk.Entry(self.sweep_control_frame, textvariable=self.sweep_scale_min_var, width=5).pack(side=tk.LEFT, padx=(0, 2))
+        tk.Label(self.sweep_control_frame, text="до").pack(side=tk.LEFT)
+        self.sweep_scale_max_var = tk.StringVar(value="1.0")
+        tk.Entry(self.sweep_control_frame, textvariable=self.sweep_scale_max_var, width=5).pack(side=tk.LEFT, padx=(0, 2))
+        tk.Label(self.sweep_control_frame, text="шаг").pack(side=tk.LEFT)
+        self.sweep_scale_step_var = tk.StringVar(value="0.05")
+        tk.Entry(self.sweep_control_frame, textvariable=self.sweep_scale_step_var, width=5).pack(side=tk.LEFT, padx=(0, 5))
+        self.sweep_button = tk.Button(self.sweep_control_frame, text="Перебрать", command=self.controller.handle_find_best_match_sweep, state=tk.DISABLED)
+        self.sweep_button.pack(side=tk.LEFT, padx=5)
+
+        # --- Поиск всех совпадений (порог счета и/или K лучших) ---
+        self.detect_control_frame = tk.Frame(self.control_frame)
+        self.detect_control_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(self.detect_control_frame, text="Все совпадения: счет от").pack(side=tk.LEFT)
+        self.detect_threshold_var = tk.StringVar(value="0.8")
+        tk.Entry(self.detect_control_frame, textvariable=self.detect_threshold_var, width=5).pack(side=tk.LEFT, padx=(0, 2))
+        tk.Label(self.detect_control_frame, text="не более K").pack(side=tk.LEFT)
+        self.detect_top_k_var = tk.StringVar(value="")
+        tk.Entry(self.detect_control_frame, textvariable=self.detect_top_k_var, width=6).pack(side=tk.LEFT, padx=(0, 5))
+        self.detect_button = tk.Button(self.detect_control_frame, text="Найти все", command=self.controller.handle_find_all_matches, state=tk.DISABLED)
+        self.detect_button.pack(side=tk.LEFT, padx=5)
+        self.detect_info_label = tk.Label(self.detect_control_frame, text="", anchor=tk.W)
+        self.detect_info_label.pack(side=tk.LEFT, padx=5)
+
+        # --- Сопровождение по последовательности кадров (окно поиска вокруг прежнего совпадения) ---
+        self.sequence_control_frame = tk.Frame(self.control_frame)
+        self.sequence_control_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(self.sequence_control_frame, text="Последовательность: окно ± пкс").pack(side=tk.LEFT)
+        self.sequence_window_pixels_var = tk.StringVar(value="24")
+        tk.Entry(self.sequence_control_frame, textvariable=self.sequence_window_pixels_var, width=4).pack(side=tk.LEFT, padx=(0, 2))
+        tk.Label(self.sequence_control_frame, text="± °").pack(side=tk.LEFT)
+        self.sequence_window_degrees_var = tk.StringVar(value="5")
+        tk.Entry(self.sequence_control_frame, textvariable=self.sequence_window_degrees_var, width=4).pack(side=tk.LEFT, padx=(0, 2))
+        tk.Label(self.sequence_control_frame, text="полный поиск при счете ниже").pack(side=tk.LEFT)
+        self.sequence_fallback_var = tk.StringVar(value="0.5")
+        tk.Entry(self.sequence_control_frame, textvariable=self.sequence_fallback_var, width=5).pack(side=tk.LEFT, padx=(0, 5))
+        self.sequence_button = tk.Button(self.sequence_control_frame, text="Кадры (каталог/видео)...", command=self.controller.handle_track_sequence, state=tk.DISABLED)
+        self.sequence_button.pack(side=tk.LEFT, padx=5)
+
         # --- 2. Средняя строка: Фильтры ---
         self.filter_control_frame = tk.Frame(self.control_frame)
         self.filter_control_frame.pack(fill=tk.X, pady=(0, 5))
@@ -76,6 +157,7 @@ class ComparisonView:
         self.kirsch_button = tk.Button(self.filter_control_frame, text="Кирш", command=self.controller.handle_apply_kirsch); self.kirsch_button.pack(side=tk.LEFT, padx=5); self.kirsch_button.config(state=tk.DISABLED)
         self.roberts_button = tk.Button(self.filter_control_frame, text="Робертс", command=self.controller.handle_apply_roberts); self.roberts_button.pack(side=tk.LEFT, padx=5); self.roberts_button.config(state=tk.DISABLED)
         self.prewitt_button = tk.Button(self.filter_control_frame, text="Превитт", command=self.controller.handle_apply_prewitt); self.prewitt_button.pack(side=tk.LEFT, padx=5); self.prewitt_button.config(state=tk.DISABLED)
+        self.heatmap_button = tk.Button(self.filter_control_frame, text="Тепловая карта", command=self.controller.handle_toggle_heatmap); self.heatmap_button.pack(side=tk.LEFT, padx=(20, 5)); self.heatmap_button.config(state=tk.DISABLED)
 
         # --- 3. Нижняя строка: Управление физическим масштабом ИЗОБРАЖЕНИЯ ---
         self.image_scale_control_frame = tk.Frame(self.control_frame)
@@ -93,6 +175,15 @@ class ComparisonView:
         self.image_phys_height_entry.bind("<Return>", self.controller.handle_image_phys_height_entry_change)
         self.image_phys_height_entry.bind("<FocusOut>", self.controller.handle_image_phys_height_entry_change)
 
+        # Индикатор фонового задания (показывается только во время выполнения)
+        self.progress_frame = tk.Frame(self.image_scale_control_frame)
+        self.progress_label = tk.Label(self.progress_frame, text="", anchor=tk.W, width=36)
+        self.progress_label.pack(side=tk.LEFT, padx=(0, 5))
+        self.progress_bar = ttk.Progressbar(self.progress_frame, orient=tk.HORIZONTAL, length=160, mode='indeterminate')
+        self.progress_bar.pack(side=tk.LEFT, padx=(0, 5))
+        self.cancel_button = tk.Button(self.progress_frame, text="Отмена", command=self.controller.handle_cancel_background_job)
+        self.cancel_button.pack(side=tk.LEFT)
+
         # --- Холст для отображения с прокруткой ---
         canvas_frame = tk.Frame(self.frame); canvas_frame.pack(pady=10, padx=10, expand=True, fill=tk.BOTH)
         self.h_scrollbar = tk.Scrollbar(canvas_frame, orient=tk.HORIZONTAL); self.v_scrollbar = tk.Scrollbar(canvas_frame, orient=tk.VERTICAL)
@@ -101,9 +192,18 @@ class ComparisonView:
         self.h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X); self.v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y); self.canvas.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
         self.canvas.bind("<ButtonPress-1>", self.controller.handle_canvas_press); self.canvas.bind("<B1-Motion>", self.controller.handle_canvas_drag); self.canvas.bind("<Configure>", self.controller.handle_canvas_configure)
 
+    def _clear_canvas(self):
+        self.canvas.delete("all"); self._photo_image = None; self._overlay_photo = None
+        self._background_item = None; self._background_key = None; self._overlay_item = None; self._overlay_key = None
+        self._detections_photo = None; self._detections_item = None; self._detections_key = None
+
+    @timed('view.comparison.redraw')
     def update_canvas(self, image_to_display, template_pixels, template_pos_rc):
-        self.canvas.delete("all"); self._photo_image = None
-        if image_to_display is None: self.canvas.config(scrollregion=(0, 0, 1, 1), width=100, height=100, bg=BACKGROUND_COLOR); self._img_original_height, self._img_original_width = 1, 1; self._display_width, self._display_height = 1, 1; self._current_scale = 1.0; return
+        """
+        Перерисовка холста. Масштабированный фон кэшируется по (изображение, размер отображения),
+        слой шаблона - по (шаблон, масштаб); если они не изменились, элементы холста только перемещаются.
+        """
+        if image_to_display is None: self._clear_canvas(); self.canvas.config(scrollregion=(0, 0, 1, 1), width=100, height=100, bg=BACKGROUND_COLOR); self._img_original_height, self._img_original_width = 1, 1; self._display_width, self._display_height = 1, 1; self._current_scale = 1.0; return
         canvas_width = self.canvas.winfo_width(); canvas_height = self.canvas.winfo_height()
         if canvas_width <= 1: canvas_width = self._display_width if self._display_width > 1 else 400
         if canvas_height <= 1: canvas_height = self._display_height if self._display_height > 1 else 400
@@ -113,26 +213,108 @@ class ComparisonView:
         if scale <= 0: scale = 1.0
         self._current_scale = scale
         self._display_width = int(self._img_original_width * scale); self._display_height = int(self._img_original_height * scale)
-        resized_image = None
-        if self._display_width > 0 and self._display_height > 0:
-            try: interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR; resized_image = cv2.resize(image_to_display, (self._display_width, self._display_height), interpolation=interpolation)
-            except cv2.error as e: print(f"Error resizing image: {e}"); self.canvas.config(scrollregion=(0, 0, 1, 1), width=100, height=100, bg=BACKGROUND_COLOR); return
-        else: resized_image = np.zeros((10, 10), dtype=image_to_display.dtype); self._display_width, self._display_height = 10, 10
-        try: pil_image = Image.fromarray(resized_image); self._photo_image = ImageTk.PhotoImage(image=pil_image)
-        except Exception as e: print(f"Error converting image: {e}"); self.canvas.config(scrollregion=(0, 0, 1, 1), width=100, height=100, bg=BACKGROUND_COLOR); return
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self._photo_image, tags="background_image")
-        self.canvas.config(scrollregion=(0, 0, self._display_width, self._display_height))
-        if template_pixels is not None and template_pos_rc != (-1,-1) and self._current_scale > 0:
-            tpl_rows, tpl_cols = template_pixels.shape; start_row, start_col = template_pos_rc
-            scaled_pixel_side = self._current_scale; min_pixel_size = 1.0
-            draw_pixel_w = max(min_pixel_size, scaled_pixel_side); draw_pixel_h = max(min_pixel_size, scaled_pixel_side)
-            for r_tpl in range(tpl_rows):
-                for c_tpl in range(tpl_cols):
-                    if template_pixels[r_tpl, c_tpl] == 1:
-                        r_img, c_img = start_row + r_tpl, start_col + c_tpl
-                        x0 = c_img * self._current_scale; y0 = r_img * self._current_scale
-                        x1 = x0 + draw_pixel_w; y1 = y0 + draw_pixel_h
-                        self.canvas.create_rectangle(x0, y0, x1, y1, fill=TEMPLATE_PIXEL_COLOR, outline="", tags="template_pixel")
+        # Ссылка на само изображение в ключе: модель отдает один и тот же массив, пока изображение не изменилось
+        background_key = (image_to_display, self._display_width, self._display_height)
+        if self._background_key is None or self._background_key[0] is not image_to_display or self._background_key[1:] != background_key[1:]:
+            resized_image = None
+            if self._display_width > 0 and self._display_height > 0:
+                try: interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR; resized_image = cv2.resize(image_to_display, (self._display_width, self._display_height), interpolation=interpolation)
+                except cv2.error as e: print(f"Error resizing image: {e}"); self._clear_canvas(); self.canvas.config(scrollregion=(0, 0, 1, 1), width=100, height=100, bg=BACKGROUND_COLOR); return
+            else: resized_image = np.zeros((10, 10), dtype=image_to_display.dtype); self._display_width, self._display_height = 10, 10
+            try: pil_image = Image.fromarray(resized_image); photo_image = ImageTk.PhotoImage(image=pil_image)
+            except Exception as e: print(f"Error converting image: {e}"); self._clear_canvas(); self.canvas.config(scrollregion=(0, 0, 1, 1), width=100, height=100, bg=BACKGROUND_COLOR); return
+            self._photo_image = photo_image; self._background_key = background_key
+            if self._background_item is None: self._background_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self._photo_image, tags="background_image")
+            else: self.canvas.itemconfig(self._background_item, image=self._photo_image)
+            self.canvas.config(scrollregion=(0, 0, self._display_width, self._display_height))
+        self._update_template_overlay(template_pixels, template_pos_rc)
+
+    def _update_template_overlay(self, template_pixels, template_pos_rc):
+        if template_pixels is None or template_pos_rc == (-1, -1) or self._current_scale <= 0:
+            if self._overlay_item is not None: self.canvas.delete(self._overlay_item)
+            self._overlay_item = None; self._overlay_key = None; self._overlay_photo = None
+            return
+        overlay_key = (template_pixels, self._current_scale)
+        if self._overlay_key is None or self._overlay_key[0] is not template_pixels or self._overlay_key[1] != self._current_scale:
+            overlay = self._make_template_overlay(template_pixels, self._current_scale)
+            if self._overlay_item is not None: self.canvas.delete(self._overlay_item)
+            self._overlay_item = None; self._overlay_photo = None; self._overlay_key = overlay_key
+            if overlay is None: return
+            self._overlay_photo = ImageTk.PhotoImage(image=overlay)
+            self._overlay_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self._overlay_photo, tags="template_overlay")
+            self._overlay_xy = (0, 0)
+        self.move_template_overlay(template_pos_rc)
+
+    @timed('view.comparison.move')
+    def move_template_overlay(self, template_pos_rc):
+        """ Перемещение слоя шаблона без перерисовки фона (перетаскивание) """
+        if self._overlay_item is None: return
+        start_row, start_col = template_pos_rc
+        x = int(round(start_col * self._current_scale)); y = int(round(start_row * self._current_scale))
+        dx = x - self._overlay_xy[0]; dy = y - self._overlay_xy[1]
+        if dx or dy: self.canvas.move(self._overlay_item, dx, dy); self._overlay_xy = (x, y)
+
+    @timed('view.comparison.detections')
+    def update_detections(self, detections):
+        """
+        Все найденные совпадения - рамки шаблона одним RGBA-слоем размера отображения (один cv2.polylines
+        на все рамки и один элемент холста), поэтому тысячи совпадений не создают тысячи элементов.
+        Слой кэшируется по (результат поиска, масштаб) и лежит под слоем шаблона.
+        """
+        if detections is None or not len(detections['scores']) or self._current_scale <= 0:
+            if self._detections_item is not None: self.canvas.delete(self._detections_item)
+            self._detections_photo = None; self._detections_item = None; self._detections_key = None
+            self.detect_info_label.config(text="" if detections is None else "Совпадений: 0")
+            return
+        if self._detections_key is not None and self._detections_key[0] is detections and self._detections_key[1] == self._current_scale: return
+        scale = self._current_scale; tpl_rows, tpl_cols = detections['template_shape']
+        corners = np.array([[0, 0], [tpl_cols - 1, 0], [tpl_cols - 1, tpl_rows - 1], [0, tpl_rows - 1]], dtype=np.float64)
+        origins = detections['positions'][:, ::-1].astype(np.float64) # (r, c) -> (x, y)
+        polygons = np.round((origins[:, None, :] + corners[None, :, :]) * scale).astype(np.int32)
+        rgba = np.zeros((max(1, self._display_height), max(1, self._display_width), 4), dtype=np.uint8)
+        cv2.polylines(rgba, list(polygons), isClosed=True, color=DETECTION_RGBA, thickness=1)
+        self._detections_photo = ImageTk.PhotoImage(image=Image.fromarray(rgba, mode='RGBA'))
+        if self._detections_item is None: self._detections_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self._detections_photo, tags="detections")
+        else: self.canvas.itemconfig(self._detections_item, image=self._detections_photo)
+        if self._overlay_item is not None: self.canvas.tag_lower(self._detections_item, self._overlay_item)
+        self._detections_key = (detections, scale)
+        self.detect_info_label.config(text=f"Совпадений: {len(detections['scores'])}, счет {float(detections['scores'][-1]):.3f}..{float(detections['scores'][0]):.3f}")
+
+    def get_detection_parameters(self):
+        """ Параметры поиска всех совпадений: (порог или None, K или None); None при ошибке ввода """
+        threshold_text = self.detect_threshold_var.get().strip().replace(',', '.'); top_k_text = self.detect_top_k_var.get().strip()
+        try:
+            threshold = float(threshold_text) if threshold_text else None
+            top_k = int(top_k_text) if top_k_text else None
+        except ValueError: self.show_error("Ошибка ввода", "Порог должен быть числом, K - целым числом."); return None
+        if threshold is None and top_k is None: self.show_error("Ошибка ввода", "Укажите порог счета и/или число совпадений K."); return None
+        if top_k is not None and top_k <= 0: self.show_error("Ошибка ввода", "K должно быть больше нуля."); return None
+        return threshold, top_k
+
+    def get_sequence_parameters(self):
+        """ Параметры сопровождения: (окно пкс, окно градусов, порог полного поиска) или None при ошибке ввода """
+        try:
+            window_pixels = int(self.sequence_window_pixels_var.get().strip())
+            window_degrees, fallback_score = (float(var.get().strip().replace(',', '.')) for var in (self.sequence_window_degrees_var, self.sequence_fallback_var))
+        except ValueError: self.show_error("Ошибка ввода", "Окно в пикселях - целое число, окно в градусах и порог - числа."); return None
+        if window_pixels < 0 or window_degrees < 0: self.show_error("Ошибка ввода", "Окно поиска не может быть отрицательным."); return None
+        return window_pixels, window_degrees, fallback_score
+
+    @staticmethod
+    def _make_template_overlay(template_pixels, scale):
+        """
+        Шаблон как один RGBA-слой в масштабе отображения (прозрачный фон, цвет TEMPLATE_PIXEL_COLOR).
+        При уменьшении пиксель слоя закрашивается, если под ним есть хотя бы один пиксель шаблона,
+        поэтому тонкий контур не пропадает (как прежние прямоугольники размером не меньше 1 пикселя).
+        """
+        tpl_rows, tpl_cols = template_pixels.shape
+        width = max(1, int(round(tpl_cols * scale))); height = max(1, int(round(tpl_rows * scale)))
+        if scale >= 1.0: mask = cv2.resize(template_pixels, (width, height), interpolation=cv2.INTER_NEAREST) > 0
+        else: mask = cv2.resize(template_pixels.astype(np.float32), (width, height), interpolation=cv2.INTER_AREA) > 0
+        if not mask.any(): return None
+        rgba = np.zeros((height, width, 4), dtype=np.uint8)
+        rgba[mask] = TEMPLATE_PIXEL_RGBA
+        return Image.fromarray(rgba, mode='RGBA')
 
     def update_info_label(self, score, pos_rc, angle_deg=0): # Угол убран из этой метки
         r, c = pos_rc
@@ -168,11 +350,34 @@ class ComparisonView:
         return self.angle_entry_var.get()
     # --- КОНЕЦ НОВЫХ МЕТОДОВ ---
 
+    def set_match_methods(self, methods, current_method):
+        """ Заполняет список методов поиска: methods - словарь ключ -> подпись """
+        self._match_method_keys = list(methods.keys())
+        self.match_method_combo.config(values=list(methods.values()))
+        self.match_method_var.set(methods[current_method])
+
+    def get_selected_match_method(self):
+        index = self.match_method_combo.current()
+        return self._match_method_keys[index] if index >= 0 else None
+
+    def get_sweep_parameters(self):
+        """ Параметры перебора: (угол от, до, шаг, масштаб от, до, шаг) или None при ошибке ввода """
+        try:
+            return tuple(float(var.get().replace(',', '.')) for var in (
+                self.sweep_angle_start_var, self.sweep_angle_end_var, self.sweep_angle_step_var,
+                self.sweep_scale_min_var, self.sweep_scale_max_var, self.sweep_scale_step_var))
+        except ValueError: self.show_error("Ошибка ввода", "Параметры перебора должны быть числами."); return None
+
     def update_gauss_button_visuals(self, is_active, state=tk.NORMAL):
         bg_color = GAUSS_ACTIVE_BG if is_active else (self._default_button_bg if self._default_button_bg else BACKGROUND_COLOR)
         try: self.gauss_button.config(state=state, bg=bg_color, activebackground=bg_color)
         except tk.TclError: pass
 
+    def update_heatmap_button_visuals(self, is_active, state=tk.NORMAL):
+        bg_color = HEATMAP_ACTIVE_BG if is_active else (self._default_button_bg if self._default_button_bg else BACKGROUND_COLOR)
+        try: self.heatmap_button.config(state=state, bg=bg_color, activebackground=bg_color)
+        except tk.TclError: pass
+
     def get_original_coords_from_canvas(self, canvas_x, canvas_y):
         if self._current_scale <= 0: return 0, 0
         scaled_x = self.canvas.canvasx(canvas_x); scaled_y = self.canvas.canvasy(canvas_y)
@@ -188,11 +393,63 @@ class ComparisonView:
             try:
                 valid_state = state if state in [tk.NORMAL, tk.DISABLED] else tk.DISABLED
                 if widget_name == "gauss_button": self.update_gauss_button_visuals(self.controller.model.gaussian_blur_active, valid_state)
+                elif widget_name == "heatmap_button": self.update_heatmap_button_visuals(self.controller.model.show_score_heatmap, valid_state)
                 elif widget_name in ["image_m_per_px_entry", "image_phys_height_entry", "angle_entry"]:
                     widget.config(state=(valid_state if valid_state == tk.NORMAL else 'readonly'))
                 else: widget.config(state=valid_state)
             except tk.TclError as e: print(f"Warning: Could not set state '{state}' for widget '{widget_name}'. Error: {e}")
         else: print(f"Warning: Widget '{widget_name}' not found in ComparisonView.")
 
+    def show_progress(self, text, fraction=None):
+        """ Показывает индикатор: fraction 0..1 - определенный прогресс, None - бегущая полоса """
+        if not self.progress_frame.winfo_ismapped(): self.progress_frame.pack(side=tk.RIGHT, padx=5)
+        self.progress_label.config(text=text)
+        if fraction is None:
+            if str(self.progress_bar.cget('mode')) != 'indeterminate': self.progress_bar.config(mode='indeterminate')
+            self.progress_bar.start(15)
+        else:
+            if str(self.progress_bar.cget('mode')) != 'determinate': self.progress_bar.stop(); self.progress_bar.config(mode='determinate', maximum=1.0)
+            self.progress_bar['value'] = max(0.0, min(1.0, fraction))
+
+    def hide_progress(self):
+        self.progress_bar.stop(); self.progress_bar['value'] = 0
+        self.progress_frame.pack_forget()
+
+    def show_template_set_results(self, results, on_apply):
+        """ Таблица поиска набора шаблонов (по убыванию счета); двойной щелчок по строке - on_apply(индекс) """
+        if self._template_set_window is not None and self._template_set_window.winfo_exists(): self._template_set_window.destroy()
+        window = self._template_set_window = tk.Toplevel(self.frame)
+        window.title(f"Набор шаблонов: {sum(r['score'] is not None for r in results)} из {len(results)} найдено")
+        columns = ('rank', 'name', 'score', 'row', 'col', 'scale', 'size', 'error')
+        headings = ("№", "Шаблон", "Счет", "Строка", "Столбец", "Масштаб", "Размер", "Ошибка")
+        widths = (40, 200, 70, 60, 60, 70, 80, 220)
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=min(25, max(5, len(results))))
+        for column, heading, width in zip(columns, headings, widths): tree.heading(column, text=heading); tree.column(column, width=width, anchor=tk.W if column in ('name', 'error') else tk.E)
+        scrollbar = tk.Scrollbar(window, orient=tk.VERTICAL, command=tree.yview); tree.config(yscrollcommand=scrollbar.set)
+        for index, r in enumerate(results):
+            found = r['score'] is not None
+            tree.insert('', tk.END, iid=str(index), values=(index + 1, r['name'], f"{r['score']:.4f}" if found else "", r['pos'][0] if found else "", r['pos'][1] if found else "",
+                                                             f"{r['scale']:.3f}" if r['scale'] else "", f"{r['shape'][0]}x{r['shape'][1]}" if r['shape'] else "", r['error'] or ""))
+        tree.bind("<Double-1>", lambda event: tree.focus() and on_apply(int(tree.focus())))
+        tk.Label(window, text="Двойной щелчок - загрузить шаблон в найденную позицию", anchor=tk.W).pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y); tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    def show_sequence_results(self, results):
+        """ Таблица сопровождения: строка на кадр (счет, позиция, угол, вид поиска, время) """
+        if self._sequence_window is not None and self._sequence_window.winfo_exists(): self._sequence_window.destroy()
+        window = self._sequence_window = tk.Toplevel(self.frame)
+        full_searches = sum(r['mode'] == 'full' for r in results)
+        window.title(f"Последовательность: {len(results)} кадров, полных поисков {full_searches}, {sum(r['seconds'] for r in results):.2f} с")
+        columns = ('index', 'name', 'score', 'row', 'col', 'angle', 'mode', 'ms')
+        headings = ("№", "Кадр", "Счет", "Строка", "Столбец", "Угол", "Поиск", "мс")
+        widths = (40, 200, 70, 60, 60, 60, 70, 60)
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=min(25, max(5, len(results))))
+        for column, heading, width in zip(columns, headings, widths): tree.heading(column, text=heading); tree.column(column, width=width, anchor=tk.W if column in ('name', 'mode') else tk.E)
+        scrollbar = tk.Scrollbar(window, orient=tk.VERTICAL, command=tree.yview); tree.config(yscrollcommand=scrollbar.set)
+        for r in results:
+            tree.insert('', tk.END, values=(r['index'] + 1, r['name'], f"{r['score']:.4f}", r['pos'][0], r['pos'][1], f"{r['angle']:.1f}",
+                                            "окно" if r['mode'] == 'window' else "полный", f"{r['seconds'] * 1000:.1f}"))
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y); tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
     def show_error(self, title, message): messagebox.showerror(title, message, parent=self.frame)
     def show_info(self, title, message): messagebox.showinfo(title, message, parent=self.frame)
\ No newline at end of file
@@ -1,7 +1,10 @@
 # view/DrawingView.py
 import tkinter as tk
 from tkinter import messagebox
+import numpy as np
+from collections import OrderedDict
 from PIL import Image, ImageTk # Добавляем PIL для оверлея
+from model.Instrumentation import timed
 
 # Константа для размера пикселя на холсте редактора
 DRAWING_PIXEL_SIZE = 15
@@ -11,6 +14,36 @@ INACTIVE_PIXEL_BG = '#F0F0F0'
 GRID_OUTLINE_COLOR = '#D0D0D0'
 # Цвет активных пикселей
 ACTIVE_PIXEL_COLOR = 'blue'
+# Запас ячеек вокруг видимой области (чтобы при небольшой прокрутке края не были пустыми)
+VIEWPORT_MARGIN_CELLS = 2
+# Сколько отмасштабированных оверлеев хранить (масштаб -> PhotoImage), чтобы "+"/"-" туда-обратно не пересчитывали изображение
+OVERLAY_CACHE_SIZE = 4
+
+try: OVERLAY_RESAMPLING = Image.Resampling.LANCZOS
+except AttributeError: OVERLAY_RESAMPLING = Image.LANCZOS
+
+class OverlayPyramid:
+    """
+    Mip-пирамида фонового изображения: уровень k уменьшен в 2**k раз (Image.reduce, усреднение 2x2).
+    Масштабирование берет наименьший уровень, который еще не меньше нужного размера, поэтому
+    LANCZOS обрабатывает не больше чем вдвое больше пикселей, чем выводит.
+    """
+    def __init__(self, image):
+        self.image = image # Исходный объект (по нему проверяется, что фон не сменился)
+        base = image if image.mode in ('L', 'RGB', 'RGBA') else image.convert('RGBA')
+        base.load()
+        self.levels = [base]
+        while min(self.levels[-1].size) >= 2: self.levels.append(self.levels[-1].reduce(2))
+
+    def scaled(self, scale):
+        """ Изображение в масштабе scale (None, если оно вырождается в 0 пикселей) """
+        width = int(self.image.width * scale); height = int(self.image.height * scale)
+        if width <= 0 or height <= 0: return None
+        level = self.levels[0]
+        for candidate in self.levels[1:]:
+            if candidate.width < width or candidate.height < height: break
+            level = candidate
+        return level if level.size == (width, height) else level.resize((width, height), OVERLAY_RESAMPLING)
 
 class DrawingView:
     """
@@ -21,7 +54,16 @@ class DrawingView:
     def __init__(self, parent_frame, controller):
         self.frame = parent_frame
         self.controller = controller
-        self._overlay_photo = None # Храним PhotoImage для оверлея
+        self._overlay_pyramid = None # OverlayPyramid текущего фона
+        self._overlay_photos = OrderedDict() # масштаб -> PhotoImage (последние OVERLAY_CACHE_SIZE)
+        self._overlay_item = None # Элемент холста с оверлеем
+        self._overlay_key = None # (изображение, масштаб), для которых создан _overlay_item
+        # Состояние холста: элементы создаются только для видимых ячеек и обновляются по разнице полей
+        self._grid_shape = (0, 0)
+        self._field = np.zeros((0, 0), dtype=np.uint8) # Текущее поле (копия)
+        self._drawn_field = self._field # Поле, которому соответствуют элементы холста
+        self._cell_items = {} # (r, c) -> элемент активной ячейки
+        self._viewport = None # (r0, r1, c0, c1) - диапазон ячеек, для которых созданы элементы
 
         # --- Верхняя панель: Файловые операции ---
         self.file_frame = tk.Frame(self.frame)
@@ -104,36 +146,109 @@ class DrawingView:
         self.h_scrollbar = tk.Scrollbar(self.canvas_frame, orient=tk.HORIZONTAL)
         self.v_scrollbar = tk.Scrollbar(self.canvas_frame, orient=tk.VERTICAL)
         self.canvas = tk.Canvas(self.canvas_frame, bg='white', relief=tk.SUNKEN, borderwidth=1, xscrollcommand=self.h_scrollbar.set, yscrollcommand=self.v_scrollbar.set)
-        self.h_scrollbar.config(command=self.canvas.xview)
-        self.v_scrollbar.config(command=self.canvas.yview)
+        self.h_scrollbar.config(command=self._xview)
+        self.v_scrollbar.config(command=self._yview)
         self.h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
         self.v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.canvas.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
         self.canvas.bind("<Button-1>", self.controller.canvas_click_handler)
+        self.canvas.bind("<Configure>", lambda event: self._render_viewport())
 
         self.update_size_entries(self.controller.model.rows, self.controller.model.cols)
         self.update_physical_height_entry(self.controller.model.template_physical_height_meters)
 
+    @timed('view.drawing.redraw')
     def update_canvas(self, pixel_field):
-        self.canvas.delete("all"); self._overlay_photo = None; rows = len(pixel_field); cols = len(pixel_field[0]) if rows > 0 else 0
-        canvas_width = cols * DRAWING_PIXEL_SIZE; canvas_height = rows * DRAWING_PIXEL_SIZE
+        """
+        Обновление холста по пиксельному полю. Сетка рисуется линиями, активные ячейки - отдельными элементами,
+        и только в видимой области; при том же размере поля пересоздаются лишь изменившиеся ячейки.
+        """
+        field = np.asarray(pixel_field, dtype=np.uint8)
+        if field.ndim != 2: field = np.zeros((0, 0), dtype=np.uint8)
+        if field.shape != self._grid_shape:
+            self.canvas.delete("pixel_active"); self.canvas.delete("grid_line")
+            self._cell_items = {}; self._viewport = None; self._grid_shape = field.shape
+            self._drawn_field = np.zeros(field.shape, dtype=np.uint8)
+            self.canvas.config(scrollregion=(0, 0, field.shape[1] * DRAWING_PIXEL_SIZE, field.shape[0] * DRAWING_PIXEL_SIZE))
+        self._field = field.copy() # Копия: модель может менять свое поле на месте
+        self._update_overlay()
+        self._render_viewport()
+
+    def _update_overlay(self):
+        """
+        Оверлей пересчитывается только при смене изображения или масштаба (и то из пирамиды и кэша);
+        при сдвиге существующий элемент холста просто переносится в новые координаты.
+        """
         overlay_img_pil, ox, oy, scale = self.controller.model.get_overlay_data()
-        if overlay_img_pil:
-            try:
-                overlay_w = int(overlay_img_pil.width * scale); overlay_h = int(overlay_img_pil.height * scale)
-                if overlay_w > 0 and overlay_h > 0:
-                    try: resampling_method = Image.Resampling.LANCZOS
-                    except AttributeError: resampling_method = Image.LANCZOS
-                    scaled_overlay = overlay_img_pil.resize((overlay_w, overlay_h), resampling_method)
-                    self._overlay_photo = ImageTk.PhotoImage(scaled_overlay)
-                    self.canvas.create_image(ox, oy, anchor=tk.NW, image=self._overlay_photo, tags="overlay")
-            except Exception as e: print(f"Ошибка оверлея: {e}"); self._overlay_photo = None
-        for r in range(rows):
-            for c in range(cols):
-                x0 = c * DRAWING_PIXEL_SIZE; y0 = r * DRAWING_PIXEL_SIZE; x1 = x0 + DRAWING_PIXEL_SIZE; y1 = y0 + DRAWING_PIXEL_SIZE
-                if pixel_field[r][c] == 1: self.canvas.create_rectangle(x0, y0, x1, y1, fill=ACTIVE_PIXEL_COLOR, outline='white', width=1, tags="pixel_active")
-                else: self.canvas.create_rectangle(x0, y0, x1, y1, fill="", outline=GRID_OUTLINE_COLOR, width=1, tags="pixel_inactive_outline")
-        self.canvas.config(scrollregion=(0, 0, canvas_width, canvas_height))
+        scale = round(scale, 6) # Масштаб после "+" и "-" должен попадать в кэш несмотря на ошибки округления
+        if overlay_img_pil is None:
+            if self._overlay_item is not None: self.canvas.delete("overlay")
+            self._overlay_pyramid = None; self._overlay_photos.clear(); self._overlay_item = None; self._overlay_key = None
+            return
+        if self._overlay_key is not None and self._overlay_key[0] is overlay_img_pil and self._overlay_key[1] == scale:
+            if self._overlay_item is not None: self.canvas.coords(self._overlay_item, ox, oy)
+            return
+        self.canvas.delete("overlay"); self._overlay_item = None; self._overlay_key = (overlay_img_pil, scale)
+        try:
+            if self._overlay_pyramid is None or self._overlay_pyramid.image is not overlay_img_pil:
+                self._overlay_pyramid = OverlayPyramid(overlay_img_pil); self._overlay_photos.clear()
+            photo = self._overlay_photos.get(scale)
+            if photo is None:
+                scaled_overlay = self._overlay_pyramid.scaled(scale)
+                if scaled_overlay is None: return
+                photo = self._overlay_photos[scale] = ImageTk.PhotoImage(scaled_overlay)
+                while len(self._overlay_photos) > OVERLAY_CACHE_SIZE: self._overlay_photos.popitem(last=False)
+            self._overlay_photos.move_to_end(scale)
+            self._overlay_item = self.canvas.create_image(ox, oy, anchor=tk.NW, image=photo, tags="overlay")
+            self.canvas.tag_lower("overlay") # Оверлей под сеткой и ячейками
+        except Exception as e: print(f"Ошибка оверлея: {e}"); self._overlay_item = None
+
+    def _xview(self, *args):
+        self.canvas.xview(*args); self._render_viewport()
+
+    def _yview(self, *args):
+        self.canvas.yview(*args); self._render_viewport()
+
+    def _visible_cells(self):
+        """ Диапазон видимых ячеек (r0, r1, c0, c1) с запасом VIEWPORT_MARGIN_CELLS """
+        rows, cols = self._grid_shape
+        width = self.canvas.winfo_width(); height = self.canvas.winfo_height()
+        if width <= 1: width = 800
+        if height <= 1: height = 600
+        x0 = self.canvas.canvasx(0); y0 = self.canvas.canvasy(0)
+        c0 = max(0, int(x0 // DRAWING_PIXEL_SIZE) - VIEWPORT_MARGIN_CELLS); c1 = min(cols, int((x0 + width) // DRAWING_PIXEL_SIZE) + 1 + VIEWPORT_MARGIN_CELLS)
+        r0 = max(0, int(y0 // DRAWING_PIXEL_SIZE) - VIEWPORT_MARGIN_CELLS); r1 = min(rows, int((y0 + height) // DRAWING_PIXEL_SIZE) + 1 + VIEWPORT_MARGIN_CELLS)
+        return r0, max(r0, r1), c0, max(c0, c1)
+
+    def _create_cell(self, r, c):
+        x0 = c * DRAWING_PIXEL_SIZE; y0 = r * DRAWING_PIXEL_SIZE
+        self._cell_items[(r, c)] = self.canvas.create_rectangle(x0, y0, x0 + DRAWING_PIXEL_SIZE, y0 + DRAWING_PIXEL_SIZE, fill=ACTIVE_PIXEL_COLOR, outline='white', width=1, tags="pixel_active")
+
+    @timed('view.drawing.viewport')
+    def _render_viewport(self):
+        """ Приводит элементы холста в соответствие с полем в видимой области """
+        viewport = self._visible_cells(); r0, r1, c0, c1 = viewport
+        window = self._field[r0:r1, c0:c1]
+        if viewport != self._viewport:
+            # Прокрутка/изменение размера: линии сетки заново, ячейки - по множествам (видимых активных немного)
+            self.canvas.delete("grid_line")
+            y_top = r0 * DRAWING_PIXEL_SIZE; y_bottom = r1 * DRAWING_PIXEL_SIZE; x_left = c0 * DRAWING_PIXEL_SIZE; x_right = c1 * DRAWING_PIXEL_SIZE
+            for c in range(c0, c1 + 1): self.canvas.create_line(c * DRAWING_PIXEL_SIZE, y_top, c * DRAWING_PIXEL_SIZE, y_bottom, fill=GRID_OUTLINE_COLOR, tags="grid_line")
+            for r in range(r0, r1 + 1): self.canvas.create_line(x_left, r * DRAWING_PIXEL_SIZE, x_right, r * DRAWING_PIXEL_SIZE, fill=GRID_OUTLINE_COLOR, tags="grid_line")
+            if self._cell_items and r1 > r0 and c1 > c0: self.canvas.tag_raise("pixel_active", "grid_line") # Оставшиеся ячейки - над новыми линиями
+            active_rows, active_cols = np.nonzero(window)
+            desired = set(zip((active_rows + r0).tolist(), (active_cols + c0).tolist()))
+            for cell in [cell for cell in self._cell_items if cell not in desired]: self.canvas.delete(self._cell_items.pop(cell))
+            for cell in desired:
+                if cell not in self._cell_items: self._create_cell(*cell)
+            self._viewport = viewport
+        else:
+            # Та же область: только ячейки, изменившиеся с прошлой отрисовки
+            for r, c in np.argwhere(window != self._drawn_field[r0:r1, c0:c1]).tolist():
+                cell = (r + r0, c + c0)
+                if window[r, c]: self._create_cell(*cell)
+                elif cell in self._cell_items: self.canvas.delete(self._cell_items.pop(cell))
+        self._drawn_field = self._field
 
     def update_vertices_label(self, vertices_string):
         self.vertices_label.config(text=vertices_string)
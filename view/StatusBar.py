@@ -0,0 +1,26 @@
+# view/StatusBar.py
+import tkinter as tk
+
+class StatusBar:
+    """
+    Строка состояния вкладки: длительность последней операции и ее гистограмма,
+    экспорт замеров в JSON и переключатель записи профиля cProfile.
+    """
+    def __init__(self, parent_frame, controller):
+        self.controller = controller
+        self.frame = tk.Frame(parent_frame, relief=tk.SUNKEN, borderwidth=1)
+        packed = parent_frame.pack_slaves() # Упаковываем первой: при уменьшении окна строка состояния не обрезается
+        self.frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 5), **({'before': packed[0]} if packed else {}))
+        self.profile_var = tk.BooleanVar(value=False)
+        self.profile_check = tk.Checkbutton(self.frame, text="Профиль (cProfile)", variable=self.profile_var, command=self.controller.handle_toggle_profiling)
+        self.profile_check.pack(side=tk.RIGHT, padx=5)
+        self.export_button = tk.Button(self.frame, text="Замеры в JSON...", command=self.controller.handle_export_timings)
+        self.export_button.pack(side=tk.RIGHT, padx=5)
+        self.status_label = tk.Label(self.frame, text="Замеров пока нет", anchor=tk.W)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+    def update_status(self, text): self.status_label.config(text=text or "Замеров пока нет")
+
+    def set_profiling(self, is_active): self.profile_var.set(is_active)
+
+    def is_profiling_requested(self): return self.profile_var.get()